@@ -1,8 +1,12 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
 from src.ui.main_window import MainWindow
 
 def main():
+    # Worker processes of the frozen app start this executable again; this
+    # runs the worker and exits instead of opening another window
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -1,9 +1,13 @@
 """Run the SOO PreClose Tester GUI."""
+import multiprocessing
+
 from . import main
 
 
 def run():
     """Entry point for console scripts."""
+    # Must run before the GUI starts so comparison workers never open it
+    multiprocessing.freeze_support()
     main()
 
 
@@ -8,6 +8,8 @@ from . import (
     report_generator,
     api,
     discrepancy_classifier,
+    join_keys,
+    column_profile,
 )
 
 __all__ = [
@@ -18,4 +20,6 @@ __all__ = [
     "report_generator",
     "api",
     "discrepancy_classifier",
+    "join_keys",
+    "column_profile",
 ]
@@ -0,0 +1,514 @@
+"""Out-of-core comparison for inputs that do not fit in memory together.
+
+Both sides are hash-partitioned on their leading key columns into on-disk
+buckets. Rows sharing a join key (and every Center/Account group) always land
+in the same bucket, so each bucket can be compared on its own and the
+per-column statistics merged afterwards. The number of buckets is derived
+from a memory budget so peak memory depends on the budget, not on the size
+of the inputs.
+"""
+
+import itertools
+import math
+import os
+import pickle
+import tempfile
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logging_config import get_logger
+
+from . import discrepancy_classifier, join_keys, parallel_compare
+from .column_profile import ColumnProfile
+from .compare_profile import ComparisonProfile
+from .comparison_plan import MISSING_IN_DATABASE, MISSING_IN_EXCEL, ROW_SEQUENCE_COLUMN, missing_rows_frame
+from .mismatch_store import MismatchStore
+
+logger = get_logger(__name__)
+
+DEFAULT_MEMORY_BUDGET_MB = 1024
+DEFAULT_CHUNK_ROWS = 100_000
+# Rough ratio between the input size of a bucket and the peak memory used
+# while merging and comparing it (join key copies, merged frame, temporaries).
+MEMORY_OVERHEAD = 6
+MAX_BUCKETS = 4096
+
+Source = Union[pd.DataFrame, str, Iterable[pd.DataFrame]]
+
+
+def iter_chunks(source: Source, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield dataframes from a frame, a CSV path or an iterable of frames."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    elif isinstance(source, (str, os.PathLike)):
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+    else:
+        yield from source
+
+
+def estimate_bucket_count(total_bytes: int, memory_budget_mb: float) -> int:
+    """Return the number of buckets that keeps one bucket within the budget."""
+    budget = max(memory_budget_mb, 1) * 1024 * 1024
+    return int(min(MAX_BUCKETS, max(1, math.ceil(total_bytes * MEMORY_OVERHEAD / budget))))
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def exceeds_budget(excel_df: pd.DataFrame, sql_df: pd.DataFrame, memory_budget_mb: float) -> bool:
+    """Return True if comparing the frames in memory would exceed the budget."""
+    total = frame_bytes(excel_df) + frame_bytes(sql_df)
+    return total * MEMORY_OVERHEAD > max(memory_budget_mb, 1) * 1024 * 1024
+
+
+class _BucketSpool:
+    """Append-only pickle files holding one side's rows per bucket."""
+
+    def __init__(self, directory: str, prefix: str, n_buckets: int):
+        self.paths = [os.path.join(directory, f"{prefix}_{i}.pkl") for i in range(n_buckets)]
+        self.rows = [0] * n_buckets
+        self.columns = None
+
+    def write(self, chunk: pd.DataFrame, buckets: np.ndarray):
+        if self.columns is None:
+            self.columns = chunk.columns
+        order = np.argsort(buckets, kind="stable")
+        counts = np.bincount(buckets, minlength=len(self.paths))
+        start = 0
+        for bucket, count in enumerate(counts):
+            if not count:
+                continue
+            rows = order[start:start + count]
+            start += count
+            with open(self.paths[bucket], "ab") as fh:
+                pickle.dump(chunk.iloc[rows], fh, protocol=pickle.HIGHEST_PROTOCOL)
+            self.rows[bucket] += int(count)
+
+    def read(self, bucket: int) -> pd.DataFrame:
+        frames = []
+        if self.rows[bucket]:
+            with open(self.paths[bucket], "rb") as fh:
+                while True:
+                    try:
+                        frames.append(pickle.load(fh))
+                    except EOFError:
+                        break
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+
+class _Buckets:
+    """Both inputs spooled into buckets, with the columns used for every bucket."""
+
+    def __init__(self, column_mappings, key_columns, value_columns, excel, sql):
+        self.column_mappings = column_mappings
+        self.key_columns = key_columns
+        self.value_columns = value_columns
+        self.excel = excel
+        self.sql = sql
+
+    @property
+    def count(self) -> int:
+        return len(self.excel.rows)
+
+    def __iter__(self) -> Iterator:
+        """Yield ``(excel rows, sql rows)`` of every bucket holding any rows."""
+        for bucket in range(self.count):
+            if self.excel.rows[bucket] or self.sql.rows[bucket]:
+                yield self.excel.read(bucket), self.sql.read(bucket)
+
+
+class ChunkedComparison:
+    """Compare two large inputs bucket by bucket within a memory budget.
+
+    Column mappings and the leading key columns are detected from the
+    headers of the first chunk of each side. Key uniqueness and the numeric
+    value columns are then checked over every bucket, so the join keys match
+    those of an in-memory comparison of the whole inputs. Buckets are
+    compared with a private copy of ``engine`` so its plan cache never holds
+    bucket frames once the comparison is done.
+    """
+
+    def __init__(
+        self,
+        engine,
+        memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        n_buckets: Optional[int] = None,
+        temp_dir: Optional[str] = None,
+    ):
+        self.engine = parallel_compare.build_engine(parallel_compare.engine_settings(engine))
+        self.memory_budget_mb = memory_budget_mb
+        self.chunk_rows = chunk_rows
+        self.n_buckets = n_buckets
+        self.temp_dir = temp_dir
+        self.logger = logger
+
+    def compare(self, excel_source: Source, sql_source: Source, column_mappings=None, sheet_name=None) -> Dict:
+        profile = ComparisonProfile()
+        with tempfile.TemporaryDirectory(dir=self.temp_dir, prefix="soo_compare_") as tmp:
+            buckets = self._bucket(excel_source, sql_source, column_mappings, tmp, profile)
+            if isinstance(buckets, dict):
+                return buckets
+
+            key_columns = buckets.key_columns
+            value_columns = buckets.value_columns
+            merger = ResultMerger(buckets.column_mappings, self.engine.mismatch_cap, profile)
+            for excel_df, sql_df in buckets:
+                if excel_df.empty or sql_df.empty:
+                    discrepancies = pd.DataFrame()
+                    if value_columns:
+                        with profile.stage("discrepancies"):
+                            discrepancies = self._discrepancies(
+                                excel_df, sql_df, buckets, key_columns=key_columns
+                            )
+                    merger.add_unmatched(
+                        len(excel_df),
+                        len(sql_df),
+                        discrepancies,
+                        self._missing_rows(excel_df, sql_df, key_columns),
+                    )
+                    continue
+                result, plan = self.engine._compare_sheet(
+                    excel_df,
+                    sql_df,
+                    buckets.column_mappings,
+                    sheet_name=f"{sheet_name}#chunk",
+                    key_columns=key_columns,
+                    discrepancies=False,
+                )
+                if "error" in result:
+                    return result
+                if value_columns:
+                    with profile.stage("discrepancies"):
+                        result["account_discrepancies"] = self._discrepancies(
+                            excel_df, sql_df, buckets, plan=plan
+                        )
+                merger.add(result)
+                del excel_df, sql_df, result, plan
+            self.engine.discard_plans(f"{sheet_name}#chunk")
+
+        results = merger.result()
+        results["chunked"] = {
+            "buckets": buckets.count,
+            "memory_budget_mb": self.memory_budget_mb,
+        }
+        return results
+
+    def detailed_dataframe(
+        self,
+        excel_source: Source,
+        sql_source: Source,
+        column_mappings=None,
+        sheet_name=None,
+        report_type=None,
+        pivot_results=False,
+    ) -> pd.DataFrame:
+        """Return the detailed export of the inputs, built bucket by bucket.
+
+        Every bucket is exported with the key columns of the whole inputs, so
+        rows present on one side only are listed like in an in-memory export.
+        """
+        with tempfile.TemporaryDirectory(dir=self.temp_dir, prefix="soo_export_") as tmp:
+            buckets = self._bucket(excel_source, sql_source, column_mappings, tmp)
+            if isinstance(buckets, dict):
+                self.logger.warning(f"Chunked export of {sheet_name} failed: {buckets['error']}")
+                return pd.DataFrame()
+            frames = []
+            for excel_df, sql_df in buckets:
+                frames.append(
+                    self.engine.generate_detailed_comparison_dataframe(
+                        sheet_name,
+                        excel_df,
+                        sql_df,
+                        column_mappings=buckets.column_mappings,
+                        report_type=report_type,
+                        pivot_results=pivot_results,
+                        key_columns=buckets.key_columns,
+                    )
+                )
+                self.engine.discard_plans(sheet_name)
+        frames = [df for df in frames if not df.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _bucket(self, excel_source, sql_source, column_mappings, directory, profile=None):
+        """Spool both inputs into buckets under ``directory``.
+
+        Returns a :class:`_Buckets`, or an error dict like
+        :meth:`ComparisonEngine.compare_sheet`.
+        """
+        profile = profile or ComparisonProfile()
+        excel_chunks = iter_chunks(excel_source, self.chunk_rows)
+        sql_chunks = iter_chunks(sql_source, self.chunk_rows)
+        excel_first = self._strip_columns(next(excel_chunks, pd.DataFrame()))
+        sql_first = self._strip_columns(next(sql_chunks, pd.DataFrame()))
+        if excel_first.empty or sql_first.empty:
+            self.logger.warning("One or both dataframes are empty")
+            return {"error": "One or both dataframes are empty"}
+
+        if column_mappings is None:
+            if list(excel_first.columns) == list(sql_first.columns):
+                column_mappings = {
+                    i: {"excel_column": col, "sql_column": col, "match_score": 1.0}
+                    for i, col in enumerate(excel_first.columns)
+                }
+            else:
+                column_mappings = self.engine.find_matching_columns(
+                    excel_first.columns, sql_first.columns
+                )
+        if not column_mappings:
+            return {"error": "No matching columns found"}
+
+        key_columns = self.engine._base_key_columns(excel_first, sql_first, column_mappings)
+        if not key_columns:
+            return {"error": "Could not identify key columns for joining"}
+
+        n_buckets = self.n_buckets
+        if n_buckets is None:
+            n_buckets = self._bucket_count(excel_source, sql_source, excel_first, sql_first)
+        self.logger.info(
+            f"Chunked comparison with {n_buckets} buckets (budget {self.memory_budget_mb} MB)"
+        )
+
+        excel_spool = _BucketSpool(directory, "excel", n_buckets)
+        sql_spool = _BucketSpool(directory, "sql", n_buckets)
+        mapped_excel = [m["excel_column"] for m in column_mappings.values()]
+        mapped_sql = [m["sql_column"] for m in column_mappings.values()]
+        with profile.stage("bucketing"):
+            excel_ratios = self._spool(
+                excel_spool, excel_first, excel_chunks,
+                self._partition_columns(key_columns["excel"]), mapped_excel, n_buckets,
+            )
+            sql_ratios = self._spool(
+                sql_spool, sql_first, sql_chunks,
+                self._partition_columns(key_columns["sql"]), mapped_sql, n_buckets,
+            )
+        buckets = _Buckets(column_mappings, key_columns, [], excel_spool, sql_spool)
+
+        with profile.stage("key_detection"):
+            buckets.key_columns = self._unique_key_columns(
+                buckets, excel_ratios, sql_ratios
+            )
+        key_columns = buckets.key_columns
+        buckets.value_columns = [
+            (m["excel_column"], m["sql_column"])
+            for m in column_mappings.values()
+            if m["excel_column"] not in key_columns["excel"]
+            and m["sql_column"] not in key_columns["sql"]
+            and excel_ratios.get(m["excel_column"], 0) > 0.5
+            and sql_ratios.get(m["sql_column"], 0) > 0.5
+        ]
+        return buckets
+
+    def _unique_key_columns(self, buckets, excel_ratios, sql_ratios) -> Dict:
+        """Extend the key columns until the keys are unique in every bucket.
+
+        Rows sharing the leading key columns share a bucket, so keys unique
+        within each bucket are unique over the whole inputs. Columns only
+        ever get added, which keeps earlier buckets unique.
+        """
+        # Only columns that are text over the whole inputs may extend the key
+        candidates = {
+            i: m for i, m in buckets.column_mappings.items()
+            if excel_ratios.get(m["excel_column"], 1) < 0.5
+            and sql_ratios.get(m["sql_column"], 1) < 0.5
+        }
+        key_columns = buckets.key_columns
+        for excel_df, sql_df in buckets:
+            key_columns = self.engine._ensure_unique_key_columns(
+                excel_df, sql_df, key_columns, candidates
+            )
+            if self.engine._ROW_SEQUENCE_COLUMN in key_columns["excel"]:
+                break
+        return key_columns
+
+    def _discrepancies(self, excel_df, sql_df, buckets, **kwargs) -> pd.DataFrame:
+        # Severity is classified once over all buckets by the merger
+        return self.engine.identify_account_discrepancies(
+            excel_df,
+            sql_df,
+            buckets.column_mappings,
+            value_columns=buckets.value_columns,
+            classify=False,
+            **kwargs,
+        )
+
+    @staticmethod
+    def _missing_rows(excel_df, sql_df, key_columns) -> pd.DataFrame:
+        """Return the missing-row table of a bucket present on one side only."""
+        pairs = [
+            (excel_col, sql_col)
+            for excel_col, sql_col in zip(key_columns["excel"], key_columns["sql"])
+            if excel_col != ROW_SEQUENCE_COLUMN
+        ]
+        if len(excel_df):
+            return missing_rows_frame(
+                excel_df[[e for e, _ in pairs]], MISSING_IN_DATABASE
+            )
+        keys = sql_df[[s for _, s in pairs]]
+        keys.columns = [e for e, _ in pairs]
+        return missing_rows_frame(keys, MISSING_IN_EXCEL)
+
+    @staticmethod
+    def _strip_columns(df: pd.DataFrame) -> pd.DataFrame:
+        return df.set_axis([str(col).strip() for col in df.columns], axis=1)
+
+    def _partition_columns(self, columns):
+        # Center and Account lead the key, so partitioning on them keeps
+        # every join key and every discrepancy group inside one bucket.
+        base = [col for col in columns if col != self.engine._ROW_SEQUENCE_COLUMN]
+        return base[:2]
+
+    def _bucket_count(self, excel_source, sql_source, excel_first, sql_first) -> int:
+        total = 0
+        for source, first in ((excel_source, excel_first), (sql_source, sql_first)):
+            if isinstance(source, pd.DataFrame):
+                total += frame_bytes(source)
+            else:
+                # Streams are sized from their first chunk; assume they are
+                # many chunks long so buckets stay small.
+                total += frame_bytes(first) * 100
+        return estimate_bucket_count(total, self.memory_budget_mb)
+
+    def _spool(self, spool, first, chunks, columns, mapped_columns, n_buckets) -> Dict:
+        """Spool every chunk and return the numeric ratio of the mapped columns."""
+        numeric = {}
+        total = 0
+        for chunk in itertools.chain([first], (self._strip_columns(c) for c in chunks)):
+            if chunk.empty:
+                continue
+            self._write_chunk(spool, chunk, columns, n_buckets)
+            total += len(chunk)
+            for col in mapped_columns:
+                if col in chunk.columns:
+                    values = ColumnProfile(chunk[col]).numeric
+                    numeric[col] = numeric.get(col, 0) + int((~np.isnan(values)).sum())
+        return {col: count / total for col, count in numeric.items()} if total else {}
+
+    @staticmethod
+    def _write_chunk(spool, chunk, columns, n_buckets):
+        normalized = join_keys.normalize_key_columns(chunk, columns)
+        buckets = (join_keys.hash_keys(normalized) % np.uint64(n_buckets)).astype(np.int64)
+        spool.write(chunk, buckets)
+
+
+class ResultMerger:
+    """Accumulate per-bucket comparison results into one result dict."""
+
+    def __init__(self, column_mappings, mismatch_cap=None, profile=None):
+        self.column_mappings = column_mappings
+        self.mismatches = MismatchStore(cap=mismatch_cap)
+        self.row_counts = {"excel": 0, "sql": 0, "matched": 0, "excel_only": 0, "sql_only": 0}
+        self.column_comparisons = {}
+        self.duplicate_keys = {"excel": {}, "sql": {}}
+        self.suggested_sign_flips = set()
+        self.discrepancies = []
+        self.missing_rows = []
+        self.profile = profile or ComparisonProfile()
+
+    def add(self, result: Dict):
+        offset = self.row_counts["matched"]
+        self.profile.merge(result.get("profile"))
+        for side in self.row_counts:
+            self.row_counts[side] += result["row_counts"][side]
+        self.missing_rows.append(result["missing_rows"])
+        for side in ("excel", "sql"):
+            for key, count in result.get("duplicate_keys", {}).get(side, {}).items():
+                self.duplicate_keys[side][key] = self.duplicate_keys[side].get(key, 0) + count
+        self.suggested_sign_flips.update(result.get("suggested_sign_flips", set()))
+        for column, stats in result["column_comparisons"].items():
+            merged = self._column_stats(column, stats.get("sign_flipped", False))
+            merged["is_numeric"] = merged["is_numeric"] or stats["is_numeric"]
+            for field in ("match_count", "mismatch_count", "null_mismatch_count"):
+                merged[field] += stats[field]
+        # Row numbers continue across buckets
+        self.mismatches.extend(result["mismatches"], row_offset=offset)
+        self._add_discrepancies(result.get("account_discrepancies"))
+
+    def add_matched(self, rows: int, column_kinds: Dict, sign_flipped: bool = False):
+        """Count ``rows`` matched rows whose cells all match.
+
+        ``column_kinds`` maps each compared column to whether it is numeric.
+        """
+        if not rows:
+            return
+        for side in ("excel", "sql", "matched"):
+            self.row_counts[side] += rows
+        self.profile.count("rows_in", 2 * rows)
+        self.profile.count("rows_matched", rows)
+        self.profile.count("cells_compared", rows * len(column_kinds))
+        for column, is_numeric in column_kinds.items():
+            merged = self._column_stats(column, sign_flipped)
+            merged["is_numeric"] = merged["is_numeric"] or is_numeric
+            merged["match_count"] += rows
+
+    def _column_stats(self, column, sign_flipped: bool) -> Dict:
+        return self.column_comparisons.setdefault(column, {
+            "is_numeric": False,
+            "match_count": 0,
+            "mismatch_count": 0,
+            "null_mismatch_count": 0,
+            "sign_flipped": sign_flipped,
+        })
+
+    def add_unmatched(self, excel_rows: int, sql_rows: int, discrepancies, missing_rows):
+        self.profile.count("rows_in", excel_rows + sql_rows)
+        self.row_counts["excel"] += excel_rows
+        self.row_counts["sql"] += sql_rows
+        self.row_counts["excel_only"] += excel_rows
+        self.row_counts["sql_only"] += sql_rows
+        self.missing_rows.append(missing_rows)
+        self._add_discrepancies(discrepancies)
+
+    def _add_discrepancies(self, discrepancies):
+        if isinstance(discrepancies, pd.DataFrame) and not discrepancies.empty:
+            self.discrepancies.append(discrepancies)
+
+    def result(self) -> Dict:
+        summary = {"total_cells": 0, "matching_cells": 0, "mismatch_cells": 0, "mismatch_percentage": 0}
+        for column, stats in self.column_comparisons.items():
+            stats["mismatch_rows"] = self.mismatches.rows_for(column)
+            total = stats["match_count"] + stats["mismatch_count"]
+            stats["match_percentage"] = (stats["match_count"] / total * 100) if total else 0
+            summary["total_cells"] += total
+            summary["matching_cells"] += stats["match_count"]
+            summary["mismatch_cells"] += stats["mismatch_count"]
+        if summary["total_cells"]:
+            summary["mismatch_percentage"] = summary["mismatch_cells"] / summary["total_cells"] * 100
+        summary["overall_match"] = summary["mismatch_percentage"] < 1
+
+        # Severity thresholds come from the variances of the whole result,
+        # so discrepancies are classified once all buckets are merged
+        discrepancies = pd.DataFrame()
+        if self.discrepancies:
+            discrepancies = discrepancy_classifier.classify(
+                pd.concat(self.discrepancies, ignore_index=True).drop(
+                    columns="Severity", errors="ignore"
+                )
+            )
+        return {
+            "column_mappings": self.column_mappings,
+            "row_count_match": self.row_counts["excel"] == self.row_counts["sql"],
+            "row_counts": dict(self.row_counts),
+            "column_comparisons": self.column_comparisons,
+            "summary": summary,
+            "duplicate_keys": self.duplicate_keys,
+            "suggested_sign_flips": self.suggested_sign_flips,
+            "mismatches": self.mismatches,
+            "missing_rows": (
+                pd.concat(self.missing_rows, ignore_index=True)
+                if self.missing_rows else pd.DataFrame(columns=["Result"])
+            ),
+            "account_discrepancies": discrepancies,
+            "discrepancy_severity": (
+                discrepancies["Severity"].tolist()
+                if "Severity" in discrepancies.columns
+                else []
+            ),
+            "profile": self.profile.as_dict(),
+        }
@@ -1,6 +1,7 @@
 import re
 from difflib import SequenceMatcher
-from typing import Iterable, List, Dict
+from functools import lru_cache
+from typing import Iterable, List, Dict, Tuple
 
 
 def normalize_column_names(columns: Iterable[str]) -> List[str]:
@@ -16,47 +17,159 @@ def normalize_column_names(columns: Iterable[str]) -> List[str]:
     return normalized
 
 
-def find_matching_columns(excel_columns: Iterable[str], sql_columns: Iterable[str], threshold: float = 0.6) -> Dict[int, Dict[str, object]]:
-    """Return mappings of Excel column index to SQL column info."""
+def find_matching_columns(excel_columns: Iterable[str], sql_columns: Iterable[str], threshold: float = 0.6,
+                          saved_mappings: Dict[str, Dict[str, object]] = None) -> Dict[int, Dict[str, object]]:
+    """Return mappings of Excel column index to SQL column info.
+
+    ``saved_mappings`` maps Excel header names to header matches the user
+    accepted earlier, as ``{"sql_column", "match_score"}`` entries. Exact
+    matches always come first; saved matches are then applied to the
+    remaining headers and only the headers still unmatched go through
+    fuzzy matching. Results are memoized per header set, threshold and
+    saved matches.
+    """
+    excel_columns = tuple(excel_columns)
+    sql_columns = tuple(sql_columns)
+    saved = _saved_matches(excel_columns, saved_mappings)
+    try:
+        matches = _match_columns(excel_columns, sql_columns, threshold, saved)
+    except TypeError:
+        # Unhashable column labels cannot be memoized
+        matches = _match_columns.__wrapped__(excel_columns, sql_columns, threshold, saved)
+    return {
+        i: {"excel_column": excel_columns[i], "sql_column": sql_columns[j], "match_score": score}
+        for i, j, score in matches
+    }
+
+
+def mappings_to_saved(column_mappings: Dict[int, Dict[str, object]]) -> Dict[str, Dict[str, object]]:
+    """Return the fuzzy matches of ``column_mappings`` in the stored form.
+
+    Exact matches are left out as they are found again on every run, and
+    headers without a match are never recorded.
+    """
+    saved = {}
+    for mapping in (column_mappings or {}).values():
+        excel_name, sql_name = normalize_column_names(
+            [mapping["excel_column"], mapping["sql_column"]]
+        )
+        if excel_name == sql_name:
+            continue
+        saved[str(mapping["excel_column"])] = {
+            "sql_column": str(mapping["sql_column"]),
+            "match_score": float(mapping["match_score"]),
+        }
+    return saved
+
+
+def _saved_matches(excel_columns, saved_mappings) -> Tuple:
+    """Return ``(excel index, sql name, score)`` for headers with a saved match."""
+    if not saved_mappings:
+        return ()
+    saved = []
+    for i, col in enumerate(excel_columns):
+        entry = saved_mappings.get(str(col))
+        # Entries without a SQL column were written by older versions
+        if not entry or entry.get("sql_column") is None:
+            continue
+        saved.append((i, str(entry["sql_column"]), float(entry.get("match_score", 1.0))))
+    return tuple(saved)
+
+
+@lru_cache(maxsize=256)
+def _match_columns(excel_columns: Tuple, sql_columns: Tuple, threshold: float, saved: Tuple = ()) -> Tuple:
+    """Match headers and return ``(excel index, sql index, score)`` tuples.
+
+    Exact matches come first, then saved and fuzzy matches, each in Excel
+    column order.
+    """
     excel_normalized = normalize_column_names(excel_columns)
     sql_normalized = normalize_column_names(sql_columns)
 
-    mappings: Dict[int, Dict[str, object]] = {}
+    exact: Dict[int, Tuple[int, float]] = {}
+    fuzzy: Dict[int, Tuple[int, float]] = {}
+    resolved = set()
     used_sql = set()
 
     # exact matches
+    sql_positions: Dict[str, List[int]] = {}
+    for j, s in enumerate(sql_normalized):
+        sql_positions.setdefault(s, []).append(j)
     for i, e in enumerate(excel_normalized):
-        for j, s in enumerate(sql_normalized):
-            if j in used_sql:
-                continue
-            if e == s:
-                mappings[i] = {"excel_column": list(excel_columns)[i], "sql_column": list(sql_columns)[j], "match_score": 1.0}
+        for j in sql_positions.get(e, ()):
+            if j not in used_sql:
+                exact[i] = (j, 1.0)
+                resolved.add(i)
                 used_sql.add(j)
                 break
 
+    # saved matches; a saved SQL column that is gone or taken is matched again
+    if saved:
+        sql_names: Dict[str, List[int]] = {}
+        for j, col in enumerate(sql_columns):
+            sql_names.setdefault(str(col), []).append(j)
+        for i, sql_name, score in saved:
+            if i in resolved:
+                continue
+            j = next((j for j in sql_names.get(sql_name, ()) if j not in used_sql), None)
+            if j is None:
+                continue
+            fuzzy[i] = (j, score)
+            resolved.add(i)
+            used_sql.add(j)
+
     # fuzzy matches
-    for i, e in enumerate(excel_normalized):
-        if i in mappings:
-            continue
-        best = None
-        best_score = threshold
-        for j, s in enumerate(sql_normalized):
-            if j in used_sql:
+    if len(resolved) < len(excel_columns) and len(used_sql) < len(sql_columns):
+        sql_words = [set(s.split()) for s in sql_normalized]
+        word_index: Dict[str, List[int]] = {}
+        for j, words in enumerate(sql_words):
+            for word in words:
+                word_index.setdefault(word, []).append(j)
+        # SequenceMatcher caches information about its second sequence, so
+        # keep one matcher per SQL header and only swap the Excel header.
+        matchers = []
+        for s in sql_normalized:
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(s)
+            matchers.append(matcher)
+
+        for i, e in enumerate(excel_normalized):
+            if i in resolved:
                 continue
-            score1 = SequenceMatcher(None, e, s).ratio()
             e_words = set(e.split())
-            s_words = set(s.split())
-            score2 = len(e_words & s_words) / max(len(e_words), len(s_words)) if (e_words or s_words) else 0
-            score3 = 0
-            if e in s or s in e:
-                min_len = min(len(e), len(s))
-                max_len = max(len(e), len(s))
-                score3 = min_len / max_len if max_len > 0 else 0
-            score = max(score1, score2, score3)
-            if score > best_score:
-                best_score = score
-                best = j
-        if best is not None:
-            mappings[i] = {"excel_column": list(excel_columns)[i], "sql_column": list(sql_columns)[best], "match_score": best_score}
-            used_sql.add(best)
-    return mappings
+            shared_words: Dict[int, int] = {}
+            for word in e_words:
+                for j in word_index.get(word, ()):
+                    shared_words[j] = shared_words.get(j, 0) + 1
+
+            best = None
+            best_score = threshold
+            for j, s in enumerate(sql_normalized):
+                if j in used_sql:
+                    continue
+                s_words = sql_words[j]
+                score2 = shared_words.get(j, 0) / max(len(e_words), len(s_words)) if (e_words or s_words) else 0
+                score3 = 0
+                if e in s or s in e:
+                    min_len = min(len(e), len(s))
+                    max_len = max(len(e), len(s))
+                    score3 = min_len / max_len if max_len > 0 else 0
+                score = max(score2, score3)
+
+                # The sequence ratio is only needed when its upper bounds
+                # could beat both the cheaper scores and the current best.
+                bound = max(score, best_score)
+                matcher = matchers[j]
+                matcher.set_seq1(e)
+                if matcher.real_quick_ratio() > bound and matcher.quick_ratio() > bound:
+                    score = max(score, matcher.ratio())
+                if score > best_score:
+                    best_score = score
+                    best = j
+            if best is not None:
+                fuzzy[i] = (best, best_score)
+                used_sql.add(best)
+
+    ordered = [(i, j, score) for i, (j, score) in sorted(exact.items())]
+    ordered += [(i, j, score) for i, (j, score) in sorted(fuzzy.items())]
+    return tuple(ordered)
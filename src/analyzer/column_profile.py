@@ -0,0 +1,164 @@
+"""Cached per-column statistics shared by the analyzer modules.
+
+Key detection, discrepancy analysis and value comparison all need to know
+whether a column is numeric, its coerced values and what kind of data its
+header suggests. :class:`ProfileCache` computes these once per column of a
+frame and hands the same :class:`ColumnProfile` to every caller.
+"""
+
+import re
+import weakref
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .comparison_plan import frame_signature
+from .result_cache import frame_fingerprint
+
+ROLE_SHEET = "sheet"
+ROLE_CENTER = "center"
+ROLE_ACCOUNT = "account"
+ROLE_PERIOD = "period"
+ROLE_METRIC = "metric"
+
+_SHEET_NAMES = {"sheet", "sheetname"}
+_CENTER_KEYWORDS = ("center", "facility", "department", "dept")
+_ACCOUNT_KEYWORDS = ("account", "careport", "acct")
+_PERIOD_KEYWORDS = ("month", "period", "date", "year", "week", "quarter")
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name) -> str:
+    """Return ``name`` lower-cased with whitespace and underscores removed."""
+    return re.sub(r"[\s_]+", "", str(name)).lower()
+
+
+def detect_role(name):
+    """Return the role suggested by a column header, or ``None``."""
+    norm = normalize_name(name)
+    if norm in _SHEET_NAMES:
+        return ROLE_SHEET
+    if any(kw in norm for kw in _CENTER_KEYWORDS):
+        return ROLE_CENTER
+    if any(kw in norm for kw in _ACCOUNT_KEYWORDS):
+        return ROLE_ACCOUNT
+    if any(kw in norm for kw in _PERIOD_KEYWORDS):
+        return ROLE_PERIOD
+    return None
+
+
+class ColumnProfile:
+    """Lazily computed statistics for one column of a dataframe."""
+
+    def __init__(self, series: pd.Series, name=None):
+        self.name = series.name if name is None else name
+        self.normalized_name = normalize_name(self.name)
+        self._series = series
+        self._coerced = None
+        self._numeric = None
+        self._numeric_ratio = None
+        self._null_mask = None
+
+    @property
+    def coerced(self):
+        """Series of values passed through ``pd.to_numeric(errors="coerce")``.
+
+        ``None`` if the column cannot be coerced at all.
+        """
+        if self._numeric is None:
+            try:
+                self._coerced = pd.to_numeric(self._series, errors="coerce")
+                self._numeric = self._coerced.to_numpy(dtype=float, na_value=np.nan)
+            except Exception:
+                self._coerced = None
+                self._numeric = np.full(len(self._series), np.nan)
+        return self._coerced
+
+    @property
+    def numeric(self) -> np.ndarray:
+        """Values coerced to float with non-numeric entries as NaN."""
+        if self._numeric is None:
+            self.coerced
+        return self._numeric
+
+    @property
+    def numeric_ratio(self) -> float:
+        """Share of values that can be read as numbers."""
+        if self._numeric_ratio is None:
+            numeric = self.numeric
+            self._numeric_ratio = float((~np.isnan(numeric)).mean()) if len(numeric) else 0.0
+        return self._numeric_ratio
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.numeric_ratio > 0.5
+
+    @property
+    def is_text(self) -> bool:
+        return self.numeric_ratio < 0.5
+
+    @property
+    def null_mask(self) -> np.ndarray:
+        if self._null_mask is None:
+            self._null_mask = self._series.isna().to_numpy(dtype=bool)
+        return self._null_mask
+
+    @property
+    def role(self):
+        """Header role, or ``metric`` for unlabelled mostly numeric columns."""
+        role = detect_role(self.name)
+        if role is None and self.is_numeric:
+            return ROLE_METRIC
+        return role
+
+
+class ProfileCache:
+    """Column profiles keyed by frame identity and structure.
+
+    Entries are dropped when their frame is garbage collected and rebuilt
+    when the frame's shape or columns change. Values edited in place are
+    only noticed by :meth:`validate`, which comparisons call with the
+    content fingerprint of each input frame.
+    """
+
+    def __init__(self):
+        self._frames = {}
+
+    def get(self, df: pd.DataFrame, column) -> ColumnProfile:
+        """Return the profile of ``column`` in ``df``."""
+        profiles = self._entry(df)[3]
+        profile = profiles.get(column)
+        if profile is None:
+            profile = ColumnProfile(df[column], column)
+            profiles[column] = profile
+        return profile
+
+    def validate(self, df: pd.DataFrame, fingerprint=None):
+        """Drop the profiles of ``df`` unless built for contents ``fingerprint``.
+
+        ``fingerprint`` defaults to :func:`frame_fingerprint` of ``df``.
+        """
+        if fingerprint is None:
+            fingerprint = frame_fingerprint(df)
+        entry = self._entry(df)
+        if entry[2] != fingerprint:
+            self._frames[id(df)] = (entry[0], entry[1], fingerprint, {})
+
+    def _entry(self, df):
+        key = id(df)
+        entry = self._frames.get(key)
+        signature = frame_signature(df)
+        if entry is None or entry[0]() is not df or entry[1] != signature:
+            ref = weakref.ref(df, lambda _ref, key=key: self._discard(key, _ref))
+            entry = (ref, signature, None, {})
+            self._frames[key] = entry
+        return entry
+
+    def _discard(self, key, ref):
+        entry = self._frames.get(key)
+        if entry is not None and entry[0] is ref:
+            del self._frames[key]
+
+    def clear(self):
+        self._frames = {}
@@ -0,0 +1,133 @@
+"""Stage timers and counters recorded while comparing a sheet.
+
+Every comparison result carries a ``profile`` dict::
+
+    {
+        "stages": {"merge": 0.12, ...},          # seconds per stage
+        "counters": {"rows_in": 2000, ...},      # rows, cells and mismatches
+        "allocated_bytes": {"merge": 1048576},   # only while tracemalloc traces
+    }
+
+Profiles are plain dicts so they survive pickling to and from worker
+processes, and profiles of several sheets (or chunks) are summed with
+:func:`merge_profiles`.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+# Display order and labels of the stages timed by the comparison paths
+STAGE_LABELS = {
+    "bucketing": "Bucketing",
+    "checksums": "Group checksums",
+    "plugins": "Plugin hooks",
+    "column_mapping": "Column mapping",
+    "key_detection": "Key detection",
+    "join_keys": "Join key building",
+    "merge": "Merge",
+    "fingerprints": "Row fingerprints",
+    "column_compare": "Column comparison",
+    "discrepancies": "Discrepancy analysis",
+}
+
+COUNTER_LABELS = {
+    "sheets": "Sheets",
+    "sheets_reused": "Sheets reused unchanged",
+    "rows_in": "Rows in",
+    "rows_merged": "Rows merged",
+    "rows_matched": "Rows matched",
+    "cells_compared": "Cells compared",
+    "cells_checked": "Cells checked cell by cell",
+    "mismatches": "Mismatches",
+    "plan_reuses": "Cached plans reused",
+}
+
+
+class ComparisonProfile:
+    """Accumulate the stage timings and counters of one comparison."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.allocated: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block under ``name``.
+
+        Stages must not be nested. While :mod:`tracemalloc` is tracing, the
+        peak memory allocated inside the block is recorded as well.
+        """
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.allocated[name] = self.allocated.get(name, 0) + max(peak - before, 0)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def merge(self, profile: Optional[Dict]):
+        """Add the stages and counters of a profile dict."""
+        if not profile:
+            return
+        for target, field in (
+            (self.stages, "stages"),
+            (self.counters, "counters"),
+            (self.allocated, "allocated_bytes"),
+        ):
+            for name, value in profile.get(field, {}).items():
+                target[name] = target.get(name, 0) + value
+
+    def as_dict(self) -> Dict:
+        profile = {"stages": dict(self.stages), "counters": dict(self.counters)}
+        if self.allocated:
+            profile["allocated_bytes"] = dict(self.allocated)
+        return profile
+
+
+def merge_profiles(profiles: Iterable[Optional[Dict]]) -> Dict:
+    """Return the sum of several profile dicts."""
+    total = ComparisonProfile()
+    for profile in profiles:
+        total.merge(profile)
+    return total.as_dict()
+
+
+def _ordered(values: Dict, labels: Dict) -> List:
+    known = [name for name in labels if name in values]
+    return known + sorted(name for name in values if name not in labels)
+
+
+def format_profile(profile: Optional[Dict]) -> List[str]:
+    """Return Markdown lines with the stage timings and counters of ``profile``."""
+    if not profile or not (profile.get("stages") or profile.get("counters")):
+        return []
+    stages = profile.get("stages", {})
+    allocated = profile.get("allocated_bytes", {})
+    lines = ["\n## Performance"]
+    if stages:
+        total = sum(stages.values())
+        lines.append("\n| Stage | Seconds | Share |" + (" Allocated MB |" if allocated else ""))
+        lines.append("| ----- | ------- | ----- |" + (" ------------ |" if allocated else ""))
+        for name in _ordered(stages, STAGE_LABELS):
+            seconds = stages[name]
+            share = seconds / total * 100 if total else 0
+            row = f"| {STAGE_LABELS.get(name, name)} | {seconds:.3f} | {share:.1f}% |"
+            if allocated:
+                row += f" {allocated.get(name, 0) / 1_048_576:.1f} |"
+            lines.append(row)
+        lines.append(f"\n- **Total Stage Time:** {total:.3f} s")
+    counters = profile.get("counters", {})
+    for name in _ordered(counters, COUNTER_LABELS):
+        lines.append(f"- **{COUNTER_LABELS.get(name, name)}:** {counters[name]:,}")
+    return lines
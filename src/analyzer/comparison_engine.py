@@ -1,40 +1,69 @@
+import numpy as np
 import pandas as pd
 import logging
-import re
+from collections import OrderedDict
 from pathlib import Path
 from src.utils.logging_config import get_logger
 from src.plugins import load_plugins, Plugin
 from . import (
     column_matching,
     row_comparison,
+    row_fingerprint,
     sign_flip,
     report_generator,
     discrepancy_classifier,
+    join_keys,
+    column_profile,
+    result_cache,
 )
+from .compare_profile import ComparisonProfile
+from .comparison_plan import ComparisonPlan, MERGE_INDICATOR, ROW_SEQUENCE_COLUMN
+from .mismatch_store import DEFAULT_MISMATCH_CAP, MismatchStore
 
 class ComparisonEngine:
-    _ROW_SEQUENCE_COLUMN = "__row_sequence__"
-    def __init__(self, plugin_dirs=None):
-        """Initialize the comparison engine"""
+    _ROW_SEQUENCE_COLUMN = ROW_SEQUENCE_COLUMN
+    _ACCOUNT_CANDIDATES = [
+        "Account",
+        "CAReportName",
+        "Account Number",
+        "Acct",
+        "AccountNumber",
+    ]
+    # Columns read from the merged frame besides mapped and key columns
+    _DETAIL_COLUMNS = ("Center", "CAReportName")
+    # Cached comparison plans besides pinned ones; exports of the last
+    # compared sheets reuse them
+    MAX_CACHED_PLANS = 8
+
+    def __init__(self, plugin_dirs=None, debug_log_file='comparison_debug.log'):
+        """Initialize the comparison engine
+
+        ``debug_log_file`` may be ``None`` to leave the row level debug log
+        untouched, e.g. for engines running in worker processes.
+        """
         self.logger = get_logger(__name__)
-        self._setup_debug_logger()
+        self._setup_debug_logger(debug_log_file)
         self.comparison_results = {}
         self.tolerance = 0.001  # Default tolerance for numerical comparisons
         self.sign_flip_accounts = set()  # Set of account numbers that should have their signs flipped
+        self.sign_flip_index = sign_flip.SignFlipIndex()
+        self.plugin_dirs = plugin_dirs
         self.plugins = self._load_plugins(plugin_dirs)
+        self._plans = OrderedDict()  # Recently used ComparisonPlan objects keyed by input frame identity
+        self._pinned_sheets = set()  # Sheets whose plans are kept regardless of MAX_CACHED_PLANS
+        self._profiles = column_profile.ProfileCache()
+        self.saved_column_mappings = {}  # Accepted header mappings for the current report type
+        self.memory_budget_mb = 1024  # Memory budget for chunked comparisons
+        self.mismatch_cap = DEFAULT_MISMATCH_CAP  # Mismatching cells retained per sheet
+        self.hierarchical = False  # Compare group checksums before cells
+        self.result_cache = result_cache.SheetResultCache()  # Latest result per sheet and inputs
 
     @staticmethod
     def _find_account_columns(columns):
         """Return likely account columns from merged dataframe columns."""
-        candidates = [
-            "Account",
-            "CAReportName",
-            "Account Number",
-            "Acct",
-            "AccountNumber",
-        ]
         norm_map = {
-            re.sub(r"[\s_]+", "", c).lower(): c for c in candidates
+            column_profile.normalize_name(c): c
+            for c in ComparisonEngine._ACCOUNT_CANDIDATES
         }
         acct_excel = None
         acct_sql = None
@@ -48,7 +77,7 @@ class ComparisonEngine:
         for col in columns:
             base = col.rsplit("_", 1)[0]
             suffix = col.rsplit("_", 1)[-1]
-            norm = re.sub(r"[\s_]+", "", base).lower()
+            norm = column_profile.normalize_name(base)
             if norm in norm_map:
                 if suffix == "excel":
                     acct_excel = col
@@ -56,21 +85,24 @@ class ComparisonEngine:
                     acct_sql = col
         if acct_excel is None:
             for col in excel_segment:
-                norm_full = re.sub(r"[\s_]+", "", str(col)).lower()
+                norm_full = column_profile.normalize_name(col)
                 if norm_full in norm_map:
                     acct_excel = col
                     break
         if acct_sql is None:
             for col in sql_segment:
-                norm_full = re.sub(r"[\s_]+", "", str(col)).lower()
+                norm_full = column_profile.normalize_name(col)
                 if norm_full in norm_map:
                     acct_sql = col
                     break
         return acct_excel, acct_sql
 
-    def _setup_debug_logger(self):
+    def _setup_debug_logger(self, log_file='comparison_debug.log'):
         """Create a dedicated debug logger for row level comparison."""
-        file_handler = logging.FileHandler('comparison_debug.log', mode='w')
+        if log_file is None:
+            self.debug_logger = logging.getLogger('comparison_debug')
+            return
+        file_handler = logging.FileHandler(log_file, mode='w')
         file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         file_handler.setFormatter(file_formatter)
         file_handler.setLevel(logging.DEBUG)
@@ -96,9 +128,30 @@ class ComparisonEngine:
         self.tolerance = tolerance
         self.logger.info(f"Comparison tolerance set to {tolerance}")
     
+    def set_memory_budget(self, memory_budget_mb):
+        """Set the memory budget in MB used by chunked comparisons"""
+        self.memory_budget_mb = memory_budget_mb
+        self.logger.info(f"Comparison memory budget set to {memory_budget_mb} MB")
+
+    def set_mismatch_cap(self, cap):
+        """Set how many mismatching cells are retained per sheet (``None`` keeps all)"""
+        self.mismatch_cap = cap
+        self.logger.info(f"Mismatch retention cap set to {cap}")
+
+    def set_hierarchical(self, enabled):
+        """Enable comparing group checksums before individual cells"""
+        self.hierarchical = bool(enabled)
+        self.logger.info(f"Hierarchical comparison {'enabled' if self.hierarchical else 'disabled'}")
+
+    def set_saved_column_mappings(self, mappings):
+        """Set previously accepted header mappings used before fuzzy matching"""
+        self.saved_column_mappings = dict(mappings or {})
+        self.logger.info(f"Loaded {len(self.saved_column_mappings)} saved column mappings")
+
     def set_sign_flip_accounts(self, accounts):
         """Set the list of accounts that should have their signs flipped during comparison"""
         self.sign_flip_accounts = set(accounts) if accounts else set()
+        self.sign_flip_index = sign_flip.SignFlipIndex(self.sign_flip_accounts)
         self.logger.info(f"Set sign flip accounts: {self.sign_flip_accounts}")
     
     def _should_flip_sign(self, column_name):
@@ -112,7 +165,12 @@ class ComparisonEngine:
     
     def find_matching_columns(self, excel_columns, sql_columns, threshold=0.6):
         """Find matching columns between Excel and SQL results."""
-        mappings = column_matching.find_matching_columns(excel_columns, sql_columns, threshold)
+        mappings = column_matching.find_matching_columns(
+            excel_columns,
+            sql_columns,
+            threshold,
+            saved_mappings=self.saved_column_mappings,
+        )
 
         self.logger.info(f"Found {len(mappings)} column mappings between Excel and SQL data")
         for _, mapping in mappings.items():
@@ -121,72 +179,211 @@ class ComparisonEngine:
             )
         return mappings
     
-    def compare_dataframes(self, excel_df, sql_df, column_mappings=None):
-        """Compare Excel and SQL dataframes and identify differences, including duplicate key detection and per-row sign flip"""
+    def compare_dataframes(self, excel_df, sql_df, column_mappings=None, sheet_name=None):
+        """Compare Excel and SQL dataframes and identify differences, including duplicate key detection and per-row sign flip
+
+        ``sheet_name`` labels the cached :class:`ComparisonPlan` so later
+        exports of the same sheet reuse the merge instead of rebuilding it.
+        The given frames are not modified; the results and the plan they
+        were computed from are kept for :meth:`generate_comparison_report`.
+        """
         if excel_df.empty or sql_df.empty:
             self.logger.warning("One or both dataframes are empty")
             return {"error": "One or both dataframes are empty"}
 
-        # Store last compared dataframes for later report generation
-        self._last_excel_df = excel_df.copy()
-        self._last_sql_df = sql_df.copy()
-        
+        results, plan = self._compare_sheet(excel_df, sql_df, column_mappings, sheet_name)
+
+        # Store results and the plan referencing the compared frames
+        if "error" not in results:
+            self.comparison_results = results
+            self._last_plan = plan
+
+        return results
+
+    def compare_chunked(self, excel_source, sql_source, column_mappings=None, sheet_name=None, memory_budget_mb=None):
+        """Compare inputs too large for memory through on-disk hash buckets
+
+        ``excel_source`` and ``sql_source`` may be dataframes, CSV paths or
+        iterables of dataframe chunks. Peak memory is bounded by
+        ``memory_budget_mb`` (default :attr:`memory_budget_mb`) instead of
+        the input size. Results have the same layout as
+        :meth:`compare_dataframes` plus a ``chunked`` entry.
+        """
+        from .chunked_compare import ChunkedComparison
+
+        budget = memory_budget_mb or self.memory_budget_mb
+        results = ChunkedComparison(self, memory_budget_mb=budget).compare(
+            excel_source, sql_source, column_mappings, sheet_name
+        )
+        if "error" not in results:
+            self.comparison_results = results
+        return results
+
+    def generate_chunked_detailed_dataframe(
+        self,
+        sheet_name,
+        excel_source,
+        sql_source,
+        column_mappings=None,
+        report_type=None,
+        pivot_results=False,
+        memory_budget_mb=None,
+    ):
+        """Build :meth:`generate_detailed_comparison_dataframe` bucket by bucket.
+
+        Used to export sheets compared with :meth:`compare_chunked`, so the
+        export stays within the same memory budget as the comparison.
+        """
+        from .chunked_compare import ChunkedComparison
+
+        budget = memory_budget_mb or self.memory_budget_mb
+        return ChunkedComparison(self, memory_budget_mb=budget).detailed_dataframe(
+            excel_source,
+            sql_source,
+            column_mappings,
+            sheet_name,
+            report_type=report_type,
+            pivot_results=pivot_results,
+        )
+
+    def compare_hierarchical(self, excel_df, sql_df, column_mappings=None, sheet_name=None):
+        """Compare top-down, only comparing cells of groups whose totals differ
+
+        Checksums are compared for the whole sheet, then per Center and per
+        (Center, Account); rows of groups that agree are counted as matched
+        from the group sizes and only the remaining rows are compared cell
+        by cell. Results have the same layout as :meth:`compare_dataframes`
+        plus a ``hierarchical`` entry with the groups checked per level.
+        Plugins may rewrite whole frames, so with plugins loaded every cell
+        is compared.
+        """
+        if self.plugins:
+            return self.compare_dataframes(excel_df, sql_df, column_mappings, sheet_name)
+
+        from .hierarchical_compare import HierarchicalComparison
+
+        results = HierarchicalComparison(self).compare(
+            excel_df, sql_df, column_mappings, sheet_name
+        )
+        if "error" not in results:
+            self.comparison_results = results
+        return results
+
+    def compare_consolidated(self, sheets):
+        """Compare several sheets with one merge per group of alike sheets
+
+        ``sheets`` is an iterable of ``(sheet_name, excel_df, sql_df)``.
+        Sheets sharing headers and key columns are stacked with a sheet tag
+        and compared in one pass; the results are split back per sheet and
+        returned as ``{sheet_name: results}`` in the given order. With
+        plugins loaded every sheet is compared on its own.
+        """
+        if self.plugins:
+            return {
+                name: self.compare_sheet(excel_df, sql_df, sheet_name=name)
+                for name, excel_df, sql_df in sheets
+            }
+
+        from .consolidated_compare import ConsolidatedComparison
+
+        return ConsolidatedComparison(self).compare(sheets)
+
+    def compare_sheet(self, excel_df, sql_df, column_mappings=None, sheet_name=None, key_columns=None):
+        """Compare one sheet without touching per-call engine state.
+
+        Unlike :meth:`compare_dataframes` the input frames are never modified
+        and the results are only returned, so several sheets can be compared
+        concurrently with the same engine configuration. ``key_columns`` may
+        fix the join columns instead of detecting them from the data.
+        """
+        results, _plan = self._compare_sheet(
+            excel_df, sql_df, column_mappings, sheet_name, key_columns
+        )
+        return results
+
+    def _compare_sheet(
+        self, excel_df, sql_df, column_mappings=None, sheet_name=None, key_columns=None, discrepancies=True
+    ):
+        """Return the results of :meth:`compare_sheet` and the plan used.
+
+        ``discrepancies=False`` skips the account discrepancy analysis for
+        callers that run it on parts of the frames themselves. The time
+        spent in each stage is returned under the ``profile`` key.
+        """
+        if excel_df.empty or sql_df.empty:
+            self.logger.warning("One or both dataframes are empty")
+            return {"error": "One or both dataframes are empty"}, None
+
+        profile = ComparisonProfile()
+        profile.count("rows_in", len(excel_df) + len(sql_df))
+
         # Print DataFrame info for debugging
         self.logger.info(f"Excel DataFrame info: {excel_df.shape}, columns: {excel_df.columns.tolist()}")
         self.logger.info(f"SQL DataFrame info: {sql_df.shape}, columns: {sql_df.columns.tolist()}")
-        
-        # Clean up column names to handle any whitespace issues
-        excel_df.columns = [str(col).strip() for col in excel_df.columns]
-        sql_df.columns = [str(col).strip() for col in sql_df.columns]
+
+        # Clean up column names on a shallow copy only when needed
+        if any(str(col) != str(col).strip() or not isinstance(col, str) for col in excel_df.columns):
+            excel_df = excel_df.set_axis([str(col).strip() for col in excel_df.columns], axis=1)
+        if any(str(col) != str(col).strip() or not isinstance(col, str) for col in sql_df.columns):
+            sql_df = sql_df.set_axis([str(col).strip() for col in sql_df.columns], axis=1)
 
         # Run plugin pre-comparison hooks
-        for plugin in self.plugins:
-            try:
-                excel_df, sql_df = plugin.pre_compare(excel_df, sql_df)
-            except Exception as e:
-                self.logger.warning(f"Plugin {plugin.__class__.__name__} failed in pre_compare: {e}")
+        if self.plugins:
+            with profile.stage("plugins"):
+                for plugin in self.plugins:
+                    try:
+                        excel_df, sql_df = plugin.pre_compare(excel_df, sql_df)
+                    except Exception as e:
+                        self.logger.warning(f"Plugin {plugin.__class__.__name__} failed in pre_compare: {e}")
         
         # If no column mappings provided, check for exact header match first
         if column_mappings is None:
-            if list(excel_df.columns) == list(sql_df.columns):
-                column_mappings = {
-                    i: {
-                        "excel_column": col,
-                        "sql_column": col,
-                        "match_score": 1.0,
+            with profile.stage("column_mapping"):
+                if list(excel_df.columns) == list(sql_df.columns):
+                    column_mappings = {
+                        i: {
+                            "excel_column": col,
+                            "sql_column": col,
+                            "match_score": 1.0,
+                        }
+                        for i, col in enumerate(excel_df.columns)
                     }
-                    for i, col in enumerate(excel_df.columns)
-                }
-            else:
-                column_mappings = self.find_matching_columns(
-                    excel_df.columns, sql_df.columns
-                )
+                else:
+                    column_mappings = self.find_matching_columns(
+                        excel_df.columns, sql_df.columns
+                    )
         
         if not column_mappings:
             self.logger.warning("No matching columns found between Excel and SQL data")
-            return {"error": "No matching columns found"}
+            return {"error": "No matching columns found"}, None
         
         # Log the column mappings for debugging
         self.logger.info("Column mappings:")
         for excel_idx, mapping in column_mappings.items():
             self.logger.info(f"Excel: '{mapping['excel_column']}' -> SQL: '{mapping['sql_column']}' (score: {mapping['match_score']:.2f})")
         
-        # Try to identify key columns for joining
-        key_columns = self._identify_key_columns(excel_df, sql_df, column_mappings)
-        if not key_columns:
-            self.logger.warning("Could not identify key columns for joining")
-            return {"error": "Could not identify key columns for joining"}
+        # Build (or reuse) the merged comparison plan for these frames
+        try:
+            plan = self.get_comparison_plan(
+                excel_df,
+                sql_df,
+                column_mappings,
+                sheet_name=sheet_name,
+                key_columns=key_columns,
+                profile=profile,
+            )
+        except ValueError as e:
+            self.logger.warning(str(e))
+            return {"error": str(e)}, None
+        profile.count("rows_merged", len(plan.merged_df))
+        profile.count("rows_matched", plan.matched_count)
 
+        key_columns = plan.key_columns
         self.logger.info(f"Using key columns for joining: {key_columns}")
 
-        excel_df, sql_df, duplicate_key_report = self._prepare_join_dataframes(
-            excel_df,
-            sql_df,
-            key_columns,
-        )
-
-        excel_keys = excel_df['_join_key']
-        sql_keys = sql_df['_join_key']
+        excel_df = plan.excel_df
+        sql_df = plan.sql_df
+        merged_df = plan.merged_df
 
         key_excel_set = {
             col for col in key_columns['excel']
@@ -196,33 +393,27 @@ class ComparisonEngine:
             col for col in key_columns['sql']
             if col != self._ROW_SEQUENCE_COLUMN
         }
-        
-        # Merge dataframes on join key
-        merged_df = pd.merge(
-            excel_df,
-            sql_df,
-            on='_join_key',
-            how='outer',
-            suffixes=('_excel', '_sql')
-        )
-        
+
         # --- Prepare for per-row sign flip ---
-        account_col_excel, account_col_sql = self._find_account_columns(merged_df.columns)
-        
+        account_col_excel, account_col_sql = plan.account_columns
+
         # Log merge results
         self.logger.info(f"Merge results - Total rows: {len(merged_df)}")
-        self.logger.info(f"Excel-only rows: {len(merged_df[merged_df['_join_key'].isin(excel_keys) & ~merged_df['_join_key'].isin(sql_keys)])}")
-        self.logger.info(f"SQL-only rows: {len(merged_df[merged_df['_join_key'].isin(sql_keys) & ~merged_df['_join_key'].isin(excel_keys)])}")
-        self.logger.info(f"Matched rows: {len(merged_df[merged_df['_join_key'].isin(excel_keys) & merged_df['_join_key'].isin(sql_keys)])}")
-        
+        self.logger.info(f"Excel-only rows: {plan.excel_only_count}")
+        self.logger.info(f"SQL-only rows: {plan.sql_only_count}")
+        self.logger.info(f"Matched rows: {plan.matched_count}")
+
         results = {
             "column_mappings": column_mappings,
             "row_count_match": excel_df.shape[0] == sql_df.shape[0],
             "row_counts": {
                 "excel": excel_df.shape[0],
                 "sql": sql_df.shape[0],
-                "matched": len(merged_df[merged_df['_join_key'].isin(excel_keys) & merged_df['_join_key'].isin(sql_keys)])
+                "matched": plan.matched_count,
+                "excel_only": plan.excel_only_count,
+                "sql_only": plan.sql_only_count,
             },
+            "missing_rows": plan.missing_rows(),
             "column_comparisons": {},
             "summary": {
                 "total_cells": 0,
@@ -230,16 +421,31 @@ class ComparisonEngine:
                 "mismatch_cells": 0,
                 "mismatch_percentage": 0
             },
-            "duplicate_keys": duplicate_key_report,
+            "duplicate_keys": plan.duplicate_keys,
             "suggested_sign_flips": set(),
+            "mismatches": MismatchStore(cap=self.mismatch_cap),
         }
-        
+
         # Prepare sign flip accounts as a set of stripped strings
-        sign_flip_accounts_str = set(str(acct).strip() for acct in self.sign_flip_accounts)
-        if sign_flip_accounts_str:
-            self.logger.info(f"Sign flip accounts (as strings): {sign_flip_accounts_str}")
+        if self.sign_flip_index:
+            self.logger.info(f"Sign flip accounts (normalized): {sorted(self.sign_flip_index.accounts)}")
         
-        # Compare each mapped column
+        # Row level inputs shared by every column, restricted to matched rows
+        matched_mask = plan.matched_mask
+        if account_col_sql:
+            account_series = merged_df[account_col_sql][matched_mask].astype(str)
+        elif account_col_excel:
+            account_series = merged_df[account_col_excel][matched_mask].astype(str)
+        else:
+            account_series = pd.Series([None] * len(merged_df))[matched_mask]
+        no_account_series = pd.Series([None] * len(account_series), index=account_series.index)
+        # Accounts are normalized for sign flips once, not once per column
+        normalized_accounts = self.sign_flip_index.normalize(account_series)
+        no_account_normalized = np.full(len(account_series), "", dtype=object)
+
+        # Gather the matched rows of each mapped column
+        compared_columns = []
+        key_pairs = set(zip(key_columns['excel'], key_columns['sql']))
         for excel_idx, mapping in column_mappings.items():
             excel_col = mapping["excel_column"]
             sql_col = mapping["sql_column"]
@@ -256,65 +462,97 @@ class ComparisonEngine:
             excel_series = merged_df[excel_merged_col]
             sql_series = merged_df[sql_merged_col]
             
-            # Get account/identifier series for this row
-            if account_col_sql:
-                account_series = merged_df[account_col_sql].astype(str)
-            elif account_col_excel:
-                account_series = merged_df[account_col_excel].astype(str)
-            else:
-                account_series = pd.Series([None]*len(merged_df))
-            
             # Log column data types and sample values for debugging
             self.logger.info(f"\nComparing column: {excel_col} -> {sql_col}")
             self.logger.info(f"Excel dtype: {excel_series.dtype}, SQL dtype: {sql_series.dtype}")
             self.logger.info(f"Excel sample values: {excel_series.head().tolist()}")
             self.logger.info(f"SQL sample values: {sql_series.head().tolist()}")
             
-            # Compare only matched rows
-            matched_mask = merged_df['_join_key'].isin(excel_keys) & merged_df['_join_key'].isin(sql_keys)
-            excel_series = excel_series[matched_mask]
-            sql_series = sql_series[matched_mask]
-            account_series_matched = account_series[matched_mask]
-
             if excel_col in key_excel_set or sql_col in key_sql_set:
-                account_series_for_compare = pd.Series(
-                    [None] * len(account_series_matched),
-                    index=account_series_matched.index,
-                )
+                account_series_for_compare = no_account_series
+                accounts_for_compare = no_account_normalized
             else:
-                account_series_for_compare = account_series_matched
-
-            col_results = row_comparison.compare_series(
-                excel_series,
-                sql_series,
-                account_series_for_compare,
-                tolerance=self.tolerance,
-                sign_flip_accounts=self.sign_flip_accounts,
-            )
+                account_series_for_compare = account_series
+                accounts_for_compare = normalized_accounts
 
-            # Merge any suggested sign flips
-            suggestions = col_results.pop("sign_flip_candidates", set())
-            if suggestions:
-                results["suggested_sign_flips"].update(suggestions)
+            excel_numeric = self._profiles.get(merged_df, excel_merged_col).coerced
+            sql_numeric = self._profiles.get(merged_df, sql_merged_col).coerced
+            if excel_numeric is not None:
+                excel_numeric = excel_numeric[matched_mask]
+            if sql_numeric is not None:
+                sql_numeric = sql_numeric[matched_mask]
+
+            # Compare only matched rows
+            compared_columns.append({
+                "excel_column": excel_col,
+                "excel": excel_series[matched_mask],
+                "sql": sql_series[matched_mask],
+                "excel_numeric": excel_numeric,
+                "sql_numeric": sql_numeric,
+                "is_numeric": (
+                    excel_numeric is not None
+                    and sql_numeric is not None
+                    and bool(excel_numeric.notna().mean() > 0.5)
+                    and bool(sql_numeric.notna().mean() > 0.5)
+                ),
+                "account_series": account_series_for_compare,
+                "accounts": accounts_for_compare,
+                "is_join_key": (excel_col, sql_col) in key_pairs,
+            })
+
+        # Rows with equal fingerprints match in every column; only the
+        # others go through the tolerance-aware comparison
+        with profile.stage("fingerprints"):
+            differing_rows = self._differing_rows(compared_columns, plan.matched_count)
+        identical_rows = plan.matched_count - len(differing_rows)
+        self.logger.info(f"Rows identical on both sides: {identical_rows}")
+        profile.count("cells_checked", len(differing_rows) * len(compared_columns))
+
+        with profile.stage("column_compare"):
+            for column in compared_columns:
+                excel_col = column["excel_column"]
+                excel_numeric = column["excel_numeric"]
+                sql_numeric = column["sql_numeric"]
+                col_results = row_comparison.compare_series(
+                    column["excel"].iloc[differing_rows],
+                    column["sql"].iloc[differing_rows],
+                    column["account_series"].iloc[differing_rows],
+                    tolerance=self.tolerance,
+                    sign_flip_accounts=self.sign_flip_accounts,
+                    sign_flip_index=self.sign_flip_index,
+                    excel_numeric=None if excel_numeric is None else excel_numeric.iloc[differing_rows],
+                    sql_numeric=None if sql_numeric is None else sql_numeric.iloc[differing_rows],
+                    mismatch_store=results["mismatches"],
+                    column=excel_col,
+                    normalized_accounts=column["accounts"][differing_rows],
+                    is_numeric=column["is_numeric"],
+                    row_numbers=differing_rows,
+                )
+                col_results["match_count"] += identical_rows
+
+                # Merge any suggested sign flips
+                suggestions = col_results.pop("sign_flip_candidates", set())
+                if suggestions:
+                    results["suggested_sign_flips"].update(suggestions)
+
+                total_cells = col_results["match_count"] + col_results["mismatch_count"]
+                col_results["match_percentage"] = (
+                    col_results["match_count"] / total_cells * 100
+                ) if total_cells > 0 else 0
+
+                # Log column comparison results
+                self.logger.info(f"Column comparison results for {excel_col}:")
+                self.logger.info(f"Matches: {col_results['match_count']}, Mismatches: {col_results['mismatch_count']}")
+                self.logger.info(f"Match percentage: {col_results['match_percentage']:.2f}%")
+
+                # Add to column comparisons
+                results["column_comparisons"][excel_col] = col_results
+
+                # Update summary
+                results["summary"]["total_cells"] += total_cells
+                results["summary"]["matching_cells"] += col_results["match_count"]
+                results["summary"]["mismatch_cells"] += col_results["mismatch_count"]
 
-            total_cells = col_results["match_count"] + col_results["mismatch_count"]
-            col_results["match_percentage"] = (
-                col_results["match_count"] / total_cells * 100
-            ) if total_cells > 0 else 0
-            
-            # Log column comparison results
-            self.logger.info(f"Column comparison results for {excel_col}:")
-            self.logger.info(f"Matches: {col_results['match_count']}, Mismatches: {col_results['mismatch_count']}")
-            self.logger.info(f"Match percentage: {col_results['match_percentage']:.2f}%")
-            
-            # Add to column comparisons
-            results["column_comparisons"][excel_col] = col_results
-            
-            # Update summary
-            results["summary"]["total_cells"] += total_cells
-            results["summary"]["matching_cells"] += col_results["match_count"]
-            results["summary"]["mismatch_cells"] += col_results["mismatch_count"]
-        
         # Calculate overall mismatch percentage
         if results["summary"]["total_cells"] > 0:
             results["summary"]["mismatch_percentage"] = (
@@ -326,11 +564,20 @@ class ComparisonEngine:
         
         self.logger.info(f"Comparison completed with {results['summary']['mismatch_percentage']:.2f}% mismatch")
 
+        profile.count("cells_compared", results["summary"]["total_cells"])
+        profile.count("mismatches", results["summary"]["mismatch_cells"])
+
         # Identify account level discrepancies for executive summary
-        try:
-            discrepancies = self.identify_account_discrepancies(excel_df, sql_df, column_mappings)
-        except Exception as e:
-            self.logger.warning(f"Account discrepancy analysis failed: {e}")
+        if discrepancies:
+            with profile.stage("discrepancies"):
+                try:
+                    discrepancies = self.identify_account_discrepancies(
+                        excel_df, sql_df, column_mappings, plan=plan
+                    )
+                except Exception as e:
+                    self.logger.warning(f"Account discrepancy analysis failed: {e}")
+                    discrepancies = pd.DataFrame()
+        else:
             discrepancies = pd.DataFrame()
 
         results["account_discrepancies"] = discrepancies
@@ -344,46 +591,251 @@ class ComparisonEngine:
             results["discrepancy_severity"] = []
 
         # Run plugin post-comparison hooks
-        for plugin in self.plugins:
-            try:
-                results = plugin.post_compare(results)
-            except Exception as e:
-                self.logger.warning(
-                    f"Plugin {plugin.__class__.__name__} failed in post_compare: {e}"
-                )
+        if self.plugins:
+            with profile.stage("plugins"):
+                for plugin in self.plugins:
+                    try:
+                        results = plugin.post_compare(results)
+                    except Exception as e:
+                        self.logger.warning(
+                            f"Plugin {plugin.__class__.__name__} failed in post_compare: {e}"
+                        )
 
-        # Store results
-        self.comparison_results = results
+        if isinstance(results, dict):
+            results["profile"] = profile.as_dict()
+        return results, plan
 
-        return results
+    def _differing_rows(self, compared_columns, row_count):
+        """Return the positions of matched rows whose fingerprints differ.
+
+        Fingerprints hash each column the way :mod:`row_comparison` compares
+        it, so rows outside the result match in every column.
+        """
+        flip_accounts = list(self.sign_flip_index.accounts)
+        excel_hashes = []
+        sql_hashes = []
+        # Infinite values never match, even when equal
+        forced = np.zeros(row_count, dtype=bool)
+        for column in compared_columns:
+            if column["is_numeric"]:
+                excel_values = column["excel_numeric"].to_numpy(dtype=float, na_value=np.nan)
+                sql_values = column["sql_numeric"].to_numpy(dtype=float, na_value=np.nan)
+                flip = np.isin(column["accounts"], flip_accounts)
+                forced |= np.isinf(excel_values) | np.isinf(sql_values)
+                excel_hashes.append(row_fingerprint.numeric_hash(excel_values))
+                sql_hashes.append(row_fingerprint.numeric_hash(sql_values, flip))
+            elif column["is_join_key"]:
+                # Matched rows share the normalized join key, so only
+                # missing values can still differ
+                excel_hashes.append(column["excel"].isna().to_numpy().astype(np.uint64))
+                sql_hashes.append(column["sql"].isna().to_numpy().astype(np.uint64))
+            else:
+                excel_hashes.append(row_fingerprint.text_hash(column["excel"]))
+                sql_hashes.append(row_fingerprint.text_hash(column["sql"]))
+        differing = (
+            row_fingerprint.combine(excel_hashes, row_count)
+            != row_fingerprint.combine(sql_hashes, row_count)
+        )
+        return np.flatnonzero(differing | forced)
+
+    def get_comparison_plan(self, excel_df, sql_df, column_mappings, sheet_name=None, key_columns=None, profile=None):
+        """Return the :class:`ComparisonPlan` for the given frames.
+
+        Plans are cached per (Excel frame, SQL frame) and reused as long as
+        the same frame objects, with unchanged contents, are passed together
+        with the same column mappings. Building a new plan for a sheet
+        replaces the previous plan of that sheet. Plans of sheets passed to
+        :meth:`pin_plans` are always kept; of the others only the
+        :attr:`MAX_CACHED_PLANS` most recently used are kept since each one
+        holds its input frames and merged frame.
+
+        ``key_columns`` (``{"excel": [...], "sql": [...]}``) skips key
+        detection, e.g. when comparing partitions of a larger dataset.
+
+        Raises ``ValueError`` if no key columns can be identified or if the
+        key columns are missing from the frames. Key detection, join key
+        building and the merge are timed in ``profile`` when given.
+        """
+        if profile is None:
+            profile = ComparisonProfile()
+        cache_key = (id(excel_df), id(sql_df))
+        # The content fingerprints validate both the cached plan and the
+        # column profiles of frames edited in place since they were built
+        fingerprints = (
+            result_cache.frame_fingerprint(excel_df), result_cache.frame_fingerprint(sql_df)
+        )
+        self._profiles.validate(excel_df, fingerprints[0])
+        self._profiles.validate(sql_df, fingerprints[1])
+        plan = self._plans.get(cache_key)
+        if plan is not None and plan.matches(excel_df, sql_df, column_mappings, fingerprints):
+            if sheet_name is not None and plan.sheet_name is None:
+                plan.sheet_name = sheet_name
+            self._plans.move_to_end(cache_key)
+            profile.count("plan_reuses")
+            return plan
+
+        if key_columns is None:
+            with profile.stage("key_detection"):
+                key_columns = self._identify_key_columns(excel_df, sql_df, column_mappings)
+        if not key_columns:
+            raise ValueError("Could not identify key columns for joining")
+
+        missing_excel = [
+            col for col in key_columns['excel']
+            if col != self._ROW_SEQUENCE_COLUMN and col not in excel_df.columns
+        ]
+        missing_sql = [
+            col for col in key_columns['sql']
+            if col != self._ROW_SEQUENCE_COLUMN and col not in sql_df.columns
+        ]
+        if missing_excel or missing_sql:
+            self.logger.warning(
+                "Key columns missing from dataframes. Excel missing: %s; SQL missing: %s",
+                missing_excel,
+                missing_sql,
+            )
+            raise ValueError("Key columns missing from dataframes")
+
+        # Only columns read by the comparison, export and discrepancy steps
+        # are carried into the join
+        with profile.stage("join_keys"):
+            prepared_excel, prepared_sql, duplicate_key_report = self._prepare_join_dataframes(
+                excel_df[self._projected_columns(
+                    excel_df,
+                    [m["excel_column"] for m in column_mappings.values()],
+                    key_columns['excel'],
+                )],
+                sql_df[self._projected_columns(
+                    sql_df,
+                    [m["sql_column"] for m in column_mappings.values()],
+                    key_columns['sql'],
+                )],
+                key_columns,
+            )
+
+        # Columns present on both full frames get the ``_excel``/``_sql``
+        # suffixes, exactly as if the unprojected frames had been merged
+        shared = (set(excel_df.columns) & set(sql_df.columns)) - {'_join_key'}
+        if (
+            self._ROW_SEQUENCE_COLUMN in key_columns['excel']
+            and self._ROW_SEQUENCE_COLUMN in key_columns['sql']
+        ):
+            shared.add(self._ROW_SEQUENCE_COLUMN)
+        with profile.stage("merge"):
+            merged_df = pd.merge(
+                prepared_excel.rename(columns={c: f"{c}_excel" for c in shared}),
+                prepared_sql.rename(columns={c: f"{c}_sql" for c in shared}),
+                on='_join_key',
+                how='outer',
+                indicator=MERGE_INDICATOR,
+            )
+
+        plan = ComparisonPlan(
+            excel_df,
+            sql_df,
+            column_mappings,
+            key_columns,
+            prepared_excel,
+            prepared_sql,
+            merged_df,
+            duplicate_key_report,
+            self._find_account_columns(merged_df.columns),
+            sheet_name=sheet_name,
+            fingerprints=fingerprints,
+        )
+
+        if sheet_name is not None:
+            self._plans = OrderedDict(
+                (key, cached) for key, cached in self._plans.items()
+                if cached.sheet_name != sheet_name
+            )
+        self._plans.pop(cache_key, None)
+        self._plans[cache_key] = plan
+        unpinned = [
+            key for key, cached in self._plans.items()
+            if cached.sheet_name not in self._pinned_sheets
+        ]
+        for key in unpinned[:max(0, len(unpinned) - self.MAX_CACHED_PLANS)]:
+            del self._plans[key]
+        return plan
+
+    def pin_plans(self, sheet_names):
+        """Keep the plans of ``sheet_names`` until :meth:`clear_plans`.
+
+        Used for the sheets of one comparison run, whose exports then reuse
+        their plans however many sheets the run covers.
+        """
+        self._pinned_sheets.update(sheet_names)
+
+    def discard_plans(self, sheet_name):
+        """Drop the cached plans of ``sheet_name``, e.g. those of chunks."""
+        self._plans = OrderedDict(
+            (key, cached) for key, cached in self._plans.items()
+            if cached.sheet_name != sheet_name
+        )
+
+    def clear_plans(self):
+        """Drop all cached comparison plans and unpin their sheets."""
+        self._plans = OrderedDict()
+        self._pinned_sheets = set()
+
+    def result_cache_key(self, excel_df, sql_df, column_mappings=None, mode="full"):
+        """Return the :attr:`result_cache` key for comparing the given frames
+
+        The key fingerprints the frame contents together with the mappings,
+        tolerance, sign flip accounts and comparison ``mode``, so a cached
+        result is only reused when a rerun would produce the same result.
+        """
+        return self.result_cache.key(self, excel_df, sql_df, column_mappings, mode)
+
+    def _projected_columns(self, df, mapped_columns, key_columns):
+        """Return the columns of ``df`` needed to compare and export it.
+
+        These are the mapped and key columns plus the Center and account
+        columns used for sign flips and export labels, in frame order.
+        """
+        wanted = set(mapped_columns) | set(key_columns) | set(self._DETAIL_COLUMNS)
+        account_names = {
+            column_profile.normalize_name(c) for c in self._ACCOUNT_CANDIDATES
+        }
+        return [
+            col for col in df.columns
+            if col in wanted or column_profile.normalize_name(col) in account_names
+        ]
 
     def _prepare_join_dataframes(self, excel_df, sql_df, key_columns):
-        """Return copies of the dataframes with a stable join key column."""
+        """Return the dataframes with a stable join key column added.
 
-        excel_copy = excel_df.copy()
-        sql_copy = sql_df.copy()
+        The frames are expected to be projections owned by the caller; they
+        gain ``_join_key`` (and the row sequence column when used). Join keys
+        are ``uint64`` hashes of the normalized key columns unless a hash
+        collision forces a fallback to string keys.
+        """
+
+        excel_copy = excel_df
+        sql_copy = sql_df
 
-        excel_keys = self._build_join_key_series(excel_copy, key_columns['excel'])
-        sql_keys = self._build_join_key_series(sql_copy, key_columns['sql'])
+        excel_normalized = self._normalize_join_columns(excel_copy, key_columns['excel'])
+        sql_normalized = self._normalize_join_columns(sql_copy, key_columns['sql'])
+
+        excel_keys, sql_keys, hashed = join_keys.build_join_keys(
+            excel_normalized, sql_normalized
+        )
+        if not hashed:
+            self.logger.info("Join key hash collision detected; using string keys")
 
         excel_copy['_join_key'] = excel_keys
         sql_copy['_join_key'] = sql_keys
 
-        excel_dup_keys = excel_keys[excel_keys.duplicated(keep=False)]
-        sql_dup_keys = sql_keys[sql_keys.duplicated(keep=False)]
-
         duplicate_key_report = {
-            "excel": excel_dup_keys.value_counts().to_dict() if not excel_dup_keys.empty else {},
-            "sql": sql_dup_keys.value_counts().to_dict() if not sql_dup_keys.empty else {},
+            "excel": join_keys.duplicate_key_counts(excel_normalized, excel_keys),
+            "sql": join_keys.duplicate_key_counts(sql_normalized, sql_keys),
         }
 
         return excel_copy, sql_copy, duplicate_key_report
 
-    def _build_join_key_series(self, df, columns):
-        """Construct a normalized join key from the provided columns."""
-
-        if not columns:
-            return pd.Series(index=df.index, dtype=str)
+    def _normalize_join_columns(self, df, columns):
+        """Return the normalized key columns used to build the join key."""
 
         special_col = self._ROW_SEQUENCE_COLUMN
         if special_col in columns:
@@ -397,20 +849,21 @@ class ComparisonEngine:
                 sequence = pd.Series(range(len(df)), index=df.index)
             df[special_col] = sequence
 
-        normalized = (
-            df[columns]
-            .astype(str)
-            .apply(lambda s: s.str.strip().str.lower())
-            .agg('-'.join, axis=1)
-        )
-
-        return normalized
+        return join_keys.normalize_key_columns(df, columns)
 
     def _identify_key_columns(self, excel_df, sql_df, column_mappings):
         """Identify key columns for joining Excel and SQL data"""
+        key_columns = self._base_key_columns(excel_df, sql_df, column_mappings)
+        if not key_columns:
+            return None
+        return self._ensure_unique_key_columns(
+            excel_df, sql_df, key_columns, column_mappings
+        )
+
+    def _base_key_columns(self, excel_df, sql_df, column_mappings):
+        """Return the Center/Account style key columns before they are made unique."""
 
-        def _norm(name: str) -> str:
-            return re.sub(r"[\s_]+", "", str(name)).lower()
+        _norm = column_profile.normalize_name
 
         center_synonyms = {
             "center",
@@ -451,32 +904,16 @@ class ComparisonEngine:
             ]
 
             if key_columns:
-                return self._ensure_unique_key_columns(
-                    excel_df,
-                    sql_df,
-                    {"excel": key_columns, "sql": key_columns},
-                    column_mappings,
-                )
-
-            def _is_non_numeric(series):
-                try:
-                    ratio = pd.to_numeric(series, errors="coerce").notna().mean()
-                    return ratio < 0.5
-                except Exception:
-                    return True
+                return {"excel": key_columns, "sql": key_columns}
 
             text_cols = [
                 col
                 for col in excel_df.columns
-                if _is_non_numeric(excel_df[col]) and _is_non_numeric(sql_df[col])
+                if self._profiles.get(excel_df, col).is_text
+                and self._profiles.get(sql_df, col).is_text
             ]
             if text_cols:
-                return self._ensure_unique_key_columns(
-                    excel_df,
-                    sql_df,
-                    {"excel": text_cols, "sql": text_cols},
-                    column_mappings,
-                )
+                return {"excel": text_cols, "sql": text_cols}
 
             return None
 
@@ -520,12 +957,7 @@ class ComparisonEngine:
                     break
 
         if center_found or acct_found:
-            return self._ensure_unique_key_columns(
-                excel_df,
-                sql_df,
-                key_columns,
-                column_mappings,
-            )
+            return key_columns
 
         def _match_direct(columns_a, columns_b, synonyms, keywords):
             source_col = None
@@ -565,47 +997,38 @@ class ComparisonEngine:
             acct_found = True
 
         if center_found or acct_found:
-            return self._ensure_unique_key_columns(
-                excel_df,
-                sql_df,
-                key_columns,
-                column_mappings,
-            )
+            return key_columns
         
 
         # If we didn't find both key columns, try to find any columns that match
         # exactly. Filter out columns that appear to be mostly numeric to avoid
         # using value columns as join keys.
-        def _is_non_numeric(series):
-            try:
-                ratio = pd.to_numeric(series, errors="coerce").notna().mean()
-                return ratio < 0.5
-            except Exception:
-                return True
-
         text_matches = []
         for mapping in column_mappings.values():
             if mapping['match_score'] == 1.0:
                 ec = mapping['excel_column']
                 sc = mapping['sql_column']
-                if _is_non_numeric(excel_df[ec]) and _is_non_numeric(sql_df[sc]):
+                if (
+                    self._profiles.get(excel_df, ec).is_text
+                    and self._profiles.get(sql_df, sc).is_text
+                ):
                     text_matches.append({'excel': ec, 'sql': sc})
 
         if text_matches:
-            return self._ensure_unique_key_columns(
-                excel_df,
-                sql_df,
-                {
-                    'excel': [m['excel'] for m in text_matches],
-                    'sql': [m['sql'] for m in text_matches],
-                },
-                column_mappings,
-            )
+            return {
+                'excel': [m['excel'] for m in text_matches],
+                'sql': [m['sql'] for m in text_matches],
+            }
 
         return None
 
     def _ensure_unique_key_columns(self, excel_df, sql_df, key_columns, column_mappings):
-        """Augment the provided key columns until join keys are unique."""
+        """Augment the provided key columns until join keys are unique.
+
+        Row group ids are refined one candidate column at a time, so each
+        candidate costs a single factorize pass over each frame and the search
+        stops as soon as both sides are unique.
+        """
 
         if not key_columns:
             return None
@@ -616,40 +1039,23 @@ class ComparisonEngine:
         if not excel_cols or not sql_cols:
             return None
 
-        def build_keys(df, cols):
-            if not cols:
-                return pd.Series(dtype=str)
-            missing = [col for col in cols if col not in df.columns]
-            if missing:
-                raise KeyError(missing)
-            return (
-                df[cols]
-                .astype(str)
-                .apply(lambda s: s.str.strip().str.lower())
-                .agg('-'.join, axis=1)
-            )
+        if any(col not in excel_df.columns for col in excel_cols) or any(
+            col not in sql_df.columns for col in sql_cols
+        ):
+            # Missing key columns are reported by the caller
+            return {'excel': excel_cols, 'sql': sql_cols}
 
-        def has_duplicates():
-            try:
-                excel_keys = build_keys(excel_df, excel_cols)
-                sql_keys = build_keys(sql_df, sql_cols)
-            except KeyError:
-                return False
-            return excel_keys.duplicated().any() or sql_keys.duplicated().any()
+        excel_ids, excel_groups = join_keys.group_ids(excel_df, excel_cols)
+        sql_ids, sql_groups = join_keys.group_ids(sql_df, sql_cols)
 
-        if not has_duplicates():
-            return {'excel': excel_cols, 'sql': sql_cols}
+        def is_unique():
+            return excel_groups == len(excel_df) and sql_groups == len(sql_df)
 
-        def is_non_numeric(series):
-            try:
-                ratio = pd.to_numeric(series, errors='coerce').notna().mean()
-                return ratio < 0.5
-            except Exception:
-                return True
+        if is_unique():
+            return {'excel': excel_cols, 'sql': sql_cols}
 
         def column_priority(name):
-            norm = re.sub(r"[\s_]+", "", str(name)).lower()
-            if any(keyword in norm for keyword in ("month", "period", "date", "year", "week", "quarter")):
+            if column_profile.detect_role(name) == column_profile.ROLE_PERIOD:
                 return 0
             return 1
 
@@ -661,105 +1067,207 @@ class ComparisonEngine:
                 continue
             if excel_col not in excel_df.columns or sql_col not in sql_df.columns:
                 continue
-            if is_non_numeric(excel_df[excel_col]) and is_non_numeric(sql_df[sql_col]):
-                candidate_pairs.append((column_priority(excel_col), excel_col, sql_col))
+            candidate_pairs.append((column_priority(excel_col), excel_col, sql_col))
 
         candidate_pairs.sort()
 
+        # Numeric checks run lazily so candidates after the first unique
+        # combination are never profiled.
         for _, excel_candidate, sql_candidate in candidate_pairs:
+            if not (
+                self._profiles.get(excel_df, excel_candidate).is_text
+                and self._profiles.get(sql_df, sql_candidate).is_text
+            ):
+                continue
             excel_cols.append(excel_candidate)
             sql_cols.append(sql_candidate)
-            if not has_duplicates():
+            if excel_groups < len(excel_df):
+                excel_ids, excel_groups = join_keys.refine_group_ids(
+                    excel_ids, excel_df[excel_candidate]
+                )
+            if sql_groups < len(sql_df):
+                sql_ids, sql_groups = join_keys.refine_group_ids(
+                    sql_ids, sql_df[sql_candidate]
+                )
+            if is_unique():
                 return {'excel': excel_cols, 'sql': sql_cols}
 
         excel_cols.append(self._ROW_SEQUENCE_COLUMN)
         sql_cols.append(self._ROW_SEQUENCE_COLUMN)
         return {'excel': excel_cols, 'sql': sql_cols}
 
-    def identify_account_discrepancies(self, excel_df, sql_df, column_mappings=None):
+    DISCREPANCY_COLUMNS = [
+        'Center', 'Account', 'Column', 'Excel', 'SQL',
+        'Variance', 'Missing in Excel', 'Missing in SQL',
+    ]
+
+    def identify_account_discrepancies(
+        self,
+        excel_df,
+        sql_df,
+        column_mappings=None,
+        plan=None,
+        key_columns=None,
+        value_columns=None,
+        classify=True,
+        group_column=None,
+    ):
         """Identify accounts with large variances or missing rows.
 
-        The method groups data by Center and Account (CAReportName) and compares
-        the total numeric value for the first detected numeric column. Accounts
-        with totals that differ by more than the comparison tolerance or that
-        are missing in one of the sources are returned.
+        The method groups data by Center and Account (CAReportName) and
+        compares the totals of every mapped numeric column in one pass. The
+        result has one row per flagged (Center, Account, Column): totals that
+        differ by more than the comparison tolerance, or accounts missing in
+        one of the sources.
+
+        When a :class:`ComparisonPlan` is supplied its key columns are reused
+        instead of being detected again. ``key_columns`` and ``value_columns``
+        (a list of ``(excel column, sql column)`` pairs) may fix the grouping
+        and summed columns, which is needed when one side has no rows.
+        ``classify=False`` leaves out the ``Severity`` column for callers
+        that classify several parts of a sheet together. ``group_column``
+        (present in both frames) adds a grouping level in front of Center,
+        e.g. the sheet tag of stacked sheets, and is returned as the first
+        column.
         """
 
         if column_mappings is None:
             column_mappings = self.find_matching_columns(excel_df.columns, sql_df.columns)
 
-        key_cols = self._identify_key_columns(excel_df, sql_df, column_mappings)
+        if key_columns is not None:
+            key_cols = key_columns
+        elif plan is not None:
+            key_cols = plan.key_columns
+        else:
+            key_cols = self._identify_key_columns(excel_df, sql_df, column_mappings)
         if not key_cols or len(key_cols['excel']) < 2:
             self.logger.warning("Could not identify key columns for discrepancy analysis")
-            return pd.DataFrame(columns=[
-                'Center', 'Account', 'Excel Total', 'SQL Total',
-                'Variance', 'Missing in Excel', 'Missing in SQL'
-            ])
+            return pd.DataFrame(columns=self.DISCREPANCY_COLUMNS)
 
         center_excel, account_excel = key_cols['excel'][:2]
         center_sql, account_sql = key_cols['sql'][:2]
 
-        # Determine a numeric column to sum
-        numeric_pair = None
-        for mapping in column_mappings.values():
-            if mapping['excel_column'] in key_cols['excel']:
-                continue
-            try:
-                excel_ratio = pd.to_numeric(excel_df[mapping['excel_column']], errors='coerce').notna().mean()
-                sql_ratio = pd.to_numeric(sql_df[mapping['sql_column']], errors='coerce').notna().mean()
-                if excel_ratio > 0.5 and sql_ratio > 0.5:
-                    numeric_pair = (mapping['excel_column'], mapping['sql_column'])
-                    break
-            except Exception:
-                continue
+        # Determine the numeric columns to sum
+        if value_columns is None:
+            value_columns = self._discrepancy_value_columns(
+                excel_df, sql_df, column_mappings, key_cols
+            )
 
-        if not numeric_pair:
+        if not value_columns:
             self.logger.warning("No numeric columns found for discrepancy analysis")
-            return pd.DataFrame(columns=[
-                'Center', 'Account', 'Excel Total', 'SQL Total',
-                'Variance', 'Missing in Excel', 'Missing in SQL'
-            ])
-
-        excel_col, sql_col = numeric_pair
-
-        excel_tmp = excel_df[[center_excel, account_excel, excel_col]].copy()
-        sql_tmp = sql_df[[center_sql, account_sql, sql_col]].copy()
-        excel_tmp.columns = ['Center', 'Account', 'Excel']
-        sql_tmp.columns = ['Center', 'Account', 'SQL']
-
-        excel_tmp['Excel'] = pd.to_numeric(excel_tmp['Excel'], errors='coerce')
-        sql_tmp['SQL'] = pd.to_numeric(sql_tmp['SQL'], errors='coerce')
-
-        sign_flip_set = set(str(a).strip() for a in self.sign_flip_accounts)
-        if sign_flip_set:
-            sql_tmp.loc[sql_tmp['Account'].astype(str).isin(sign_flip_set), 'SQL'] *= -1
-
-        excel_group = excel_tmp.groupby(['Center', 'Account'], dropna=False)['Excel'].sum().reset_index()
-        sql_group = sql_tmp.groupby(['Center', 'Account'], dropna=False)['SQL'].sum().reset_index()
-
-        merged = pd.merge(excel_group, sql_group, on=['Center', 'Account'], how='outer', indicator=True)
-        merged['Excel'] = merged['Excel'].fillna(0)
-        merged['SQL'] = merged['SQL'].fillna(0)
-        merged['Variance'] = merged['Excel'] - merged['SQL']
-        merged['Missing in Excel'] = merged['_merge'] == 'right_only'
-        merged['Missing in SQL'] = merged['_merge'] == 'left_only'
-
-        tol = self.tolerance
-        def needs_flag(row):
-            if row['Missing in Excel'] or row['Missing in SQL']:
-                return True
-            max_val = max(abs(row['Excel']), abs(row['SQL']))
-            threshold = tol * max_val
-            return abs(row['Variance']) > threshold
+            return pd.DataFrame(columns=self.DISCREPANCY_COLUMNS)
 
-        flagged = merged[merged.apply(needs_flag, axis=1)].copy()
-        flagged.drop(columns=['_merge'], inplace=True)
+        # Both sides share one set of (Center, Account) group ids, sorted by
+        # key, so totals are summed per column with bincount and no merge
+        center_codes, center_values = self._sorted_codes(
+            pd.concat([excel_df[center_excel], sql_df[center_sql]], ignore_index=True)
+        )
+        account_codes, account_values = self._sorted_codes(
+            pd.concat([excel_df[account_excel], sql_df[account_sql]], ignore_index=True)
+        )
+        pairs = center_codes.astype(np.int64) * len(account_values) + account_codes
+        center_account_count = len(center_values) * len(account_values)
+        if group_column is not None:
+            level_codes, level_values = self._sorted_codes(
+                pd.concat([excel_df[group_column], sql_df[group_column]], ignore_index=True)
+            )
+            pairs = pairs + level_codes.astype(np.int64) * center_account_count
+        group_pairs, group_ids = np.unique(pairs, return_inverse=True)
+        group_ids = group_ids.reshape(-1)
+        n_groups = len(group_pairs)
+        excel_ids = group_ids[:len(excel_df)]
+        sql_ids = group_ids[len(excel_df):]
+
+        missing_excel = np.bincount(excel_ids, minlength=n_groups) == 0
+        missing_sql = np.bincount(sql_ids, minlength=n_groups) == 0
+        sql_signs = (
+            self.sign_flip_index.signs(sql_df[account_sql])
+            if self.sign_flip_index else None
+        )
+
+        # Totals are flagged one column at a time so only the flagged cells
+        # are kept: (group, column, Excel total, SQL total)
+        flagged_parts = []
+        any_flagged = np.zeros(n_groups, dtype=bool)
+        for i, (excel_col, sql_col) in enumerate(value_columns):
+            excel_values = np.nan_to_num(self._profiles.get(excel_df, excel_col).numeric)
+            sql_values = np.nan_to_num(self._profiles.get(sql_df, sql_col).numeric)
+            if sql_signs is not None:
+                sql_values = sql_values * sql_signs
+            excel_totals = np.bincount(excel_ids, weights=excel_values, minlength=n_groups)
+            sql_totals = np.bincount(sql_ids, weights=sql_values, minlength=n_groups)
+            threshold = self.tolerance * np.maximum(np.abs(excel_totals), np.abs(sql_totals))
+            flag = np.abs(excel_totals - sql_totals) > threshold
+            if i == 0:
+                # Missing accounts are always reported, on their first
+                # column when none of their totals differ
+                first_totals = (excel_totals, sql_totals)
+            any_flagged |= flag
+            groups = np.flatnonzero(flag)
+            flagged_parts.append(
+                (groups, np.full(len(groups), i), excel_totals[groups], sql_totals[groups])
+            )
+        groups = np.flatnonzero((missing_excel | missing_sql) & ~any_flagged)
+        flagged_parts.append(
+            (groups, np.zeros(len(groups), dtype=int), first_totals[0][groups], first_totals[1][groups])
+        )
+
+        groups, columns, excel_flagged, sql_flagged = (
+            np.concatenate(values) for values in zip(*flagged_parts)
+        )
+        order = np.lexsort((columns, groups))
+        groups, columns = groups[order], columns[order]
+        excel_flagged, sql_flagged = excel_flagged[order], sql_flagged[order]
+
+        excel_column_names = np.array([excel_col for excel_col, _ in value_columns], dtype=object)
+        group_pairs = group_pairs[groups]
+        center_account = group_pairs % center_account_count
+        flagged = pd.DataFrame({
+            'Center': center_values.take(center_account // len(account_values)),
+            'Account': account_values.take(center_account % len(account_values)),
+            'Column': excel_column_names[columns],
+            'Excel': excel_flagged,
+            'SQL': sql_flagged,
+            'Variance': excel_flagged - sql_flagged,
+            'Missing in Excel': missing_excel[groups],
+            'Missing in SQL': missing_sql[groups],
+        })
+
+        if group_column is not None:
+            flagged.insert(
+                0, group_column, level_values.take(group_pairs // center_account_count)
+            )
 
-        # Classify discrepancies by severity
-        flagged = discrepancy_classifier.classify(flagged)
+        # Classify all columns' discrepancies by severity in one batch
+        if classify:
+            flagged = discrepancy_classifier.classify(flagged)
 
         return flagged
 
+    @staticmethod
+    def _sorted_codes(values):
+        """Factorize ``values`` with sorted uniques and missing values as a group."""
+        try:
+            return join_keys.factorize_keeping_missing(values, sort=True)
+        except TypeError:
+            # Mixed types cannot be ordered
+            return join_keys.factorize_keeping_missing(values)
+
+    def _discrepancy_value_columns(self, excel_df, sql_df, column_mappings, key_cols):
+        """Return the mapped ``(excel, sql)`` pairs that are numeric on both sides."""
+        pairs = []
+        for mapping in column_mappings.values():
+            if mapping['excel_column'] in key_cols['excel'] or mapping['sql_column'] in key_cols['sql']:
+                continue
+            try:
+                excel_profile = self._profiles.get(excel_df, mapping['excel_column'])
+                sql_profile = self._profiles.get(sql_df, mapping['sql_column'])
+                if excel_profile.is_numeric and sql_profile.is_numeric:
+                    pairs.append((mapping['excel_column'], mapping['sql_column']))
+            except Exception:
+                continue
+        return pairs
+
     def explain_variances(self, discrepancies_df):
         """Return human readable messages explaining each discrepancy."""
         messages = []
@@ -770,14 +1278,16 @@ class ComparisonEngine:
             center = row.get("Center")
             account = row.get("Account")
             variance = row.get("Variance")
+            column = row.get("Column")
+            in_column = f" in {column}" if isinstance(column, str) and column else ""
             if row.get("Missing in Excel"):
                 msg = f"Account {account} in Center {center} is missing in Excel"
             elif row.get("Missing in SQL"):
                 msg = (
-                    f"Variance of {variance} due to missing in SQL for Account {account} in Center {center}"
+                    f"Variance of {variance}{in_column} due to missing in SQL for Account {account} in Center {center}"
                 )
             else:
-                msg = f"Variance of {variance} for Account {account} in Center {center}"
+                msg = f"Variance of {variance}{in_column} for Account {account} in Center {center}"
             messages.append(msg)
 
         return messages
@@ -790,12 +1300,14 @@ class ComparisonEngine:
             self.logger.warning("No comparison results available")
             return "No comparison results available."
 
-        if mismatches_df is None:
+        last_plan = getattr(self, "_last_plan", None)
+        if mismatches_df is None and last_plan is not None:
             try:
                 mismatches_df = self.generate_detailed_comparison_dataframe(
                     sheet_name,
-                    getattr(self, "_last_excel_df", None),
-                    getattr(self, "_last_sql_df", None),
+                    last_plan.excel_source,
+                    last_plan.sql_source,
+                    last_plan.column_mappings,
                 )
             except Exception:
                 mismatches_df = None
@@ -818,68 +1330,36 @@ class ComparisonEngine:
         column_mappings=None,
         report_type=None,
         pivot_results=False,
+        key_columns=None,
     ):
         """Generate a DataFrame with all matches, mismatches, and missing records
         for export.
 
         ``report_type`` allows callers to omit certain columns (e.g. ``Center`` or
         sheet name) when not relevant to the report being exported.
+        ``key_columns`` fixes the join columns; one of the frames may then be
+        empty, as in the buckets of a chunked comparison.
         """
-        # Run the comparison to get the merged DataFrame and mappings
+        # Reuse the merged comparison plan when this sheet was already compared
         if column_mappings is None:
             column_mappings = self.find_matching_columns(excel_df.columns, sql_df.columns)
-        key_columns = self._identify_key_columns(excel_df, sql_df, column_mappings)
-        if not key_columns:
-            raise ValueError("Could not identify key columns for joining")
 
-        # Validate input DataFrames before building join keys
-        if excel_df.empty or sql_df.empty:
+        if (excel_df.empty and sql_df.empty) or (
+            key_columns is None and (excel_df.empty or sql_df.empty)
+        ):
             self.logger.warning("One or both dataframes are empty")
             return pd.DataFrame()
 
-        required_excel_cols = [
-            col for col in key_columns['excel']
-            if col != self._ROW_SEQUENCE_COLUMN
-        ]
-        required_sql_cols = [
-            col for col in key_columns['sql']
-            if col != self._ROW_SEQUENCE_COLUMN
-        ]
-
-        missing_excel = [col for col in required_excel_cols if col not in excel_df.columns]
-        missing_sql = [col for col in required_sql_cols if col not in sql_df.columns]
-        if missing_excel or missing_sql:
-            self.logger.warning(
-                "Key columns missing from dataframes. Excel missing: %s; SQL missing: %s",
-                missing_excel,
-                missing_sql,
-            )
-            raise ValueError("Key columns missing from dataframes")
-        
-        # Prepare sign flip accounts as a set of stripped strings
-        sign_flip_accounts_str = set(str(acct).strip() for acct in getattr(self, 'sign_flip_accounts', set()))
-        
-        excel_df, sql_df, _ = self._prepare_join_dataframes(
-            excel_df,
-            sql_df,
-            key_columns,
-        )
-
-        merged_df = pd.merge(
-            excel_df,
-            sql_df,
-            on='_join_key',
-            how='outer',
-            suffixes=('_excel', '_sql')
+        plan = self.get_comparison_plan(
+            excel_df, sql_df, column_mappings, sheet_name=sheet_name, key_columns=key_columns
         )
+        key_columns = plan.key_columns
+        merged_df = plan.merged_df
 
-        # Try to find the account column in the merged dataframe
-        account_col_excel, account_col_sql = self._find_account_columns(merged_df.columns)
+        # Account columns were located in the merged dataframe by the plan
+        account_col_excel, account_col_sql = plan.account_columns
 
         include_center = report_type not in ("SOO MFR", "Corp SOO")
-        # Always include the sheet name so exports contain a reference to
-        # which tab the result came from.
-        include_sheet = True
 
         key_excel_set = {
             col for col in key_columns['excel']
@@ -890,7 +1370,7 @@ class ComparisonEngine:
             if col != self._ROW_SEQUENCE_COLUMN
         }
 
-        output_rows = []
+        value_pairs = []
         for excel_idx, mapping in column_mappings.items():
             excel_col = mapping["excel_column"]
             sql_col = mapping["sql_column"]
@@ -898,81 +1378,17 @@ class ComparisonEngine:
             sql_merged_col = f"{sql_col}_sql"
             if excel_merged_col not in merged_df.columns or sql_merged_col not in merged_df.columns:
                 continue
-            for idx, row in merged_df.iterrows():
-                center = row.get('Center_excel') or row.get('Center_sql') or ''
-                careport = (
-                    row.get('CAReportName_excel')
-                    or row.get('CAReportName_sql')
-                    or (row.get(account_col_excel) if account_col_excel else None)
-                    or (row.get(account_col_sql) if account_col_sql else None)
-                    or ''
-                )
-                # Report the SQL column name in the output so mismatches show
-                # which field in the database caused the difference.
-                field = sql_col
-                excel_val = row.get(excel_merged_col, None)
-                sql_val = row.get(sql_merged_col, None)
-                # Get account value for sign flip
-                acct = row.get(account_col_sql) or row.get(account_col_excel) or ''
-                acct_str = str(acct).strip()
-                match = re.search(r'\d{4}-\d{4}', acct_str)
-                acct_extracted = match.group(0) if match else acct_str
-                # Apply sign flip if needed
-                sql_val_flipped = sql_val
-                allow_sign_flip = not (excel_col in key_excel_set or sql_col in key_sql_set)
-                if sql_val is not None and sql_val != 'NULL' and pd.notna(sql_val):
-                    try:
-                        numeric_sql = float(sql_val)
-                        if allow_sign_flip and acct_extracted in sign_flip_accounts_str:
-                            sql_val_flipped = -numeric_sql
-                        else:
-                            sql_val_flipped = numeric_sql
-                    except Exception:
-                        sql_val_flipped = sql_val
-                # Determine result
-                if pd.isna(excel_val) and pd.isna(sql_val):
-                    continue  # Both missing, skip
-                elif pd.isna(excel_val):
-                    result = 'Missing in Excel'
-                    variance = ''
-                    excel_val_out = 'NULL'
-                    sql_val_out = sql_val_flipped
-                elif pd.isna(sql_val):
-                    result = 'Missing in Database'
-                    variance = ''
-                    excel_val_out = excel_val
-                    sql_val_out = 'NULL'
-                else:
-                    try:
-                        excel_num = float(excel_val)
-                        sql_num = float(sql_val_flipped)
-                        variance = excel_num - sql_num
-                        is_match = abs(variance) <= self.tolerance
-                    except Exception:
-                        variance = ''
-                        excel_str = str(excel_val).strip().lower()
-                        sql_str = str(sql_val_flipped).strip().lower()
-                        is_match = excel_str == sql_str
-                    result = 'Match' if is_match else 'Does Not Match'
-                    excel_val_out = excel_val
-                    sql_val_out = sql_val_flipped
-                row_data = {
-                    'Field': field,
-                    'Excel Value': excel_val_out,
-                    'DataBase Value': sql_val_out,
-                    'Variance': variance,
-                    'Result': result,
-                }
-                # Describe any problem in a human readable form
-                row_data['Issue'] = result if result != 'Match' else ''
-                if include_sheet:
-                    row_data['Sheet'] = sheet_name
-                if include_center:
-                    row_data['Center'] = center
-                row_data['CAReport Name'] = careport
-                output_rows.append(row_data)
-
-        df = pd.DataFrame(output_rows)
+            allow_sign_flip = not (excel_col in key_excel_set or sql_col in key_sql_set)
+            value_pairs.append((excel_merged_col, sql_merged_col, sql_col, allow_sign_flip))
+
+        df = self._build_detail_frame(
+            merged_df,
+            value_pairs,
+            sheet_name,
+            account_col_excel,
+            account_col_sql,
+            include_center,
+        )
         if pivot_results and not df.empty:
             id_cols = [c for c in ['Sheet', 'Center', 'CAReport Name'] if c in df.columns]
             value_cols = ['Excel Value', 'DataBase Value', 'Variance', 'Result']
@@ -987,7 +1403,7 @@ class ComparisonEngine:
         # Normalize sheet column to ensure consistent output
         sheet_synonyms = [
             c for c in df.columns
-            if re.sub(r"[\s_]+", "", str(c)).lower() in ("sheet", "sheetname")
+            if column_profile.detect_role(c) == column_profile.ROLE_SHEET
         ]
         if sheet_synonyms:
             main_col = sheet_synonyms[0]
@@ -1004,3 +1420,132 @@ class ComparisonEngine:
             df['CAReportName'] = df['CAReport Name']
 
         return df
+
+    @staticmethod
+    def _first_truthy(merged_df, columns, default=''):
+        """Return the first truthy value per row across ``columns``.
+
+        Mirrors ``a or b or default`` evaluated row by row. Columns that are
+        ``None`` or absent from ``merged_df`` are skipped.
+        """
+        def is_truthy(value):
+            try:
+                return bool(value)
+            except (TypeError, ValueError):
+                return True
+
+        result = np.full(len(merged_df), default, dtype=object)
+        pending = np.ones(len(merged_df), dtype=bool)
+        for col in columns:
+            if col is None or col not in merged_df.columns or not pending.any():
+                continue
+            values = merged_df[col].to_numpy(dtype=object)
+            truthy = np.fromiter(map(is_truthy, values), dtype=bool, count=len(values))
+            take = pending & truthy
+            result[take] = values[take]
+            pending &= ~truthy
+        return result
+
+    def _build_detail_frame(
+        self,
+        merged_df,
+        value_pairs,
+        sheet_name,
+        account_col_excel,
+        account_col_sql,
+        include_center,
+    ):
+        """Classify every mapped cell of ``merged_df`` in long format.
+
+        ``value_pairs`` holds ``(excel_merged_col, sql_merged_col, field,
+        allow_sign_flip)`` tuples. All columns are melted into a single long
+        frame and classified as Match / Does Not Match / Missing in Excel /
+        Missing in Database with array operations.
+        """
+        if not value_pairs or merged_df.empty:
+            return pd.DataFrame()
+
+        n_rows = len(merged_df)
+        n_cols = len(value_pairs)
+
+        # Long format: one block of rows per mapped column, in mapping order
+        excel_wide = merged_df[[p[0] for p in value_pairs]].astype(object)
+        sql_wide = merged_df[[p[1] for p in value_pairs]].astype(object)
+        excel_wide.columns = range(n_cols)
+        sql_wide.columns = range(n_cols)
+        excel_long = excel_wide.melt(value_name='excel')
+        sql_long = sql_wide.melt(value_name='sql')
+
+        field = np.repeat(np.array([p[2] for p in value_pairs], dtype=object), n_rows)
+        allow_flip = np.repeat(np.array([p[3] for p in value_pairs], dtype=bool), n_rows)
+
+        # Row level attributes are computed once and tiled across columns
+        center = self._first_truthy(merged_df, ['Center_excel', 'Center_sql'])
+        careport = self._first_truthy(
+            merged_df,
+            ['CAReportName_excel', 'CAReportName_sql', account_col_excel, account_col_sql],
+        )
+        acct = self._first_truthy(merged_df, [account_col_sql, account_col_excel])
+        account_flip = self.sign_flip_index.mask(acct)
+        flip = allow_flip & np.tile(account_flip, n_cols)
+
+        excel_vals = excel_long['excel']
+        sql_vals = sql_long['sql']
+        excel_na = excel_vals.isna().to_numpy()
+        sql_na = sql_vals.isna().to_numpy()
+
+        # Numeric SQL values are converted to floats and sign flipped
+        sql_num = pd.to_numeric(sql_vals, errors='coerce').to_numpy(dtype=float)
+        sql_is_num = ~sql_na & ~np.isnan(sql_num) & (sql_vals != 'NULL').to_numpy()
+        sql_flipped = sql_vals.to_numpy(dtype=object).copy()
+        sql_flipped[sql_is_num] = np.where(flip, -sql_num, sql_num)[sql_is_num]
+
+        excel_num = pd.to_numeric(excel_vals, errors='coerce').to_numpy(dtype=float)
+        both = ~excel_na & ~sql_na
+        numeric = both & ~np.isnan(excel_num) & sql_is_num
+        textual = both & ~numeric
+
+        variance = np.full(len(excel_vals), '', dtype=object)
+        is_match = np.zeros(len(excel_vals), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            diff = excel_num - np.where(flip, -sql_num, sql_num)
+            is_match[numeric] = np.abs(diff[numeric]) <= self.tolerance
+        variance[numeric] = diff[numeric]
+        if textual.any():
+            excel_text = pd.Series(
+                [str(v) for v in excel_vals[textual]], dtype=object
+            ).str.strip().str.lower()
+            sql_text = pd.Series(
+                [str(v) for v in sql_flipped[textual]], dtype=object
+            ).str.strip().str.lower()
+            is_match[textual] = excel_text.to_numpy() == sql_text.to_numpy()
+
+        result = np.where(is_match, 'Match', 'Does Not Match').astype(object)
+        result[excel_na] = 'Missing in Excel'
+        result[~excel_na & sql_na] = 'Missing in Database'
+
+        excel_out = excel_vals.to_numpy(dtype=object).copy()
+        excel_out[excel_na] = 'NULL'
+        sql_out = sql_flipped
+        sql_out[~excel_na & sql_na] = 'NULL'
+
+        # Rows missing on both sides are skipped
+        keep = ~(excel_na & sql_na)
+        data = {
+            'Field': field[keep],
+            'Excel Value': excel_out[keep],
+            'DataBase Value': sql_out[keep],
+            'Variance': variance[keep],
+            'Result': result[keep],
+        }
+        data['Issue'] = np.where(result[keep] == 'Match', '', result[keep]).astype(object)
+        # Always include the sheet name so exports contain a reference to
+        # which tab the result came from.
+        data['Sheet'] = np.full(int(keep.sum()), sheet_name, dtype=object)
+        if include_center:
+            data['Center'] = np.tile(center, n_cols)[keep]
+        data['CAReport Name'] = np.tile(careport, n_cols)[keep]
+
+        if not keep.any():
+            return pd.DataFrame()
+        return pd.DataFrame(data).infer_objects()
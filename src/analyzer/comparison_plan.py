@@ -0,0 +1,163 @@
+"""Merged comparison plan shared by the comparison, export and discrepancy steps."""
+
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from .result_cache import frame_fingerprint
+
+# Indicator column added by the merge: left_only, right_only or both
+MERGE_INDICATOR = "_merge"
+MISSING_IN_EXCEL = "Missing in Excel"
+MISSING_IN_DATABASE = "Missing in Database"
+# Key column numbering duplicate keys, added when other keys are not unique
+ROW_SEQUENCE_COLUMN = "__row_sequence__"
+
+
+def mapping_signature(column_mappings: Optional[Dict]) -> Tuple:
+    """Return a hashable description of ``column_mappings``."""
+    if not column_mappings:
+        return ()
+    return tuple(
+        (m.get("excel_column"), m.get("sql_column"))
+        for m in column_mappings.values()
+    )
+
+
+def frame_signature(df: pd.DataFrame) -> Tuple:
+    """Return a cheap structural fingerprint used to detect in-place edits."""
+    return (df.shape, tuple(df.columns))
+
+
+def missing_rows_frame(key_values: pd.DataFrame, result: str) -> pd.DataFrame:
+    """Return ``key_values`` labelled with ``result`` as a missing-row table."""
+    missing = key_values.reset_index(drop=True)
+    missing["Result"] = result
+    return missing
+
+
+def _restore_dtypes(df: pd.DataFrame, dtypes) -> pd.DataFrame:
+    for col, dtype in zip(df.columns, dtypes):
+        if df[col].dtype != dtype and not df[col].isna().any():
+            try:
+                df[col] = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return df
+
+
+class ComparisonPlan:
+    """Key columns, join keys, merged frame and row masks for one sheet.
+
+    A plan is built once per (sheet, Excel frame, SQL frame) by
+    :class:`~src.analyzer.comparison_engine.ComparisonEngine` and reused by
+    ``compare_dataframes``, ``generate_detailed_comparison_dataframe`` and
+    ``identify_account_discrepancies`` so the key detection and merge only
+    run once. Tolerance and sign flips are applied by the consumers, so a
+    plan stays valid when those settings change.
+    """
+
+    def __init__(
+        self,
+        excel_source,
+        sql_source,
+        column_mappings,
+        key_columns,
+        excel_df,
+        sql_df,
+        merged_df,
+        duplicate_keys,
+        account_columns,
+        sheet_name=None,
+        fingerprints=None,
+    ):
+        self.sheet_name = sheet_name
+        self.excel_source = excel_source
+        self.sql_source = sql_source
+        self.column_mappings = column_mappings
+        self.key_columns = key_columns
+        self.excel_df = excel_df
+        self.sql_df = sql_df
+        self.merged_df = merged_df
+        self.duplicate_keys = duplicate_keys
+        self.account_columns = account_columns
+
+        self._signature = (
+            mapping_signature(column_mappings),
+            frame_signature(excel_source),
+            frame_signature(sql_source),
+        )
+        # Frames edited in place keep their shape and columns, so the
+        # contents are fingerprinted too
+        self._fingerprints = fingerprints or (
+            frame_fingerprint(excel_source), frame_fingerprint(sql_source)
+        )
+
+        # Row sides come from the merge indicator, read once
+        side = merged_df[MERGE_INDICATOR].to_numpy(dtype=object)
+        self.matched_mask = side == "both"
+        self.excel_only_mask = side == "left_only"
+        self.sql_only_mask = side == "right_only"
+        self.matched_count = int(self.matched_mask.sum())
+        self.excel_only_count = int(self.excel_only_mask.sum())
+        self.sql_only_count = int(self.sql_only_mask.sum())
+        self._missing_rows = None
+
+    def missing_rows(self) -> pd.DataFrame:
+        """Return the key values of rows found on one side only.
+
+        Columns are named after the Excel key columns (the row sequence
+        column is skipped) plus ``Result``, which is ``Missing in Database``
+        for Excel-only rows and ``Missing in Excel`` for SQL-only rows.
+        """
+        if self._missing_rows is None:
+            pairs = [
+                (excel_col, sql_col)
+                for excel_col, sql_col in zip(self.key_columns["excel"], self.key_columns["sql"])
+                if excel_col != ROW_SEQUENCE_COLUMN
+            ]
+            columns = self.merged_df.columns
+
+            def merged_name(col, suffix):
+                return f"{col}{suffix}" if f"{col}{suffix}" in columns else col
+
+            excel_only = self.merged_df.loc[
+                self.excel_only_mask, [merged_name(e, "_excel") for e, _ in pairs]
+            ]
+            sql_only = self.merged_df.loc[
+                self.sql_only_mask, [merged_name(s, "_sql") for _, s in pairs]
+            ]
+            names = [e for e, _ in pairs]
+            excel_only.columns = names
+            sql_only.columns = names
+            # The outer merge turns integer keys into floats; restore them
+            excel_only = _restore_dtypes(excel_only, [self.excel_df[e].dtype for e, _ in pairs])
+            sql_only = _restore_dtypes(sql_only, [self.sql_df[s].dtype for _, s in pairs])
+            self._missing_rows = pd.concat(
+                [
+                    missing_rows_frame(excel_only, MISSING_IN_DATABASE),
+                    missing_rows_frame(sql_only, MISSING_IN_EXCEL),
+                ],
+                ignore_index=True,
+            )
+        return self._missing_rows
+
+    def matches(self, excel_df, sql_df, column_mappings, fingerprints=None) -> bool:
+        """Return True if this plan was built for the given inputs.
+
+        ``fingerprints`` are the inputs' :func:`frame_fingerprint` values
+        when the caller has already computed them.
+        """
+        return (
+            excel_df is self.excel_source
+            and sql_df is self.sql_source
+            and self._signature
+            == (
+                mapping_signature(column_mappings),
+                frame_signature(excel_df),
+                frame_signature(sql_df),
+            )
+            and self._fingerprints
+            == (fingerprints or (frame_fingerprint(excel_df), frame_fingerprint(sql_df)))
+        )
+
@@ -0,0 +1,342 @@
+"""Compare many sheets with one merge and one pass of the row kernel.
+
+Sheets with the same headers are stacked into one frame per side with a
+sheet tag column added in front of the keys. Column mappings and key
+columns are detected once per layout on the stacked frames, so all sheets
+of a layout share one join key. The stacked frames are merged and compared
+once, account discrepancies are computed once with the sheet tag as an
+extra group level, and the merged result is split back into one result dict
+per sheet with the same layout as :meth:`ComparisonEngine.compare_sheet`.
+This removes the fixed cost of comparing hundreds of small sheets one call
+at a time.
+
+Row numbers of mismatches are positions among the matched rows of each
+sheet in the consolidated merge order, so they may differ from the numbers a
+separate comparison of the sheet reports. The ``profile`` of the shared merge
+is reported on the first sheet of each group so profiles still add up.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logging_config import get_logger
+
+from . import discrepancy_classifier, parallel_compare
+from .compare_profile import ComparisonProfile
+from .mismatch_store import NULL_MISMATCH, STRING_MISMATCH
+
+logger = get_logger(__name__)
+
+# Key column holding the position of each row's sheet in its group
+SHEET_TAG_COLUMN = "__sheet__"
+
+
+class ConsolidatedComparison:
+    """Compare ``(sheet_name, excel_df, sql_df)`` tasks in as few merges as possible.
+
+    The comparison runs on a private, uncapped copy of ``engine`` so the
+    mismatches of the stacked frames can be split exactly; every sheet's
+    store is capped at ``engine.mismatch_cap`` afterwards.
+    """
+
+    def __init__(self, engine):
+        settings = parallel_compare.engine_settings(engine)
+        if settings.get("hierarchical"):
+            logger.info(
+                "Consolidated comparison compares every cell; the hierarchical option is not used"
+            )
+        settings["hierarchical"] = False
+        settings["mismatch_cap"] = None
+        self.engine = parallel_compare.build_engine(settings)
+        self.mismatch_cap = engine.mismatch_cap
+        self.logger = logger
+
+    def compare(self, tasks: Iterable[Tuple[str, pd.DataFrame, pd.DataFrame]]) -> Dict[str, Dict]:
+        """Return ``{sheet_name: results}`` in the order of ``tasks``."""
+        tasks = [(name, self._strip_columns(e), self._strip_columns(s)) for name, e, s in tasks]
+        results = {}
+        layouts = {}
+        for name, excel_df, sql_df in tasks:
+            layout = self._layout_key(excel_df, sql_df)
+            if layout is None:
+                # Errors and unusual sheets go through the regular path
+                results[name] = self.engine.compare_sheet(excel_df, sql_df, sheet_name=name)
+                continue
+            layouts.setdefault(layout, []).append((name, excel_df, sql_df))
+
+        for members in layouts.values():
+            results.update(self._compare_layout(members))
+
+        return {name: results[name] for name, _, _ in tasks}
+
+    @staticmethod
+    def _layout_key(excel_df, sql_df):
+        """Return the key grouping sheets that can share one merge, or ``None``."""
+        if excel_df.empty or sql_df.empty or SHEET_TAG_COLUMN in excel_df.columns:
+            return None
+        return tuple(excel_df.columns), tuple(sql_df.columns)
+
+    def _compare_layout(self, members) -> Dict[str, Dict]:
+        """Compare sheets sharing one layout with one mapping and key detection."""
+        _, excel_df, sql_df = members[0]
+        if list(excel_df.columns) == list(sql_df.columns):
+            mappings = {
+                i: {"excel_column": col, "sql_column": col, "match_score": 1.0}
+                for i, col in enumerate(excel_df.columns)
+            }
+        else:
+            mappings = self.engine.find_matching_columns(excel_df.columns, sql_df.columns)
+        if len(members) == 1 or not mappings:
+            return {
+                name: self.engine.compare_sheet(
+                    excel_df, sql_df, mappings or None, sheet_name=name
+                )
+                for name, excel_df, sql_df in members
+            }
+
+        # Keys are detected once on the stacked frames. The sheet tag is
+        # added afterwards (its name reads like a Center column) and leads
+        # the keys, so keys only need to be unique within each sheet.
+        excel_stacked = pd.concat([df for _, df, _ in members], ignore_index=True)
+        sql_stacked = pd.concat([df for _, _, df in members], ignore_index=True)
+        profile = ComparisonProfile()
+        with profile.stage("key_detection"):
+            key_columns = self.engine._base_key_columns(excel_stacked, sql_stacked, mappings)
+            if key_columns:
+                excel_stacked[SHEET_TAG_COLUMN] = self._sheet_tags(members, 1)
+                sql_stacked[SHEET_TAG_COLUMN] = self._sheet_tags(members, 2)
+                key_columns = self.engine._ensure_unique_key_columns(
+                    excel_stacked,
+                    sql_stacked,
+                    {side: [SHEET_TAG_COLUMN] + cols for side, cols in key_columns.items()},
+                    mappings,
+                )
+        if not key_columns:
+            return {
+                name: self.engine.compare_sheet(excel_df, sql_df, mappings, sheet_name=name)
+                for name, excel_df, sql_df in members
+            }
+
+        self.logger.info(f"Comparing {len(members)} sheets in one consolidated merge")
+        return self._compare_group(
+            members, mappings, key_columns, excel_stacked, sql_stacked, profile
+        )
+
+    def _compare_group(
+        self, members, mappings, stacked_keys, excel_stacked, sql_stacked, profile
+    ) -> Dict[str, Dict]:
+        sheet_keys = {
+            side: [col for col in cols if col != SHEET_TAG_COLUMN]
+            for side, cols in stacked_keys.items()
+        }
+        combined, plan = self.engine._compare_sheet(
+            excel_stacked, sql_stacked, mappings, key_columns=stacked_keys, discrepancies=False
+        )
+        if "error" in combined:
+            return {name: combined for name, _, _ in members}
+
+        n_sheets = len(members)
+        merged_df = plan.merged_df
+        excel_tags = merged_df[f"{SHEET_TAG_COLUMN}_excel"]
+        sql_tags = merged_df[f"{SHEET_TAG_COLUMN}_sql"]
+        matched_tags = excel_tags[plan.matched_mask].to_numpy(dtype=np.int64)
+        matched_counts = np.bincount(matched_tags, minlength=n_sheets)
+        excel_only_counts = np.bincount(
+            excel_tags[plan.excel_only_mask].to_numpy(dtype=np.int64), minlength=n_sheets
+        )
+        sql_only_counts = np.bincount(
+            sql_tags[plan.sql_only_mask].to_numpy(dtype=np.int64), minlength=n_sheets
+        )
+        # Position of each matched row among the matched rows of its sheet
+        row_numbers = pd.Series(matched_tags).groupby(matched_tags).cumcount().to_numpy()
+
+        combined_store = combined["mismatches"]
+        stores = combined_store.split(matched_tags, row_numbers, n_sheets, cap=self.mismatch_cap)
+        null_counts = self._null_mismatch_counts(combined_store, matched_tags)
+        suggestions = self._sign_flip_candidates(
+            combined, plan, matched_tags, n_sheets, sheet_keys
+        )
+        missing_rows = plan.missing_rows()
+        missing_tags = missing_rows[SHEET_TAG_COLUMN].to_numpy(dtype=np.int64)
+        missing_rows = missing_rows.drop(columns=[SHEET_TAG_COLUMN])
+        duplicate_keys = self._split_duplicate_keys(combined["duplicate_keys"], n_sheets)
+        with profile.stage("discrepancies"):
+            discrepancies_by_sheet = self._split_discrepancies(
+                excel_stacked, sql_stacked, mappings, sheet_keys, n_sheets
+            )
+
+        results = {}
+        for i, (name, excel_df, sql_df) in enumerate(members):
+            store = stores[i]
+            column_comparisons = {}
+            summary = {"total_cells": 0, "matching_cells": 0, "mismatch_cells": 0, "mismatch_percentage": 0}
+            for column, stats in combined["column_comparisons"].items():
+                mismatch_count = store.count(column)
+                match_count = int(matched_counts[i]) - mismatch_count
+                total = match_count + mismatch_count
+                column_comparisons[column] = {
+                    "is_numeric": stats["is_numeric"],
+                    "match_count": match_count,
+                    "mismatch_count": mismatch_count,
+                    "mismatch_rows": store.rows_for(column),
+                    "null_mismatch_count": null_counts.get((i, column), 0),
+                    "sign_flipped": stats["sign_flipped"],
+                    "match_percentage": (match_count / total * 100) if total else 0,
+                }
+                summary["total_cells"] += total
+                summary["matching_cells"] += match_count
+                summary["mismatch_cells"] += mismatch_count
+            if summary["total_cells"]:
+                summary["mismatch_percentage"] = summary["mismatch_cells"] / summary["total_cells"] * 100
+            summary["overall_match"] = summary["mismatch_percentage"] < 1
+
+            sheet_profile = ComparisonProfile()
+            if i == 0:
+                sheet_profile.merge(combined.get("profile"))
+                sheet_profile.merge(profile.as_dict())
+            discrepancies = discrepancies_by_sheet[i]
+
+            results[name] = {
+                "column_mappings": mappings,
+                "row_count_match": len(excel_df) == len(sql_df),
+                "row_counts": {
+                    "excel": len(excel_df),
+                    "sql": len(sql_df),
+                    "matched": int(matched_counts[i]),
+                    "excel_only": int(excel_only_counts[i]),
+                    "sql_only": int(sql_only_counts[i]),
+                },
+                "missing_rows": missing_rows[missing_tags == i].reset_index(drop=True),
+                "column_comparisons": column_comparisons,
+                "summary": summary,
+                "duplicate_keys": duplicate_keys[i],
+                "suggested_sign_flips": suggestions[i],
+                "mismatches": store,
+                "account_discrepancies": discrepancies,
+                "discrepancy_severity": (
+                    discrepancies["Severity"].tolist()
+                    if isinstance(discrepancies, pd.DataFrame) and "Severity" in discrepancies.columns
+                    else []
+                ),
+                "profile": sheet_profile.as_dict(),
+            }
+        return results
+
+    def _split_discrepancies(self, excel_stacked, sql_stacked, mappings, sheet_keys, n_sheets) -> List:
+        """Return the account discrepancies of each sheet from one stacked pass.
+
+        The sheet tag is the leading group level, and severity is classified
+        per sheet as if each sheet had been analyzed on its own.
+        """
+        try:
+            flagged = self.engine.identify_account_discrepancies(
+                excel_stacked,
+                sql_stacked,
+                mappings,
+                key_columns=sheet_keys,
+                classify=False,
+                group_column=SHEET_TAG_COLUMN,
+            )
+        except Exception as e:
+            self.logger.warning(f"Account discrepancy analysis failed: {e}")
+            return [pd.DataFrame() for _ in range(n_sheets)]
+        if SHEET_TAG_COLUMN not in flagged.columns:
+            # No key or value columns: every sheet gets the same empty frame
+            return [flagged.copy() for _ in range(n_sheets)]
+        tags = flagged[SHEET_TAG_COLUMN].to_numpy(dtype=np.int64)
+        flagged = flagged.drop(columns=[SHEET_TAG_COLUMN])
+        return [
+            discrepancy_classifier.classify(flagged[tags == i].reset_index(drop=True))
+            for i in range(n_sheets)
+        ]
+
+    @staticmethod
+    def _sheet_tags(members, side) -> np.ndarray:
+        """Return the position of each stacked row's sheet for one side."""
+        return np.repeat(np.arange(len(members)), [len(member[side]) for member in members])
+
+    @staticmethod
+    def _null_mismatch_counts(store, matched_tags) -> Dict[Tuple[int, str], int]:
+        """Return NULL mismatch counts keyed by (sheet position, column)."""
+        frame = store.to_frame()
+        frame = frame[frame["difference"].to_numpy(dtype=object) == NULL_MISMATCH]
+        counts = pd.DataFrame({
+            "tag": matched_tags[frame["row"].to_numpy()],
+            "column": frame["column"].to_numpy(),
+        }).value_counts()
+        return {(int(tag), column): int(count) for (tag, column), count in counts.items()}
+
+    def _sign_flip_candidates(self, combined, plan, matched_tags, n_sheets, sheet_keys) -> List[set]:
+        """Return the suggested sign flip accounts of each sheet.
+
+        Mirrors :func:`row_comparison.compare_series`: a numeric value
+        mismatch on an unflipped row is a candidate if negating the SQL
+        value would match.
+        """
+        suggestions = [set() for _ in range(n_sheets)]
+        frame = combined["mismatches"].to_frame()
+        if frame.empty:
+            return suggestions
+
+        numeric_columns = {
+            column for column, stats in combined["column_comparisons"].items() if stats["is_numeric"]
+        }
+        key_columns = {
+            mapping["excel_column"]
+            for mapping in combined["column_mappings"].values()
+            if mapping["excel_column"] in sheet_keys["excel"]
+            or mapping["sql_column"] in sheet_keys["sql"]
+        }
+        difference = frame["difference"].to_numpy(dtype=object)
+        value_mismatch = (
+            frame["column"].isin(numeric_columns).to_numpy()
+            & (difference != NULL_MISMATCH)
+            & (difference != STRING_MISMATCH)
+        )
+        frame = frame[value_mismatch]
+        if frame.empty:
+            return suggestions
+
+        account_col_excel, account_col_sql = plan.account_columns
+        account_col = account_col_sql or account_col_excel
+        if account_col:
+            accounts = self.engine.sign_flip_index.normalize(
+                plan.merged_df[account_col][plan.matched_mask].astype(str)
+            )
+        else:
+            accounts = np.full(len(matched_tags), "", dtype=object)
+
+        rows = frame["row"].to_numpy()
+        row_accounts = np.where(
+            frame["column"].isin(key_columns).to_numpy(), "", accounts[rows]
+        ).astype(object)
+        flipped = np.isin(row_accounts, list(self.engine.sign_flip_index.accounts))
+        excel_values = frame["excel_value"].to_numpy(dtype=float)
+        sql_values = frame["sql_value"].to_numpy(dtype=float)
+        abs_e = np.abs(excel_values)
+        abs_s = np.abs(sql_values)
+        max_val = np.where((abs_e > 1) | (abs_s > 1), np.maximum(abs_e, abs_s), 1.0)
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            flip_match = np.abs(excel_values + sql_values) / max_val <= self.engine.tolerance
+        candidates = ~flipped & flip_match
+        for tag, account in zip(matched_tags[rows[candidates]], row_accounts[candidates]):
+            suggestions[tag].add(account)
+        return suggestions
+
+    @staticmethod
+    def _split_duplicate_keys(duplicate_keys, n_sheets) -> List[Dict]:
+        """Split duplicate key reports by the sheet tag leading each key."""
+        split = [{"excel": {}, "sql": {}} for _ in range(n_sheets)]
+        for side in ("excel", "sql"):
+            for key, count in duplicate_keys.get(side, {}).items():
+                tag, _, sheet_key = str(key).partition("-")
+                split[int(tag)][side][sheet_key] = count
+        return split
+
+    @staticmethod
+    def _strip_columns(df: pd.DataFrame) -> pd.DataFrame:
+        if any(str(col) != str(col).strip() or not isinstance(col, str) for col in df.columns):
+            return df.set_axis([str(col).strip() for col in df.columns], axis=1)
+        return df
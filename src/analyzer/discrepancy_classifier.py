@@ -6,6 +6,10 @@ import pandas as pd
 def classify(discrepancies_df: pd.DataFrame) -> pd.DataFrame:
     """Assign severity levels to discrepancies.
 
+    The whole batch (for example every flagged column of a sheet) is
+    classified at once, so the ``major`` threshold is derived from all of
+    its variances.
+
     Parameters
     ----------
     discrepancies_df : pd.DataFrame
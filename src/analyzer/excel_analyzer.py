@@ -1,8 +1,11 @@
 import pandas as pd
 import numpy as np
 import re
+import threading
 from src.utils.logging_config import get_logger
 from collections import defaultdict
+from .sheet_prefetch import SheetPrefetcher, neighbour_order
+from .workbook_loader import UnmergedExcelFile
 
 
 def _get_cell_value(df, ref):
@@ -43,16 +46,65 @@ def _get_cell_value(df, ref):
     return df.iat[row, col]
 
 
+_cell_type = np.frompyfunc(type, 1, 1)
+
+# Terms that mark a row as a header when two or more cells contain them
+_HEADER_PATTERN = re.compile(
+    r"(?:total|sum|subtotal|balance|revenue|expense|income|cost|profit|loss)"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)"
+    r"|(?:quarter|q1|q2|q3|q4|ytd|mtd)"
+    r"|(?:actual|budget|variance|forecast|plan|target)",
+    re.IGNORECASE,
+)
+
+
+def _cell_types(values):
+    """Return masks of the missing, numeric and string cells of *values*.
+
+    *values* is the object array of a sheet, ``df.to_numpy(dtype=object)``.
+    A cell is numeric if it is an ``int`` or ``float`` (``bool`` and NumPy
+    floats included) that is not NaN, as the former per-cell ``isinstance``
+    checks had it. Types are looked up once per distinct type, not per cell.
+    """
+    missing = pd.isna(values)
+    codes, types = pd.factorize(_cell_type(values).ravel())
+    is_numeric = np.array([issubclass(t, (int, float)) for t in types], dtype=bool)
+    is_string = np.array([issubclass(t, str) for t in types], dtype=bool)
+    numeric = is_numeric[codes].reshape(values.shape) & ~missing
+    string = is_string[codes].reshape(values.shape)
+    return missing, numeric, string
+
+
+def _empty_row_mask(values, missing, string):
+    """Return a mask of the rows that are all NaN or all blank strings."""
+    blank = np.zeros(string.shape, dtype=bool)
+    if string.any():
+        text = pd.Series(values[string], dtype=object)
+        blank[string] = (text.str.strip().str.len() == 0).to_numpy()
+    return missing.all(axis=1) | blank.all(axis=1)
+
+
 class ExcelAnalyzer:
-    def __init__(self, file_path):
-        """Initialize the Excel analyzer with the file path"""
+    def __init__(self, file_path, cache=None):
+        """Initialize the Excel analyzer with the file path
+
+        Sheets analyzed before are read from ``cache`` when one is given and
+        the workbook is unchanged.
+        """
         self.file_path = file_path
+        self.cache = cache
+        self._cache_key = None
+        # Sheets were stored in the cache since it was last trimmed
+        self._cache_grew = False
         self.excel_file = None
         self.sheet_names = []
         self.sheet_data = {}
         self.numerical_columns = {}
         self.potential_queries = {}
         self.logger = get_logger(__name__)
+        self._prefetcher = None
+        # Guards publishing sheets, shared with the prefetch thread
+        self._lock = threading.Lock()
         # Define columns that should not be rounded (full account names in CAReportName)
         self.exception_columns = [
             "Margin %",
@@ -65,42 +117,20 @@ class ExcelAnalyzer:
     def load_excel(self):
         """Load the Excel file and extract sheet names.
 
-        This now unmerges all cells before handing the workbook off to
-        ``pandas``.  When merged cells are encountered only the top-left
-        cell retains its value while the remaining cells are cleared.  This
-        prevents accidental duplicate columns when merged headers span
-        multiple columns.
+        Sheets are read with merged cells unmerged: only the top-left cell
+        of a merged range retains its value while the remaining cells are
+        empty. This prevents accidental duplicate columns when merged
+        headers span multiple columns. Only the workbook index is read here;
+        each sheet is parsed once, when it is analyzed or prefetched.
         """
         try:
-            from openpyxl import load_workbook
-            import io
-
-            wb = load_workbook(self.file_path)
-            for ws in wb.worksheets:
-                for merged in list(ws.merged_cells.ranges):
-                    min_row, min_col, max_row, max_col = (
-                        merged.min_row,
-                        merged.min_col,
-                        merged.max_row,
-                        merged.max_col,
-                    )
-                    value = ws.cell(row=min_row, column=min_col).value
-                    ws.unmerge_cells(str(merged))
-                    # Preserve the original value only in the first cell;
-                    # clear the others so they can be pruned later if empty.
-                    for r in range(min_row, max_row + 1):
-                        for c in range(min_col, max_col + 1):
-                            if r == min_row and c == min_col:
-                                ws.cell(row=r, column=c).value = value
-                            else:
-                                ws.cell(row=r, column=c).value = None
-
-            temp_buffer = io.BytesIO()
-            wb.save(temp_buffer)
-            temp_buffer.seek(0)
-
-            self.excel_file = pd.ExcelFile(temp_buffer)
+            self.excel_file = UnmergedExcelFile(self.file_path)
             self.sheet_names = self.excel_file.sheet_names
+            self._prefetcher = SheetPrefetcher(
+                self._analyze_sheet, self.sheet_names, lock=self._lock
+            )
+            if self.cache is not None:
+                self._cache_key = self.cache.key(self.file_path)
             self.logger.info(
                 f"Successfully loaded Excel file with {len(self.sheet_names)} sheets"
             )
@@ -110,14 +140,72 @@ class ExcelAnalyzer:
             return False
 
     def analyze_sheet(self, sheet_name, header_rows=5):
-        """Analyze a specific sheet to identify structure and data columns"""
+        """Analyze a specific sheet to identify structure and data columns
+
+        A sheet analyzed in the background by :meth:`prefetch` is returned
+        without parsing it again; while it is being prefetched this waits
+        for it.
+        """
         if not self.excel_file:
             self.logger.error("Excel file not loaded")
             return None
 
+        if self._prefetcher is not None and header_rows == 5:
+            return self._prefetcher.get(sheet_name)
+        return self._analyze_sheet(sheet_name, header_rows)
+
+    def is_analyzed(self, sheet_name):
+        """Return True if the complete analysis of ``sheet_name`` is available."""
+        with self._lock:
+            return sheet_name in self.sheet_data
+
+    def get_sheet(self, sheet_name):
+        """Return the analysis of ``sheet_name``, analyzing it if needed.
+
+        Use this rather than checking ``sheet_data`` directly: a sheet that
+        is being prefetched is waited for instead of analyzed twice.
+        """
+        with self._lock:
+            sheet_info = self.sheet_data.get(sheet_name)
+        if sheet_info is not None:
+            return sheet_info
+        return self.analyze_sheet(sheet_name)
+
+    def prefetch(self, first=None):
+        """Analyze the remaining sheets on a background thread.
+
+        ``first`` is analyzed first, followed by its neighbours in sheet
+        order, nearest first.
+        """
+        if self._prefetcher is None:
+            return
+        order = neighbour_order(self.sheet_names, first)
+        self._prefetcher.prioritize(
+            [name for name in order if not self.is_analyzed(name)]
+        )
+
+    def close(self):
+        """Stop prefetching sheets and trim the cache to its size limit."""
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+        self._trim_cache()
+
+    def _trim_cache(self):
+        """Evict old workbooks from the cache if sheets were stored since."""
+        with self._lock:
+            grew, self._cache_grew = self._cache_grew, False
+        if grew:
+            self.cache.evict(keep=self._cache_key)
+
+    def _analyze_sheet(self, sheet_name, header_rows=5):
+        if self._cache_key is not None:
+            cached = self.cache.load(self._cache_key, sheet_name, header_rows)
+            if cached is not None:
+                return self._restore_sheet(sheet_name, cached)
+
         try:
             # Read the sheet with no header initially to analyze structure
-            df = pd.read_excel(self.excel_file, sheet_name=sheet_name, header=None)
+            df = self.excel_file.read_sheet(sheet_name)
 
             # Set the sheet name on the DataFrame so methods can access it
             df.name = sheet_name
@@ -126,8 +214,9 @@ class ExcelAnalyzer:
             structure = self._analyze_sheet_structure(df)
             header_indexes = self._detect_headers(df, header_rows)
 
-            # Store sheet data
-            self.sheet_data[sheet_name] = {
+            # The entry is built here and published once it is complete, as
+            # other threads read sheet_data while sheets are prefetched
+            sheet_info = {
                 "dataframe": df,
                 "shape": df.shape,
                 "structure": structure,
@@ -135,24 +224,75 @@ class ExcelAnalyzer:
             }
 
             # Now detect data area
-            data_area = self._detect_data_area(df)
-            self.sheet_data[sheet_name]["data_area"] = data_area
+            sheet_info["data_area"] = self._detect_data_area(df, sheet_info)
 
             # Try to detect columns that are numerical and might contain financial data
-            self.numerical_columns[sheet_name] = self._detect_numerical_columns(df)
+            numerical_columns = self._detect_numerical_columns(df, sheet_info)
 
             # Generate potential SQL queries based on sheet analysis
-            self.potential_queries[sheet_name] = self._generate_potential_queries(
-                sheet_name
+            potential_queries = self._generate_potential_queries(
+                sheet_name, sheet_info, numerical_columns
             )
 
             self.logger.info(f"Analyzed sheet: {sheet_name}")
-            return self.sheet_data[sheet_name]
+            if self._cache_key is not None:
+                self.cache.store(
+                    self._cache_key,
+                    sheet_name,
+                    header_rows,
+                    {
+                        "dataframe": df,
+                        "structure": structure,
+                        "header_indexes": header_indexes,
+                        "data_area": sheet_info["data_area"],
+                        "numerical_columns": numerical_columns,
+                        "potential_queries": potential_queries,
+                    },
+                )
+                with self._lock:
+                    self._cache_grew = True
+            sheet_info = self._publish_sheet(
+                sheet_name, sheet_info, numerical_columns, potential_queries
+            )
+            # The cache is trimmed once, after the last sheet is stored
+            with self._lock:
+                complete = all(name in self.sheet_data for name in self.sheet_names)
+            if complete:
+                self._trim_cache()
+            return sheet_info
 
         except Exception as e:
             self.logger.error(f"Failed to analyze sheet {sheet_name}: {str(e)}")
             return None
 
+    def _restore_sheet(self, sheet_name, cached):
+        """Store a sheet analysis read from the cache."""
+        df = cached["dataframe"]
+        df.name = sheet_name
+        sheet_info = {
+            "dataframe": df,
+            "shape": df.shape,
+            "structure": cached["structure"],
+            "header_indexes": cached["header_indexes"],
+            "data_area": cached["data_area"],
+        }
+        self.logger.info(f"Loaded sheet from cache: {sheet_name}")
+        return self._publish_sheet(
+            sheet_name, sheet_info, cached["numerical_columns"], cached["potential_queries"]
+        )
+
+    def _publish_sheet(self, sheet_name, sheet_info, numerical_columns, potential_queries):
+        """Make a complete sheet analysis visible to other threads at once.
+
+        ``sheet_data`` is written last, so a sheet found there always has its
+        numerical columns and queries as well.
+        """
+        with self._lock:
+            self.numerical_columns[sheet_name] = numerical_columns
+            self.potential_queries[sheet_name] = potential_queries
+            self.sheet_data[sheet_name] = sheet_info
+        return sheet_info
+
     def _analyze_sheet_structure(self, df):
         """Analyze the structure of the sheet to identify headers, data areas, etc."""
         structure = {
@@ -163,83 +303,56 @@ class ExcelAnalyzer:
         }
 
         # Identify empty rows
-        for i, row in df.iterrows():
-            if row.isna().all() or (row.astype(str).str.strip().str.len() == 0).all():
-                structure["empty_rows"].append(i)
+        values = df.to_numpy(dtype=object)
+        missing, numeric, string = _cell_types(values)
+        empty = _empty_row_mask(values, missing, string)
+        structure["empty_rows"] = df.index[empty].tolist()
 
         # Identify potential headers (rows with string values and few numbers)
-        for i, row in df.iterrows():
-            if i in structure["empty_rows"]:
-                continue
-
-            numeric_count = row.apply(
-                lambda x: isinstance(x, (int, float)) and not np.isnan(x)
-            ).sum()
-            string_count = row.apply(lambda x: isinstance(x, str)).sum()
-
-            if string_count > numeric_count and string_count > 0:
-                structure["potential_headers"].append(i)
+        string_count = string.sum(axis=1)
+        is_header = ~empty & (string_count > numeric.sum(axis=1)) & (string_count > 0)
+        structure["potential_headers"] = df.index[is_header].tolist()
 
         # Identify data regions (consecutive rows with similar structure)
-        current_region = []
-        for i in range(df.shape[0]):
-            if i in structure["empty_rows"]:
-                if current_region:
-                    structure["data_regions"].append(current_region)
-                    current_region = []
-            else:
-                current_region.append(i)
-
-        if current_region:
-            structure["data_regions"].append(current_region)
+        in_region = ~np.isin(np.arange(df.shape[0]), structure["empty_rows"])
+        rows = np.flatnonzero(in_region)
+        breaks = np.flatnonzero(np.diff(rows) > 1) + 1
+        structure["data_regions"] = [
+            region.tolist() for region in np.split(rows, breaks) if len(region)
+        ]
 
         return structure
 
     def _detect_headers(self, df, max_header_rows=5):
         """Detect likely header rows in the sheet"""
-        headers = []
-        header_patterns = [
-            r"(?i)(total|sum|subtotal|balance|revenue|expense|income|cost|profit|loss)",
-            r"(?i)(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)",
-            r"(?i)(quarter|q1|q2|q3|q4|ytd|mtd)",
-            r"(?i)(actual|budget|variance|forecast|plan|target)",
-        ]
-
         # Check first few rows for header-like content
-        for i in range(min(max_header_rows, df.shape[0])):
-            row = df.iloc[i]
-            header_matches = 0
+        window = df.iloc[: max(min(max_header_rows, df.shape[0]), 0)].to_numpy(dtype=object)
+        _, _, string = _cell_types(window)
+        header_matches = np.zeros(window.shape, dtype=bool)
+        if string.any():
+            text = pd.Series(window[string], dtype=object)
+            header_matches[string] = text.str.contains(_HEADER_PATTERN).to_numpy(dtype=bool)
 
-            for cell in row:
-                if not isinstance(cell, str):
-                    continue
-
-                for pattern in header_patterns:
-                    if re.search(pattern, cell):
-                        header_matches += 1
-                        break
-
-            # If multiple header-like terms found, consider it a header
-            if header_matches >= 2:
-                headers.append(i)
+        # If multiple header-like terms found, consider it a header
+        headers = np.flatnonzero(header_matches.sum(axis=1) >= 2).tolist()
 
         return headers
 
-    def _detect_data_area(self, df):
-        """Identify the main data area in the sheet"""
-        # Get sheet name from the DataFrame if it exists
-        sheet_name = getattr(df, "name", None)
+    def _detect_data_area(self, df, sheet_info=None):
+        """Identify the main data area in the sheet
+
+        ``sheet_info`` is the analysis of the sheet so far; by default it is
+        looked up in ``sheet_data`` by the name of the DataFrame.
+        """
+        if sheet_info is None:
+            sheet_info = self.sheet_data.get(getattr(df, "name", None))
 
-        # If sheet_name is not available, we can't access the structure info properly
-        if not sheet_name or sheet_name not in self.sheet_data:
+        # Without the sheet analysis we can't access the structure info
+        if sheet_info is None:
             # Default approach: find first and last non-empty rows
-            empty_rows = []
-            for i, row in df.iterrows():
-                if (
-                    row.isna().all()
-                    or (row.astype(str).str.strip().str.len() == 0).all()
-                ):
-                    empty_rows.append(i)
+            values = df.to_numpy(dtype=object)
+            missing, _, string = _cell_types(values)
+            empty_rows = set(df.index[_empty_row_mask(values, missing, string)].tolist())
 
             start_row = 0
             end_row = df.shape[0] - 1
@@ -255,14 +368,8 @@ class ExcelAnalyzer:
             return (start_row, end_row)
 
         # If we have structure info, use it
-        empty_rows = (
-            self.sheet_data[sheet_name].get("structure", {}).get("empty_rows", [])
-        )
-        potential_headers = (
-            self.sheet_data[sheet_name]
-            .get("structure", {})
-            .get("potential_headers", [])
-        )
+        empty_rows = set(sheet_info.get("structure", {}).get("empty_rows", []))
+        potential_headers = sheet_info.get("structure", {}).get("potential_headers", [])
 
         # Find first non-empty row after headers
         start_row = 0
@@ -278,68 +385,67 @@ class ExcelAnalyzer:
 
         return (start_row, end_row)
 
-    def _detect_numerical_columns(self, df):
+    def _detect_numerical_columns(self, df, sheet_info=None):
         """Detect columns that contain numerical financial data"""
         numerical_cols = {}
 
-        # Get sheet name from the DataFrame
-        sheet_name = getattr(df, "name", None)
-        if not sheet_name or sheet_name not in self.sheet_data:
+        # Get the sheet analysis from the DataFrame name unless given
+        if sheet_info is None:
+            sheet_info = self.sheet_data.get(getattr(df, "name", None))
+        if sheet_info is None:
             return numerical_cols
 
         # First, identify header row
         header_row = 0
-        if self.sheet_data[sheet_name].get("header_indexes"):
-            header_row = max(self.sheet_data[sheet_name]["header_indexes"])
-
-        # For each column, check if it's mostly numerical
-        for col in range(df.shape[1]):
-            col_values = df.iloc[header_row + 1 :, col].dropna()
-            if len(col_values) == 0:
-                continue
-
-            numeric_count = col_values.apply(
-                lambda x: isinstance(x, (int, float)) and not pd.isna(x)
-            ).sum()
-            numeric_ratio = (
-                numeric_count / len(col_values) if len(col_values) > 0 else 0
-            )
-
-            if numeric_ratio > 0.7:  # If over 70% of values are numeric
-                col_header = df.iloc[header_row, col]
-                numerical_cols[col] = {
-                    "header": col_header,
-                    "numeric_ratio": numeric_ratio,
-                    "sample_values": col_values.head(3).tolist(),
-                }
+        if sheet_info.get("header_indexes"):
+            header_row = max(sheet_info["header_indexes"])
+
+        # Count the values and numeric values of every column below the header
+        values = df.iloc[header_row + 1 :].to_numpy(dtype=object)
+        missing, numeric, _ = _cell_types(values)
+        counts = (~missing).sum(axis=0)
+        numeric_ratios = numeric.sum(axis=0) / np.maximum(counts, 1)
+
+        # Keep the columns where over 70% of values are numeric
+        for col in np.flatnonzero((counts > 0) & (numeric_ratios > 0.7)).tolist():
+            first_values = np.flatnonzero(~missing[:, col])[:3]
+            numerical_cols[col] = {
+                "header": df.iloc[header_row, col],
+                "numeric_ratio": numeric_ratios[col],
+                "sample_values": df.iloc[header_row + 1 + first_values, col].tolist(),
+            }
 
         return numerical_cols
 
-    def _generate_potential_queries(self, sheet_name):
+    def _generate_potential_queries(self, sheet_name, sheet_info=None, numerical_columns=None):
         """Generate potential SQL queries based on sheet analysis"""
         # This is a simplified version - in reality, this would be much more sophisticated
         potential_queries = []
 
         # Check if sheet exists in our data
-        if sheet_name not in self.sheet_data:
+        if sheet_info is None:
+            sheet_info = self.sheet_data.get(sheet_name)
+        if sheet_info is None:
             self.logger.warning(f"Sheet {sheet_name} has not been analyzed")
             return potential_queries
+        if numerical_columns is None:
+            numerical_columns = self.numerical_columns.get(sheet_name)
 
         # Get column headers if available
-        header_indexes = self.sheet_data[sheet_name]["header_indexes"]
+        header_indexes = sheet_info["header_indexes"]
         if not header_indexes:
             return potential_queries
 
         header_row = max(header_indexes)
-        df = self.sheet_data[sheet_name]["dataframe"]
+        df = sheet_info["dataframe"]
 
         # Extract headers
         headers = [str(h).strip() for h in df.iloc[header_row] if not pd.isna(h)]
 
         # Look for dimensions (non-numeric columns) that might be in a SQL table
         dimensions = []
-        if sheet_name in self.numerical_columns:
-            for col, col_info in self.numerical_columns[sheet_name].items():
+        if numerical_columns is not None:
+            for col, col_info in numerical_columns.items():
                 header = col_info.get("header")
                 numeric_ratio = col_info.get("numeric_ratio", 0)
                 if header and numeric_ratio < 0.5:  # Less than 50% numeric = dimension
@@ -347,8 +453,8 @@ class ExcelAnalyzer:
 
         # Look for metrics (numeric columns)
         metrics = []
-        if sheet_name in self.numerical_columns:
-            for col, col_info in self.numerical_columns[sheet_name].items():
+        if numerical_columns is not None:
+            for col, col_info in numerical_columns.items():
                 header = col_info.get("header")
                 numeric_ratio = col_info.get("numeric_ratio", 0)
                 if header and numeric_ratio > 0.7:  # More than 70% numeric = metric
@@ -387,6 +493,11 @@ class ExcelAnalyzer:
         self.logger.info(f"Analyzed all {len(self.sheet_names)} sheets")
         return True
 
+    def _analyzed_sheets(self):
+        """Return a snapshot of the ``sheet_data`` items."""
+        with self._lock:
+            return list(self.sheet_data.items())
+
     def get_sheet_summary(self, sheet_name=None):
         """Get a summary of the analyzed sheet(s)"""
         if sheet_name:
@@ -407,7 +518,7 @@ class ExcelAnalyzer:
                     "numerical_columns": len(self.numerical_columns.get(sheet, {})),
                     "potential_queries": len(self.potential_queries.get(sheet, [])),
                 }
-                for sheet, data in self.sheet_data.items()
+                for sheet, data in self._analyzed_sheets()
             }
 
     def get_smart_query_suggestions(self, sheet_name):
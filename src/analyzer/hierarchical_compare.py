@@ -0,0 +1,318 @@
+"""Top-down comparison that only compares cells where aggregates disagree.
+
+The sheet is checked level by level: first the sheet as a whole, then each
+Center and finally each (Center, Account) group. At every level both sides
+are reduced to per-group checksums (row count, sums of every numeric column
+and an order-independent hash of every text column) and only the groups
+whose checksums disagree are checked at the next level. Rows of the
+(Center, Account) groups that still disagree are compared cell by cell with
+:meth:`ComparisonEngine.compare_sheet`; all other rows are counted as
+matched from the group sizes.
+
+Numeric sums weight every row by a pseudo-random factor derived from its
+join key, so differences in two rows of a group rarely cancel out. Sums only
+tolerate floating point rounding: a group whose cells differ, even within
+the comparison tolerance, is drilled into so its cells are counted exactly
+as the full comparison counts them.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logging_config import get_logger
+
+from . import join_keys, parallel_compare
+from .chunked_compare import ChunkedComparison, ResultMerger
+from .comparison_plan import ROW_SEQUENCE_COLUMN
+
+logger = get_logger(__name__)
+
+LEVELS = ("sheet", "center", "account")
+
+# Multiplier mixing the join key hash into text value hashes
+_KEY_MIX = np.uint64(0x9E3779B97F4A7C15)
+_NULL_TEXT = "\x00"
+# Relative difference of two group sums attributed to summation order
+SUM_EPSILON = 1e-9
+
+
+class HierarchicalComparison:
+    """Compare two frames top-down, drilling only into mismatched groups.
+
+    Mismatched rows are compared with a private copy of ``engine`` so its
+    plan cache never holds the drill-down frames.
+    """
+
+    def __init__(self, engine):
+        settings = parallel_compare.engine_settings(engine)
+        settings["hierarchical"] = False
+        self.engine = parallel_compare.build_engine(settings)
+        self.logger = logger
+
+    def compare(self, excel_df: pd.DataFrame, sql_df: pd.DataFrame, column_mappings=None, sheet_name=None) -> Dict:
+        if excel_df.empty or sql_df.empty:
+            self.logger.warning("One or both dataframes are empty")
+            return {"error": "One or both dataframes are empty"}
+
+        excel_df = self._strip_columns(excel_df)
+        sql_df = self._strip_columns(sql_df)
+
+        if column_mappings is None:
+            if list(excel_df.columns) == list(sql_df.columns):
+                column_mappings = {
+                    i: {"excel_column": col, "sql_column": col, "match_score": 1.0}
+                    for i, col in enumerate(excel_df.columns)
+                }
+            else:
+                column_mappings = self.engine.find_matching_columns(
+                    excel_df.columns, sql_df.columns
+                )
+        if not column_mappings:
+            return {"error": "No matching columns found"}
+
+        # Profiles of frames edited in place since an earlier comparison
+        # are rebuilt
+        self.engine._profiles.validate(excel_df)
+        self.engine._profiles.validate(sql_df)
+        key_columns = self.engine._identify_key_columns(excel_df, sql_df, column_mappings)
+        if not key_columns:
+            return {"error": "Could not identify key columns for joining"}
+        if any(
+            col != ROW_SEQUENCE_COLUMN and col not in df.columns
+            for side, df in (("excel", excel_df), ("sql", sql_df))
+            for col in key_columns[side]
+        ):
+            return {"error": "Key columns missing from dataframes"}
+
+        merger = ResultMerger(column_mappings, self.engine.mismatch_cap)
+        with merger.profile.stage("checksums"):
+            excel_keys = self._normalized_keys(excel_df, key_columns["excel"])
+            sql_keys = self._normalized_keys(sql_df, key_columns["sql"])
+            excel_hash = join_keys.hash_keys(excel_keys)
+            sql_hash = join_keys.hash_keys(sql_keys)
+
+            checks, column_kinds = self._checksum_columns(
+                excel_df, sql_df, column_mappings, key_columns, excel_hash, sql_hash
+            )
+
+            # Center and Account lead the key; each one adds a level
+            level_positions = [
+                i for i, col in enumerate(key_columns["excel"]) if col != ROW_SEQUENCE_COLUMN
+            ][:len(LEVELS) - 1]
+            level_codes = [
+                join_keys.factorize_keeping_missing(
+                    pd.concat([excel_keys[i], sql_keys[i]], ignore_index=True)
+                )[0].astype(np.int64)
+                for i in level_positions
+            ]
+
+            excel_rows = np.arange(len(excel_df))
+            sql_rows = np.arange(len(sql_df))
+            levels = []
+            for depth in range(len(level_codes) + 1):
+                if not len(excel_rows) and not len(sql_rows):
+                    break
+                excel_ids, sql_ids, n_groups = self._group_ids(
+                    level_codes[:depth], excel_rows, sql_rows + len(excel_df)
+                )
+                disagree = self._disagreeing_groups(
+                    checks, excel_rows, sql_rows, excel_ids, sql_ids, n_groups
+                )
+                levels.append({
+                    "level": LEVELS[depth],
+                    "groups": n_groups,
+                    "mismatched": int(disagree.sum()),
+                })
+                excel_rows = excel_rows[disagree[excel_ids]]
+                sql_rows = sql_rows[disagree[sql_ids]]
+
+        # Groups left out of the drill-down have equal row counts on both sides
+        matched_rows = len(excel_df) - len(excel_rows)
+        self.logger.info(
+            f"Hierarchical comparison: {matched_rows} rows matched by checksum, "
+            f"drilling into {len(excel_rows)} Excel and {len(sql_rows)} SQL rows"
+        )
+
+        if len(excel_rows) or len(sql_rows):
+            error = self._drill_down(
+                merger,
+                excel_df,
+                sql_df,
+                excel_rows,
+                sql_rows,
+                column_mappings,
+                key_columns,
+                sheet_name,
+            )
+            if error:
+                return error
+        merger.add_matched(
+            matched_rows,
+            column_kinds,
+            sign_flipped=bool(self.engine.sign_flip_index),
+        )
+
+        results = merger.result()
+        # Duplicates are counted over the whole sheet, not only drilled rows
+        results["duplicate_keys"] = {
+            "excel": join_keys.duplicate_key_counts(excel_keys, pd.Series(excel_hash)),
+            "sql": join_keys.duplicate_key_counts(sql_keys, pd.Series(sql_hash)),
+        }
+        results["hierarchical"] = {
+            "levels": levels,
+            "drilled_rows": {"excel": len(excel_rows), "sql": len(sql_rows)},
+        }
+        return results
+
+    def _drill_down(self, merger, excel_df, sql_df, excel_rows, sql_rows, column_mappings, key_columns, sheet_name):
+        """Compare the given rows of mismatched groups cell by cell."""
+        if not len(excel_rows) or not len(sql_rows):
+            # Numeric columns are detected on the whole sheet as one side
+            # has no rows left
+            value_columns = self.engine._discrepancy_value_columns(
+                excel_df, sql_df, column_mappings, key_columns
+            )
+            excel_df = excel_df.iloc[excel_rows]
+            sql_df = sql_df.iloc[sql_rows]
+            discrepancies = pd.DataFrame()
+            if value_columns:
+                discrepancies = self.engine.identify_account_discrepancies(
+                    excel_df,
+                    sql_df,
+                    column_mappings,
+                    key_columns=key_columns,
+                    value_columns=value_columns,
+                )
+            merger.add_unmatched(
+                len(excel_df),
+                len(sql_df),
+                discrepancies,
+                ChunkedComparison._missing_rows(excel_df, sql_df, key_columns),
+            )
+            return None
+
+        result = self.engine.compare_sheet(
+            excel_df.iloc[excel_rows],
+            sql_df.iloc[sql_rows],
+            column_mappings,
+            sheet_name=f"{sheet_name}#drill",
+            key_columns=key_columns,
+        )
+        if "error" in result:
+            return result
+        merger.add(result)
+        return None
+
+    def _normalized_keys(self, df: pd.DataFrame, columns: List) -> pd.DataFrame:
+        base = [col for col in columns if col != ROW_SEQUENCE_COLUMN]
+        # The projection receives the row sequence column, not ``df``
+        return self.engine._normalize_join_columns(df[base], columns)
+
+    def _checksum_columns(self, excel_df, sql_df, column_mappings, key_columns, excel_hash, sql_hash):
+        """Return the per-row checksum inputs and ``{column: is_numeric}``.
+
+        Mapped key column pairs are equal whenever the join keys are, so they
+        are only recorded in ``column_kinds``; the join key hashes themselves
+        are the first check, so groups whose key sets differ (e.g. in a key
+        column beyond Center and Account) are always drilled into.
+        """
+        key_pairs = set(zip(key_columns["excel"], key_columns["sql"]))
+        excel_weights = self._row_weights(excel_hash)
+        sql_weights = self._row_weights(sql_hash)
+        sql_signs = None
+        if self.engine.sign_flip_index:
+            account_col = self.engine._find_account_columns(sql_df.columns)[0]
+            if account_col is not None:
+                sql_signs = self.engine.sign_flip_index.signs(sql_df[account_col])
+
+        checks = [("text", excel_hash, sql_hash)]
+        column_kinds = {}
+        for mapping in column_mappings.values():
+            excel_col = mapping["excel_column"]
+            sql_col = mapping["sql_column"]
+            if excel_col not in excel_df.columns or sql_col not in sql_df.columns:
+                continue
+            excel_profile = self.engine._profiles.get(excel_df, excel_col)
+            sql_profile = self.engine._profiles.get(sql_df, sql_col)
+            is_numeric = excel_profile.is_numeric and sql_profile.is_numeric
+            column_kinds[excel_col] = is_numeric
+            if (excel_col, sql_col) in key_pairs:
+                continue
+            if is_numeric:
+                sql_values = np.nan_to_num(sql_profile.numeric)
+                if sql_signs is not None:
+                    sql_values = sql_values * sql_signs
+                checks.append((
+                    "numeric",
+                    np.nan_to_num(excel_profile.numeric) * excel_weights,
+                    sql_values * sql_weights,
+                ))
+            else:
+                checks.append((
+                    "text",
+                    self._text_hash(excel_df[excel_col], excel_hash),
+                    self._text_hash(sql_df[sql_col], sql_hash),
+                ))
+        return checks, column_kinds
+
+    @staticmethod
+    def _row_weights(key_hash: np.ndarray) -> np.ndarray:
+        """Map join key hashes to weights in ``[1, 2)``."""
+        return 1.0 + (key_hash >> np.uint64(11)).astype(float) / float(1 << 53)
+
+    @staticmethod
+    def _text_hash(values: pd.Series, key_hash: np.ndarray) -> np.ndarray:
+        """Hash text the way cells are compared (stripped, case-insensitive)."""
+        normalized = values.astype(str).str.strip().str.lower().where(values.notna(), _NULL_TEXT)
+        value_hash = pd.util.hash_pandas_object(normalized, index=False).to_numpy(dtype=np.uint64)
+        return value_hash ^ (key_hash * _KEY_MIX)
+
+    @staticmethod
+    def _group_ids(level_codes, excel_rows, sql_rows) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Return dense group ids of the candidate rows for one level."""
+        rows = np.concatenate([excel_rows, sql_rows])
+        if not level_codes:
+            ids = np.zeros(len(rows), dtype=np.int64)
+            n_groups = 1
+        else:
+            combined = level_codes[0][rows]
+            for codes in level_codes[1:]:
+                combined = combined * (int(codes.max()) + 1) + codes[rows]
+            ids, uniques = pd.factorize(combined)
+            n_groups = len(uniques)
+        return ids[:len(excel_rows)], ids[len(excel_rows):], n_groups
+
+    def _disagreeing_groups(self, checks, excel_rows, sql_rows, excel_ids, sql_ids, n_groups) -> np.ndarray:
+        """Return a mask of the groups whose checksums differ between sides."""
+        disagree = (
+            np.bincount(excel_ids, minlength=n_groups) != np.bincount(sql_ids, minlength=n_groups)
+        )
+        for kind, excel_values, sql_values in checks:
+            excel_values = excel_values[excel_rows]
+            sql_values = sql_values[sql_rows]
+            if kind == "numeric":
+                excel_totals = np.bincount(excel_ids, weights=excel_values, minlength=n_groups)
+                sql_totals = np.bincount(sql_ids, weights=sql_values, minlength=n_groups)
+                scale = np.maximum(
+                    np.bincount(excel_ids, weights=np.abs(excel_values), minlength=n_groups),
+                    np.bincount(sql_ids, weights=np.abs(sql_values), minlength=n_groups),
+                )
+                disagree |= (
+                    np.abs(excel_totals - sql_totals)
+                    > SUM_EPSILON * np.maximum(scale, 1.0)
+                )
+            else:
+                excel_totals = np.zeros(n_groups, dtype=np.uint64)
+                sql_totals = np.zeros(n_groups, dtype=np.uint64)
+                np.add.at(excel_totals, excel_ids, excel_values)
+                np.add.at(sql_totals, sql_ids, sql_values)
+                disagree |= excel_totals != sql_totals
+        return disagree
+
+    @staticmethod
+    def _strip_columns(df: pd.DataFrame) -> pd.DataFrame:
+        if any(str(col) != str(col).strip() or not isinstance(col, str) for col in df.columns):
+            return df.set_axis([str(col).strip() for col in df.columns], axis=1)
+        return df
@@ -0,0 +1,135 @@
+"""Vectorized join key construction used by the comparison engine.
+
+Key columns are normalized column by column and hashed into ``uint64``
+values so both sides can be joined on integers. String keys are only built
+when they have to be displayed (duplicate key reports) or when two distinct
+key tuples hash to the same value, in which case the join falls back to
+string keys to keep the comparison exact.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+KEY_SEPARATOR = "-"
+
+
+def normalize_key_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Return ``columns`` of ``df`` as stripped, lower-cased strings.
+
+    The result uses positional column labels so frames with differently
+    named key columns produce comparable hashes.
+    """
+    return pd.DataFrame(
+        {
+            i: df[col].astype(str).str.strip().str.lower()
+            for i, col in enumerate(columns)
+        },
+        index=df.index,
+    )
+
+
+def factorize_keeping_missing(values: pd.Series, sort: bool = False):
+    """Factorize ``values`` with missing values as one more group.
+
+    Gives the codes and uniques of ``use_na_sentinel=False`` (pandas 1.5 and
+    later) on older pandas too: the missing group is last when sorted and
+    at its first occurrence otherwise.
+    """
+    codes, uniques = pd.factorize(values, sort=sort)
+    missing = codes < 0
+    if missing.any():
+        position = len(uniques)
+        if not sort:
+            seen = codes[:int(np.argmax(missing))]
+            position = int(seen.max()) + 1 if len(seen) else 0
+        codes = np.where(missing, position, codes + (codes >= position))
+        uniques = uniques.insert(position, np.nan)
+    return codes, uniques
+
+
+def refine_group_ids(group_ids, values: pd.Series):
+    """Split existing row groups by the normalized ``values`` of one column.
+
+    ``group_ids`` may be ``None`` to start from a single group. Returns the
+    new dense group ids and the number of groups; rows are unique once the
+    group count equals the row count.
+    """
+    normalized = values.astype(str).str.strip().str.lower()
+    codes, uniques = pd.factorize(normalized)
+    # Missing values (code -1) form their own group
+    codes = codes.astype(np.int64) + 1
+    if group_ids is None:
+        combined = codes
+    else:
+        combined = group_ids * (len(uniques) + 1) + codes
+    ids, groups = pd.factorize(combined)
+    return ids.astype(np.int64), len(groups)
+
+
+def group_ids(df: pd.DataFrame, columns: List[str]):
+    """Return dense group ids and group count for the normalized ``columns``."""
+    ids, n_groups = None, 1
+    for col in columns:
+        ids, n_groups = refine_group_ids(ids, df[col])
+    if ids is None:
+        ids = np.zeros(len(df), dtype=np.int64)
+        n_groups = min(len(df), 1)
+    return ids, n_groups
+
+
+def hash_keys(normalized: pd.DataFrame) -> np.ndarray:
+    """Hash each row of a normalized key frame into a ``uint64`` value."""
+    if normalized.shape[1] == 0:
+        return np.zeros(len(normalized), dtype=np.uint64)
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy(dtype=np.uint64)
+
+
+def string_keys(normalized: pd.DataFrame) -> pd.Series:
+    """Join the normalized key columns into display strings."""
+    if normalized.shape[1] == 0:
+        return pd.Series("", index=normalized.index, dtype=object)
+    first = normalized.iloc[:, 0]
+    if normalized.shape[1] == 1:
+        return first.fillna("nan")
+    others = [normalized.iloc[:, i] for i in range(1, normalized.shape[1])]
+    return first.str.cat(others, sep=KEY_SEPARATOR, na_rep="nan")
+
+
+def has_collisions(normalized_frames, hash_arrays) -> bool:
+    """Return True if two distinct key tuples share the same hash."""
+    combined = pd.concat(normalized_frames, ignore_index=True)
+    combined["_hash"] = np.concatenate(hash_arrays)
+    distinct = combined.drop_duplicates()
+    return bool(distinct["_hash"].duplicated().any())
+
+
+def build_join_keys(
+    excel_normalized: pd.DataFrame, sql_normalized: pd.DataFrame
+) -> Tuple[pd.Series, pd.Series, bool]:
+    """Return join keys for both sides and whether they are hashed.
+
+    Hashed keys are returned as ``uint64`` series. If a hash collision is
+    detected, string keys are returned instead.
+    """
+    excel_hash = hash_keys(excel_normalized)
+    sql_hash = hash_keys(sql_normalized)
+    if has_collisions([excel_normalized, sql_normalized], [excel_hash, sql_hash]):
+        return string_keys(excel_normalized), string_keys(sql_normalized), False
+    return (
+        pd.Series(excel_hash, index=excel_normalized.index),
+        pd.Series(sql_hash, index=sql_normalized.index),
+        True,
+    )
+
+
+def duplicate_key_counts(normalized: pd.DataFrame, keys: pd.Series) -> dict:
+    """Return ``{display key: count}`` for keys that occur more than once.
+
+    Display strings are only built for the duplicated rows.
+    """
+    duplicated = keys.duplicated(keep=False).to_numpy()
+    if not duplicated.any():
+        return {}
+    return string_keys(normalized[duplicated]).value_counts().to_dict()
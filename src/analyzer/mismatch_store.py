@@ -0,0 +1,242 @@
+"""Columnar storage for the mismatching cells of a sheet comparison.
+
+Each mismatch is kept as one entry in parallel arrays (row, column id, Excel
+value, SQL value, difference and absolute variance) instead of a Python dict
+per cell. At most ``cap`` entries are retained; when more mismatches are
+found the ones with the largest absolute variance are kept, while the total
+number of mismatches is still counted.
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MISMATCH_CAP = 10_000
+NULL_MISMATCH = "NULL mismatch"
+STRING_MISMATCH = "String mismatch"
+
+_FIELDS = ("row", "column", "excel_value", "sql_value", "difference", "variance")
+
+
+class MismatchStore:
+    """Mismatching cells of one sheet stored as parallel arrays."""
+
+    def __init__(self, cap: Optional[int] = DEFAULT_MISMATCH_CAP):
+        self.cap = cap
+        self.columns: List = []
+        self._column_ids: Dict = {}
+        self._counts: Dict = {}
+        self._parts: List[Dict[str, np.ndarray]] = []
+        self._data: Optional[Dict[str, np.ndarray]] = None
+        self._pending = 0
+
+    @property
+    def total(self) -> int:
+        """Number of mismatches found, including those not retained."""
+        return sum(self._counts.values())
+
+    def count(self, column) -> int:
+        return self._counts.get(column, 0)
+
+    def __len__(self) -> int:
+        return len(self._arrays()["row"])
+
+    def _column_id(self, column) -> int:
+        if column not in self._column_ids:
+            self._column_ids[column] = len(self.columns)
+            self.columns.append(column)
+        return self._column_ids[column]
+
+    def add(self, column, rows, excel_values, sql_values, differences, variance):
+        """Append the mismatches of ``column``.
+
+        ``differences`` holds the numeric difference of each cell, or one of
+        ``NULL_MISMATCH``/``STRING_MISMATCH``; ``variance`` is the absolute
+        variance used to rank the cells.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        self._counts[column] = self._counts.get(column, 0) + len(rows)
+        if not len(rows):
+            return
+        self._append({
+            "row": rows,
+            "column": np.full(len(rows), self._column_id(column), dtype=np.int32),
+            "excel_value": _object_array(excel_values),
+            "sql_value": _object_array(sql_values),
+            "difference": _object_array(differences),
+            "variance": np.asarray(variance, dtype=float),
+        })
+
+    def extend(self, other: "MismatchStore", row_offset: int = 0):
+        """Append the retained mismatches of ``other`` shifting its rows."""
+        for column in other.columns:
+            self._counts[column] = self._counts.get(column, 0) + other.count(column)
+        data = other._arrays()
+        if not len(data["row"]):
+            return
+        ids = np.array([self._column_id(col) for col in other.columns], dtype=np.int32)
+        self._append({
+            "row": data["row"] + row_offset,
+            "column": ids[data["column"]],
+            "excel_value": data["excel_value"],
+            "sql_value": data["sql_value"],
+            "difference": data["difference"],
+            "variance": data["variance"],
+        })
+
+    def split(self, row_groups, row_numbers, n_groups: int, cap: Optional[int] = DEFAULT_MISMATCH_CAP) -> List["MismatchStore"]:
+        """Split the mismatches into ``n_groups`` stores.
+
+        An entry goes to group ``row_groups[row]`` and is renumbered to
+        ``row_numbers[row]``. Counts are taken from the retained entries, so
+        the store should be uncapped (``cap=None``).
+        """
+        data = self._arrays()
+        stores = [MismatchStore(cap=cap) for _ in range(n_groups)]
+        if not len(data["row"]):
+            return stores
+        groups = np.asarray(row_groups)[data["row"]].astype(np.int64)
+        order = np.lexsort((data["row"], data["column"], groups))
+        runs = groups[order] * max(len(self.columns), 1) + data["column"][order]
+        for run in np.split(order, np.flatnonzero(np.diff(runs)) + 1):
+            stores[groups[run[0]]].add(
+                self.columns[data["column"][run[0]]],
+                np.asarray(row_numbers)[data["row"][run]],
+                data["excel_value"][run],
+                data["sql_value"][run],
+                data["difference"][run],
+                data["variance"][run],
+            )
+        return stores
+
+    def _append(self, part: Dict[str, np.ndarray]):
+        self._parts.append(part)
+        self._pending += len(part["row"])
+        # Prune in batches so the cap costs one partition per ~cap additions
+        if self.cap is not None and self._pending > 2 * self.cap:
+            self._arrays()
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        if self._parts or self._data is None:
+            parts = ([self._data] if self._data is not None else []) + self._parts
+            if parts:
+                data = {field: np.concatenate([p[field] for p in parts]) for field in _FIELDS}
+            else:
+                data = {
+                    "row": np.empty(0, dtype=np.int64),
+                    "column": np.empty(0, dtype=np.int32),
+                    "excel_value": np.empty(0, dtype=object),
+                    "sql_value": np.empty(0, dtype=object),
+                    "difference": np.empty(0, dtype=object),
+                    "variance": np.empty(0, dtype=float),
+                }
+            if self.cap is not None and len(data["row"]) > self.cap:
+                keep = np.argpartition(-np.nan_to_num(data["variance"]), self.cap - 1)[:self.cap]
+                keep.sort()
+                data = {field: values[keep] for field, values in data.items()}
+            self._data = data
+            self._parts = []
+            self._pending = len(data["row"])
+        return self._data
+
+    def _order(self, data, positions: np.ndarray, by_variance: bool) -> np.ndarray:
+        if by_variance:
+            keys = (data["row"][positions], -np.nan_to_num(data["variance"][positions]))
+        else:
+            keys = (data["column"][positions], data["row"][positions])
+        return positions[np.lexsort(keys)]
+
+    def top(self, k: int = 10, column=None) -> pd.DataFrame:
+        """Return the ``k`` retained mismatches with the largest absolute variance.
+
+        Ties are ordered by row. Only the selected entries are materialized.
+        """
+        data = self._arrays()
+        positions = np.arange(len(data["row"]))
+        if column is not None:
+            if column not in self._column_ids:
+                positions = positions[:0]
+            else:
+                positions = positions[data["column"] == self._column_ids[column]]
+        if len(positions) > k:
+            variance = -np.nan_to_num(data["variance"][positions])
+            positions = positions[np.argpartition(variance, k - 1)[:k]] if k > 0 else positions[:0]
+        positions = self._order(data, positions, by_variance=True)
+        return self._frame(data, positions)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return all retained mismatches ordered by column and row."""
+        data = self._arrays()
+        return self._frame(data, self._order(data, np.arange(len(data["row"])), by_variance=False))
+
+    def _frame(self, data, positions) -> pd.DataFrame:
+        column_names = np.array(self.columns + [None], dtype=object)
+        return pd.DataFrame({
+            "row": data["row"][positions],
+            "column": column_names[data["column"][positions]],
+            "excel_value": data["excel_value"][positions],
+            "sql_value": data["sql_value"][positions],
+            "difference": data["difference"][positions],
+        })
+
+    def rows_for(self, column) -> "MismatchRows":
+        """Return a read-only, dict-per-row view of one column's mismatches."""
+        return MismatchRows(self, column)
+
+    def _column_positions(self, column) -> np.ndarray:
+        data = self._arrays()
+        if column not in self._column_ids:
+            return np.empty(0, dtype=np.int64)
+        positions = np.flatnonzero(data["column"] == self._column_ids[column])
+        return positions[np.argsort(data["row"][positions], kind="stable")]
+
+
+class MismatchRows:
+    """Sequence of ``{"row", "excel_value", "sql_value", "difference"}`` dicts.
+
+    Dicts are built on access from the owning :class:`MismatchStore`, so
+    code that still iterates ``mismatch_rows`` keeps working without the
+    results holding one dict per cell.
+    """
+
+    def __init__(self, store: MismatchStore, column):
+        self.store = store
+        self.column = column
+
+    def __len__(self) -> int:
+        return len(self.store._column_positions(self.column))
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def _record(self, position) -> Dict:
+        data = self.store._arrays()
+        return {
+            "row": int(data["row"][position]),
+            "excel_value": data["excel_value"][position],
+            "sql_value": data["sql_value"][position],
+            "difference": data["difference"][position],
+        }
+
+    def __getitem__(self, index):
+        positions = self.store._column_positions(self.column)
+        if isinstance(index, slice):
+            return [self._record(p) for p in positions[index]]
+        return self._record(positions[index])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for position in self.store._column_positions(self.column):
+            yield self._record(position)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"MismatchRows({self.column!r}, {len(self)} rows)"
+
+
+def _object_array(values) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values) if not isinstance(values, np.ndarray) else values
+    return array
@@ -0,0 +1,112 @@
+"""Compare several sheets concurrently in a pool of worker processes.
+
+Each worker process builds its own :class:`ComparisonEngine` from a
+picklable snapshot of the caller's engine settings and compares sheets with
+:meth:`ComparisonEngine.compare_sheet`, which leaves no per-call state on the
+engine. Results are returned in the order the sheets were submitted.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Engine used by the current worker process
+_worker_engine = None
+
+
+def engine_settings(engine) -> Dict:
+    """Return the configuration of ``engine`` needed to rebuild it in a worker."""
+    return {
+        "tolerance": engine.tolerance,
+        "sign_flip_accounts": sorted(str(a) for a in engine.sign_flip_accounts),
+        "saved_column_mappings": dict(engine.saved_column_mappings),
+        "plugin_dirs": engine.plugin_dirs,
+        "mismatch_cap": engine.mismatch_cap,
+        "hierarchical": engine.hierarchical,
+    }
+
+
+def build_engine(settings: Dict):
+    """Create a :class:`ComparisonEngine` configured from ``settings``."""
+    from .comparison_engine import ComparisonEngine
+
+    engine = ComparisonEngine(plugin_dirs=settings.get("plugin_dirs"), debug_log_file=None)
+    engine.set_tolerance(settings.get("tolerance", 0.001))
+    engine.set_sign_flip_accounts(settings.get("sign_flip_accounts"))
+    engine.set_saved_column_mappings(settings.get("saved_column_mappings"))
+    if "mismatch_cap" in settings:
+        engine.set_mismatch_cap(settings["mismatch_cap"])
+    engine.set_hierarchical(settings.get("hierarchical", False))
+    return engine
+
+
+def _init_worker(settings: Dict):
+    global _worker_engine
+    _worker_engine = build_engine(settings)
+
+
+def _compare_task(sheet_name: str, excel_df: pd.DataFrame, sql_df: pd.DataFrame) -> Dict:
+    try:
+        if _worker_engine.hierarchical:
+            return _worker_engine.compare_hierarchical(excel_df, sql_df, sheet_name=sheet_name)
+        return _worker_engine.compare_sheet(excel_df, sql_df, sheet_name=sheet_name)
+    except Exception as e:
+        logger.error(f"Error comparing sheet {sheet_name}: {str(e)}", exc_info=True)
+        return {"error": str(e)}
+
+
+def default_worker_count() -> int:
+    """Return the number of workers used when none is configured."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def compare_sheets(
+    tasks: Iterable[Tuple[str, pd.DataFrame, pd.DataFrame]],
+    settings: Dict,
+    max_workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, str], bool]] = None,
+) -> Dict[str, Dict]:
+    """Compare ``(sheet_name, excel_df, sql_df)`` tasks in worker processes.
+
+    ``progress_callback`` is called with the number of finished sheets and
+    the name of the last one; returning ``False`` cancels the sheets that
+    have not started yet. The returned dict follows the order of ``tasks``
+    and only contains sheets that finished.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return {}
+    workers = max(1, min(max_workers or default_worker_count(), len(tasks)))
+    logger.info(f"Comparing {len(tasks)} sheets with {workers} worker processes")
+
+    finished = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(settings,)
+    ) as executor:
+        futures = {
+            executor.submit(_compare_task, sheet_name, excel_df, sql_df): sheet_name
+            for sheet_name, excel_df, sql_df in tasks
+        }
+        for future in as_completed(futures):
+            sheet_name = futures[future]
+            try:
+                finished[sheet_name] = future.result()
+            except Exception as e:
+                logger.error(f"Worker failed for sheet {sheet_name}: {str(e)}")
+                finished[sheet_name] = {"error": str(e)}
+            if progress_callback and progress_callback(len(finished), sheet_name) is False:
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    return {
+        sheet_name: finished[sheet_name]
+        for sheet_name, _excel_df, _sql_df in tasks
+        if sheet_name in finished
+    }
@@ -49,7 +49,17 @@ def _build_summary_lines(
         for col, stats in column_comparisons.items():
             lines.append(f"- {col}: {stats.get('mismatch_count', 0)} mismatches")
 
-    if mismatches_df is not None and not mismatches_df.empty:
+    missing_rows = comparison_results.get("missing_rows")
+    if isinstance(missing_rows, pd.DataFrame):
+        # One entry per record, straight from the merge indicator
+        if not missing_rows.empty:
+            lines.append("")
+            lines.append("## Missing Rows")
+            # Key values come first and ``Result`` last
+            for row in missing_rows.itertuples(index=False):
+                keys = " ".join(str(v) for v in row[:-1])
+                lines.append(f"- {keys} ({row[-1]})")
+    elif mismatches_df is not None and not mismatches_df.empty:
         missing_rows = mismatches_df[mismatches_df["Result"].isin(["Missing in Excel", "Missing in Database"])]
         if not missing_rows.empty:
             lines.append("")
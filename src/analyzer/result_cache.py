@@ -0,0 +1,78 @@
+"""Per-sheet cache of comparison results keyed by input fingerprints.
+
+A sheet's key combines content fingerprints of its Excel frame and SQL
+partition with everything else that changes the result: column mappings,
+tolerance, sign flip accounts, mismatch retention and the comparison mode.
+Rerunning a comparison reuses the cached result of every sheet whose key is
+unchanged, so only edited sheets (or sheets whose SQL rows changed) are
+compared again.
+"""
+
+import hashlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Return a digest of the columns, dtypes and values of ``df``."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    digest.update(repr(df.shape).encode())
+    if len(df):
+        try:
+            hashes = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:
+            # Unhashable cells (lists, dicts) are hashed through their text
+            hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+        digest.update(np.ascontiguousarray(hashes.to_numpy(dtype=np.uint64)).tobytes())
+    return digest.hexdigest()
+
+
+def _mapping_items(mappings) -> Tuple:
+    if not mappings:
+        return ()
+    return tuple(sorted((str(k), repr(v)) for k, v in mappings.items()))
+
+
+class SheetResultCache:
+    """Latest comparison result of each sheet with the key it was built for."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple, Dict]] = {}
+
+    def key(self, engine, excel_df, sql_df, column_mappings=None, mode="full") -> Tuple:
+        """Return the cache key for comparing ``excel_df`` with ``sql_df``."""
+        return (
+            frame_fingerprint(excel_df),
+            frame_fingerprint(sql_df),
+            _mapping_items(column_mappings),
+            _mapping_items(engine.saved_column_mappings),
+            engine.tolerance,
+            tuple(sorted(engine.sign_flip_index.accounts)),
+            engine.mismatch_cap,
+            repr(engine.plugin_dirs),
+            mode,
+        )
+
+    def get(self, sheet_name, key) -> Optional[Dict]:
+        entry = self._entries.get(sheet_name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        return None
+
+    def put(self, sheet_name, key, result: Dict):
+        self._entries[sheet_name] = (key, result)
+
+    def discard(self, sheet_name):
+        self._entries.pop(sheet_name, None)
+
+    def clear(self):
+        self._entries = {}
+
+    def __contains__(self, sheet_name) -> bool:
+        return sheet_name in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,17 +1,89 @@
 from typing import Iterable, Any
+import numpy as np
 import pandas as pd
 
 from . import sign_flip
+from .mismatch_store import MismatchStore, NULL_MISMATCH, STRING_MISMATCH
+
+
+def _compare_numeric(excel_values: np.ndarray, sql_values: np.ndarray, flip: np.ndarray, tolerance: float):
+    """Vectorized numeric comparison returning match, null mismatch and candidate masks."""
+    e_null = np.isnan(excel_values)
+    s_null = np.isnan(sql_values)
+    sql_adj = np.where(flip, -sql_values, sql_values)
+
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        # Treat NULL on one side and numeric zero on the other as a match
+        null_zero = (e_null & ~s_null & (sql_adj == 0)) | (s_null & ~e_null & (excel_values == 0))
+        null_mismatch = (e_null != s_null) & ~null_zero
+
+        both = ~e_null & ~s_null
+        abs_e = np.abs(excel_values)
+        abs_s = np.abs(sql_adj)
+        relative = (abs_e > 1) | (abs_s > 1)
+        max_val = np.where(relative, np.maximum(abs_e, abs_s), 1.0)
+        difference = excel_values - sql_adj
+        value_match = np.abs(difference) / max_val <= tolerance
+        value_mismatch = both & ~value_match
+
+        # Check if flipping the sign of unflipped values would produce a match
+        flip_match = np.abs(excel_values + sql_values) / max_val <= tolerance
+        candidates = value_mismatch & ~flip & flip_match
+
+    return null_mismatch, value_mismatch, difference, candidates
+
+
+def _compare_text(excel_series: pd.Series, sql_series: pd.Series):
+    """Vectorized case-insensitive string comparison."""
+    e_null = pd.isna(excel_series).to_numpy(dtype=bool)
+    s_null = pd.isna(sql_series).to_numpy(dtype=bool)
+    null_mismatch = e_null != s_null
+
+    both = ~e_null & ~s_null
+    value_mismatch = np.zeros(len(excel_series), dtype=bool)
+    if both.any():
+        excel_text = pd.Series([str(v) for v in excel_series[both]], dtype=object).str.strip().str.lower()
+        sql_text = pd.Series([str(v) for v in sql_series[both]], dtype=object).str.strip().str.lower()
+        value_mismatch[both] = excel_text.to_numpy() != sql_text.to_numpy()
+    return null_mismatch, value_mismatch
 
 
 def compare_series(excel_series: Iterable[Any], sql_series: Iterable[Any], account_series: Iterable[Any] = None,
-                   tolerance: float = 0.001, sign_flip_accounts: Iterable[str] = None):
-    """Compare two series and return statistics used by the comparison engine."""
+                   tolerance: float = 0.001, sign_flip_accounts: Iterable[str] = None,
+                   excel_numeric: pd.Series = None, sql_numeric: pd.Series = None,
+                   sign_flip_index: sign_flip.SignFlipIndex = None,
+                   mismatch_store: MismatchStore = None, column=None,
+                   normalized_accounts: np.ndarray = None, is_numeric: bool = None,
+                   row_numbers: np.ndarray = None):
+    """Compare two series and return statistics used by the comparison engine.
+
+    ``excel_numeric`` and ``sql_numeric`` may hold the series already passed
+    through ``pd.to_numeric(errors="coerce")`` (for example from a
+    :class:`~src.analyzer.column_profile.ColumnProfile`) to skip coercion.
+    ``sign_flip_index`` may be passed instead of ``sign_flip_accounts`` to
+    reuse an already built :class:`~src.analyzer.sign_flip.SignFlipIndex`,
+    and ``normalized_accounts`` the result of its ``normalize`` for
+    ``account_series`` when several columns share the same accounts.
+
+    When ``mismatch_store`` is given the mismatching cells are appended to it
+    under ``column`` and ``mismatch_rows`` is a view of the store; otherwise
+    ``mismatch_rows`` is a list of dicts.
+
+    ``is_numeric`` fixes the comparison mode instead of detecting it from
+    the values, and ``row_numbers`` gives the row recorded for each element,
+    for callers that only pass a subset of a column's rows.
+    """
     if account_series is None:
         account_series = [None] * len(list(excel_series))
     excel_series = pd.Series(excel_series).reset_index(drop=True)
     sql_series = pd.Series(sql_series).reset_index(drop=True)
-    account_series = pd.Series(account_series).reset_index(drop=True)
+    account_series = pd.Series(account_series, dtype=object).reset_index(drop=True)
+
+    # Rows are paired positionally; extra values on any side are ignored
+    length = min(len(excel_series), len(sql_series), len(account_series))
+    excel_series = excel_series.iloc[:length]
+    sql_series = sql_series.iloc[:length]
+    account_series = account_series.iloc[:length]
 
     results = {
         "is_numeric": False,
@@ -19,80 +91,81 @@ def compare_series(excel_series: Iterable[Any], sql_series: Iterable[Any], accou
         "mismatch_count": 0,
         "mismatch_rows": [],
         "null_mismatch_count": 0,
-        "sign_flipped": bool(sign_flip_accounts),
+        "sign_flipped": bool(sign_flip_accounts) or bool(sign_flip_index),
         "sign_flip_candidates": set(),
     }
 
     try:
-        excel_num = pd.to_numeric(excel_series, errors="coerce")
-        sql_num = pd.to_numeric(sql_series, errors="coerce")
-        if excel_num.notna().mean() > 0.5 and sql_num.notna().mean() > 0.5:
+        if excel_numeric is None:
+            excel_num = pd.to_numeric(excel_series, errors="coerce")
+        else:
+            excel_num = pd.Series(excel_numeric).reset_index(drop=True).iloc[:length]
+        if sql_numeric is None:
+            sql_num = pd.to_numeric(sql_series, errors="coerce")
+        else:
+            sql_num = pd.Series(sql_numeric).reset_index(drop=True).iloc[:length]
+        if is_numeric is None:
+            is_numeric = excel_num.notna().mean() > 0.5 and sql_num.notna().mean() > 0.5
+        if is_numeric:
             results["is_numeric"] = True
             excel_series = excel_num
             sql_series = sql_num
     except Exception:
         pass
 
-    for i, (e_val, s_val, acct) in enumerate(zip(excel_series, sql_series, account_series)):
-        e_null = pd.isna(e_val)
-        s_null = pd.isna(s_val)
-        s_val_adj = sign_flip.apply(s_val, acct, sign_flip_accounts) if results["is_numeric"] else s_val
-        if e_null and s_null:
-            results["match_count"] += 1
-            continue
-        if e_null != s_null:
-            treated_as_match = False
-            if results["is_numeric"]:
-                # Treat NULL on one side and numeric zero on the other as a match
-                try:
-                    if (e_null and float(s_val_adj) == 0) or (s_null and float(e_val) == 0):
-                        results["match_count"] += 1
-                        treated_as_match = True
-                except Exception:
-                    pass
-            if not treated_as_match:
-                results["null_mismatch_count"] += 1
-                results["mismatch_count"] += 1
-                results["mismatch_rows"].append({"row": i, "excel_value": e_val, "sql_value": s_val_adj, "difference": "NULL mismatch"})
-            continue
-        if results["is_numeric"]:
-            try:
-                e_num = float(e_val)
-                s_num = float(s_val_adj)
-                diff = abs(e_num - s_num)
-                if (abs(e_num) > 1 or abs(s_num) > 1):
-                    max_val = max(abs(e_num), abs(s_num))
-                    match = diff / max_val <= tolerance
-                else:
-                    max_val = 1
-                    match = diff <= tolerance
-                if match:
-                    results["match_count"] += 1
-                else:
-                    results["mismatch_count"] += 1
-                    results["mismatch_rows"].append({"row": i, "excel_value": e_val, "sql_value": s_val_adj, "difference": e_num - s_num})
-                    # Check if flipping sign would produce a match
-                    try:
-                        if not sign_flip.should_flip(acct, sign_flip_accounts):
-                            s_orig = float(s_val)
-                            diff_flip = abs(e_num + s_orig)
-                            flip_match = diff_flip / max_val <= tolerance if max_val != 1 else diff_flip <= tolerance
-                            if flip_match:
-                                results["sign_flip_candidates"].add(sign_flip._normalize_account(acct))
-                    except Exception:
-                        pass
-            except Exception:
-                if str(e_val).strip() == str(s_val_adj).strip():
-                    results["match_count"] += 1
-                else:
-                    results["mismatch_count"] += 1
-                    results["mismatch_rows"].append({"row": i, "excel_value": e_val, "sql_value": s_val_adj, "difference": "String mismatch"})
+    if results["is_numeric"]:
+        if sign_flip_index is None:
+            sign_flip_index = sign_flip.SignFlipIndex(sign_flip_accounts)
+        if normalized_accounts is None:
+            normalized_accounts = sign_flip_index.normalize(account_series)
         else:
-            if str(e_val).strip().lower() == str(s_val_adj).strip().lower():
-                results["match_count"] += 1
-            else:
-                results["mismatch_count"] += 1
-                results["mismatch_rows"].append({"row": i, "excel_value": e_val, "sql_value": s_val_adj, "difference": "String mismatch"})
+            normalized_accounts = np.asarray(normalized_accounts, dtype=object)[:length]
+        flip = np.isin(normalized_accounts, list(sign_flip_index.accounts))
+        null_mismatch, value_mismatch, difference, candidates = _compare_numeric(
+            excel_series.to_numpy(dtype=float, na_value=np.nan),
+            sql_series.to_numpy(dtype=float, na_value=np.nan),
+            flip,
+            tolerance,
+        )
+        results["sign_flip_candidates"] = set(normalized_accounts[candidates].tolist())
+    else:
+        flip = np.zeros(length, dtype=bool)
+        null_mismatch, value_mismatch = _compare_text(excel_series, sql_series)
+
+    mismatch = null_mismatch | value_mismatch
+    results["null_mismatch_count"] = int(null_mismatch.sum())
+    results["mismatch_count"] = int(mismatch.sum())
+    results["match_count"] = length - results["mismatch_count"]
+
+    # Only mismatching cells are materialized as Python objects
+    store = mismatch_store if mismatch_store is not None else MismatchStore(cap=None)
+    rows = np.flatnonzero(mismatch)
+    excel_values = excel_series.iloc[rows].tolist()
+    sql_values = [
+        -float(v) if f else v
+        for v, f in zip(sql_series.iloc[rows].tolist(), flip[rows].tolist())
+    ]
+    is_null = null_mismatch[rows]
+    differences = np.empty(len(rows), dtype=object)
+    if results["is_numeric"]:
+        differences[:] = difference[rows].tolist()
+        # NULL mismatches rank by the value present on the other side
+        variance = np.where(
+            is_null,
+            np.fmax(np.abs(np.asarray(excel_values, dtype=float)), np.abs(np.asarray(sql_values, dtype=float))),
+            np.abs(difference[rows]),
+        )
+    else:
+        differences[:] = STRING_MISMATCH
+        variance = np.zeros(len(rows))
+    differences[is_null] = NULL_MISMATCH
+    if row_numbers is not None:
+        rows = np.asarray(row_numbers)[rows]
+    store.add(column, rows, excel_values, sql_values, differences, np.nan_to_num(variance))
+    if mismatch_store is None:
+        results["mismatch_rows"] = list(store.rows_for(column))
+    else:
+        results["mismatch_rows"] = store.rows_for(column)
 
     total = results["match_count"] + results["mismatch_count"]
     results["match_percentage"] = (results["match_count"] / total * 100) if total else 0
@@ -0,0 +1,50 @@
+"""Row fingerprints used to skip rows whose compared cells are identical.
+
+Every compared column is reduced to a ``uint64`` hash per row using the same
+normalization as :mod:`src.analyzer.row_comparison`: numeric columns after
+the sign flip, with missing values read as zero, and text columns stripped
+and lower-cased. The column hashes of a row are combined into one
+fingerprint per side. Rows whose fingerprints are equal on both sides match
+in every column, so only the remaining rows need the tolerance-aware
+comparison.
+"""
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+# Multiplier used to combine the column hashes of a row
+_COMBINE = np.uint64(0x100000001B3)
+_NULL_TEXT = "\x00"
+
+
+def numeric_hash(values: np.ndarray, flip: np.ndarray = None) -> np.ndarray:
+    """Hash float ``values``, negating flipped rows and reading NaN as zero.
+
+    NULL and zero match each other in the comparison, and ``-0.0`` equals
+    ``0.0``, so both are hashed as ``0.0``.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+    if flip is not None:
+        values = np.where(flip, -values, values)
+    values = values + 0.0
+    return pd.util.hash_array(values)
+
+
+def text_hash(values: pd.Series) -> np.ndarray:
+    """Hash ``values`` as stripped, lower-cased strings with a marker for NULL."""
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    # Strings are normalized once per distinct value
+    codes, uniques = pd.factorize(values.astype(str).where(values.notna(), _NULL_TEXT))
+    normalized = pd.Series(uniques, dtype=object).str.strip().str.lower()
+    normalized[uniques == _NULL_TEXT] = _NULL_TEXT
+    return pd.util.hash_array(normalized.to_numpy(dtype=object))[codes]
+
+
+def combine(hashes: Iterable[np.ndarray], length: int) -> np.ndarray:
+    """Combine per-column hashes into one fingerprint per row."""
+    fingerprint = np.zeros(length, dtype=np.uint64)
+    for column_hash in hashes:
+        fingerprint = (fingerprint * _COMBINE) ^ column_hash
+    return fingerprint
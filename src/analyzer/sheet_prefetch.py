@@ -0,0 +1,133 @@
+"""Background loading of workbook sheets in priority order.
+
+:class:`SheetPrefetcher` loads sheets one at a time on a daemon thread,
+starting with the sheets given to :meth:`SheetPrefetcher.prioritize`.
+Callers ask for a sheet with :meth:`SheetPrefetcher.get`, which returns the
+background result when the sheet is already loaded, waits when it is being
+loaded and otherwise loads it in the calling thread, so a caller only ever
+waits for the sheet it needs.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def neighbour_order(names: List, first) -> List:
+    """Return ``names`` ordered by distance from ``first``, nearest first.
+
+    Of two sheets at the same distance the one after ``first`` comes first.
+    """
+    if first not in names:
+        return list(names)
+    index = names.index(first)
+    order = [first]
+    for distance in range(1, len(names)):
+        for position in (index + distance, index - distance):
+            if 0 <= position < len(names):
+                order.append(names[position])
+    return order
+
+
+class SheetPrefetcher:
+    """Load sheets with ``load(name)`` on a background thread.
+
+    Every background result is handed out once: the first :meth:`get` of a
+    sheet returns it, later calls load the sheet again in the caller.
+
+    ``lock`` guards the prefetcher's state. A caller may pass its own lock
+    to publish what ``load`` produces under the same lock; ``load`` itself
+    runs without holding it.
+    """
+
+    def __init__(self, load: Callable, names: Iterable, lock=None):
+        self._load = load
+        self._order = list(names)
+        self._results: Dict = {}
+        self._loading: Dict[object, threading.Event] = {}
+        self._finished = set()
+        self._lock = lock or threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def prioritize(self, names: Iterable):
+        """Load ``names`` next, in order, and start the background thread."""
+        names = list(names)
+        with self._lock:
+            if self._stopped:
+                return
+            wanted = set(names)
+            self._order = names + [name for name in self._order if name not in wanted]
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sheet-prefetch", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Stop after the sheet being loaded; ``get`` still works."""
+        with self._lock:
+            self._stopped = True
+
+    def is_loaded(self, name) -> bool:
+        with self._lock:
+            return name in self._results
+
+    def get(self, name):
+        """Return the loaded sheet, waiting only while it is being loaded."""
+        while True:
+            with self._lock:
+                if name in self._results:
+                    return self._results.pop(name)
+                event = self._loading.get(name)
+                claimed = event is None
+                if claimed:
+                    event = self._loading[name] = threading.Event()
+            if not claimed:
+                event.wait()
+                continue
+            try:
+                return self._load(name)
+            finally:
+                with self._lock:
+                    self._finished.add(name)
+                    del self._loading[name]
+                event.set()
+
+    def wait(self, timeout=None) -> bool:
+        """Wait for the background thread; ``False`` if it is still running."""
+        thread = self._thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _next(self):
+        with self._lock:
+            if not self._stopped:
+                for name in self._order:
+                    if name not in self._finished and name not in self._loading:
+                        self._loading[name] = threading.Event()
+                        return name
+            self._thread = None
+            return None
+
+    def _run(self):
+        while True:
+            name = self._next()
+            if name is None:
+                return
+            try:
+                result = self._load(name)
+            except Exception as e:
+                logger.warning(f"Prefetching sheet {name} failed: {e}")
+                result = None
+            with self._lock:
+                self._finished.add(name)
+                if result is not None:
+                    self._results[name] = result
+                event = self._loading.pop(name)
+            event.set()
@@ -1,20 +1,75 @@
 import re
 from typing import Iterable, Any
 
+import numpy as np
+import pandas as pd
+
+# Account numbers embedded in longer labels, e.g. "1234-5678 Revenue"
+_ACCOUNT_PATTERN = re.compile(r"\d{4}-\d{4}")
+_NON_DIGITS = re.compile(r"\D")
+
 
 def _normalize_account(account: Any) -> str:
     """Return digits-only account identifier."""
     acct_str = str(account).strip()
     if not acct_str:
         return ""
-    digits = re.findall(r"\d", acct_str)
-    return "".join(digits)
+    match = _ACCOUNT_PATTERN.search(acct_str)
+    if match:
+        acct_str = match.group(0)
+    return _NON_DIGITS.sub("", acct_str)
+
+
+def normalize_accounts(accounts: pd.Series) -> pd.Series:
+    """Vectorized :func:`_normalize_account` for a series of accounts.
+
+    Missing values normalize to an empty identifier.
+    """
+    acct_str = accounts.astype(str).str.strip()
+    extracted = acct_str.str.extract(r"(\d{4}-\d{4})", expand=False).fillna(acct_str)
+    return extracted.str.replace(r"\D", "", regex=True).fillna("")
+
+
+class SignFlipIndex:
+    """Normalized set of sign flip accounts built once per configuration."""
+
+    def __init__(self, accounts: Iterable[str] = None):
+        self.accounts = frozenset(
+            normalize_accounts(pd.Series(list(accounts or []), dtype=object))
+        ) - {""}
+
+    def __bool__(self):
+        return bool(self.accounts)
+
+    def __contains__(self, account: Any) -> bool:
+        return _normalize_account(account) in self.accounts
+
+    def normalize(self, account_series) -> np.ndarray:
+        """Return normalized identifiers for ``account_series``.
+
+        Normalization runs once per distinct account value.
+        """
+        codes, uniques = pd.factorize(pd.Series(account_series, dtype=object).astype(str))
+        normalized = normalize_accounts(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+        # Missing values (code -1) normalize to an empty identifier
+        return np.append(normalized, "")[codes]
+
+    def mask(self, account_series) -> np.ndarray:
+        """Return a boolean array marking rows whose account is flipped."""
+        if not self.accounts:
+            return np.zeros(len(account_series), dtype=bool)
+        return np.isin(self.normalize(account_series), list(self.accounts))
+
+    def signs(self, account_series) -> np.ndarray:
+        """Return ``-1.0`` for flipped rows and ``1.0`` otherwise."""
+        return np.where(self.mask(account_series), -1.0, 1.0)
 
 
 def should_flip(account: Any, sign_flip_accounts: Iterable[str]) -> bool:
     """Return True if the value should have its sign flipped."""
-    accounts = {_normalize_account(a) for a in sign_flip_accounts or []}
-    return _normalize_account(account) in accounts
+    if isinstance(sign_flip_accounts, SignFlipIndex):
+        return account in sign_flip_accounts
+    return account in SignFlipIndex(sign_flip_accounts)
 
 
 def apply(value: Any, account: Any, sign_flip_accounts: Iterable[str]):
@@ -0,0 +1,95 @@
+"""Split one SQL result into the rows relevant to each Excel sheet."""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import column_profile
+
+# Columns that identify the rows of a sheet when present on both sides
+KEY_COLUMNS = ("Center", "CAReportName", "Account")
+
+
+def detect_sheet_column(columns):
+    """Return the column that appears to contain sheet names, or ``None``."""
+    norm_map = {column_profile.normalize_name(col): col for col in columns}
+    for cand in ["sheetname", "sheet"]:
+        if cand in norm_map:
+            return norm_map[cand]
+    return None
+
+
+def _normalize(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.strip().str.lower()
+
+
+class SqlResultPartitioner:
+    """Normalize and group the SQL key columns once for all sheets.
+
+    Every key column is factorized on first use and rows are grouped by
+    their combination of key codes. A sheet's subset is then found by
+    checking each distinct key combination against the sheet's values
+    instead of re-normalizing the whole SQL frame per sheet.
+    """
+
+    def __init__(self, sql_df: pd.DataFrame):
+        self.sql_df = sql_df
+        self.sheet_column = detect_sheet_column(sql_df.columns)
+        self._codes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._groups: Dict[Tuple, Tuple[np.ndarray, List[np.ndarray]]] = {}
+
+    def key_pairs(self, excel_df: pd.DataFrame) -> List[Tuple[str, str]]:
+        """Return ``(excel column, sql column)`` pairs used to filter rows."""
+        pairs = [
+            (col, col)
+            for col in KEY_COLUMNS
+            if col in excel_df.columns and col in self.sql_df.columns
+        ]
+        excel_sheet_col = detect_sheet_column(excel_df.columns)
+        if excel_sheet_col and self.sheet_column:
+            pairs.append((excel_sheet_col, self.sheet_column))
+        return pairs
+
+    def _column_codes(self, column) -> Tuple[np.ndarray, np.ndarray]:
+        if column not in self._codes:
+            codes, uniques = pd.factorize(_normalize(self.sql_df[column]))
+            self._codes[column] = (codes, np.asarray(uniques, dtype=object))
+        return self._codes[column]
+
+    def _key_groups(self, columns: Tuple) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """Return distinct key code combinations and their row positions."""
+        if columns not in self._groups:
+            codes = np.column_stack([self._column_codes(col)[0] for col in columns])
+            # Rows with a missing key value never match a sheet
+            valid_rows = np.flatnonzero((codes >= 0).all(axis=1))
+            combos, inverse = np.unique(codes[valid_rows], axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            order = np.argsort(inverse, kind="stable")
+            bounds = np.cumsum(np.bincount(inverse, minlength=len(combos)))[:-1]
+            positions = np.split(valid_rows[order], bounds)
+            self._groups[columns] = (combos, positions)
+        return self._groups[columns]
+
+    def subset(self, excel_df: pd.DataFrame) -> pd.DataFrame:
+        """Return the SQL rows whose key values all appear in ``excel_df``.
+
+        Without shared key columns all rows are returned (as a copy).
+        """
+        pairs = self.key_pairs(excel_df)
+        if not pairs:
+            return self.sql_df.copy()
+
+        sql_columns = tuple(sql_col for _, sql_col in pairs)
+        combos, positions = self._key_groups(sql_columns)
+        selected = np.ones(len(combos), dtype=bool)
+        for i, (excel_col, sql_col) in enumerate(pairs):
+            excel_vals = _normalize(excel_df[excel_col].dropna()).unique()
+            _codes, uniques = self._column_codes(sql_col)
+            allowed = pd.Index(uniques).isin(excel_vals)
+            selected &= allowed[combos[:, i]]
+
+        if not selected.any():
+            return self.sql_df.iloc[0:0]
+        rows = np.sort(np.concatenate([positions[g] for g in np.flatnonzero(selected)]))
+        return self.sql_df.iloc[rows]
@@ -0,0 +1,212 @@
+"""On-disk cache of analyzed workbook sheets.
+
+Parsing and unmerging a large workbook is by far the slowest part of opening
+it, and the same workbooks are opened again and again (not least by
+``load_last_session`` at startup). :class:`WorkbookCache` keeps the parsed
+frame of every analyzed sheet together with its analysis (``structure``,
+``header_indexes``, ``data_area``, ``numerical_columns`` and the suggested
+queries) in one pickle file per sheet, under a directory per workbook::
+
+    <cache dir>/
+        index.json              # path -> [size, mtime_ns, content digest]
+        <content digest>-v<format>-pandas<version>/
+            <sheet digest>.pkl
+
+Entries are keyed by the content digest of the workbook, so a workbook that
+was copied or saved again unchanged still hits the cache. The digest is only
+recomputed when the size or modification time of a path changed. The key
+also holds :data:`CACHE_FORMAT_VERSION` and the pandas version, so entries
+written by an older analysis or another pandas are never read back. Whole
+workbook entries are evicted least recently used first once the cache grows
+beyond its size limit.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from typing import Dict, Optional
+
+import pandas as pd
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".soo_preclose_tester_cache")
+DEFAULT_CACHE_MB = 512
+# Bump whenever the stored entries or the sheet analysis change
+CACHE_FORMAT_VERSION = 1
+_INDEX_FILE = "index.json"
+_READ_BLOCK = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """Return the hex BLAKE2b digest of the contents of ``path``."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        while True:
+            block = fh.read(_READ_BLOCK)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+class WorkbookCache:
+    """Store analyzed sheets on disk, keyed by workbook contents.
+
+    Sheets of a workbook may be stored and loaded from several threads at
+    once; the index and eviction are guarded by a lock.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_mb: float = DEFAULT_CACHE_MB):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = int(max(max_mb, 0) * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def key(self, path: str) -> Optional[str]:
+        """Return the cache key of the workbook at ``path``.
+
+        The content digest is reused while the size and modification time
+        of the file are unchanged. ``None`` if the file cannot be read.
+        """
+        try:
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            with self._lock:
+                index = self._read_index()
+                known = index.get(path)
+            if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+                digest = known[2]
+            else:
+                digest = file_digest(path)
+                with self._lock:
+                    index = self._read_index()
+                    index[path] = [stat.st_size, stat.st_mtime_ns, digest]
+                    self._write_index(index)
+            return f"{digest}-v{CACHE_FORMAT_VERSION}-pandas{pd.__version__}"
+        except OSError as e:
+            logger.warning(f"Workbook cache disabled for {path}: {e}")
+            return None
+
+    def load(self, key: str, sheet_name: str, header_rows: int) -> Optional[Dict]:
+        """Return the stored analysis of a sheet, or ``None``."""
+        path = self._sheet_path(key, sheet_name, header_rows)
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Written by another version of pandas or cut short; parse again
+            logger.warning(f"Discarding cached sheet {sheet_name}: {e}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(os.path.dirname(path))
+        except OSError:
+            pass
+        return entry
+
+    def store(self, key: str, sheet_name: str, header_rows: int, entry: Dict):
+        """Store the analysis of a sheet.
+
+        The cache is not trimmed here: call :meth:`evict` once the sheets of
+        a workbook are stored, as it lists and sizes the whole cache.
+        """
+        path = self._sheet_path(key, sheet_name, header_rows)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"Could not cache sheet {sheet_name}: {e}")
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used workbooks until the cache fits its limit.
+
+        The workbook ``keep`` is never removed.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for name in names:
+                entry_dir = os.path.join(self.directory, name)
+                if not os.path.isdir(entry_dir):
+                    continue
+                size = 0
+                try:
+                    for file_name in os.listdir(entry_dir):
+                        size += os.path.getsize(os.path.join(entry_dir, file_name))
+                    used = os.path.getmtime(entry_dir)
+                except OSError:
+                    continue
+                entries.append((used, name, size))
+                total += size
+            if total <= self.max_bytes:
+                return
+            removed = set()
+            for used, name, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                removed.add(name)
+                total -= size
+            if removed:
+                logger.info(f"Evicted {len(removed)} workbooks from the cache")
+                # Digests stay indexed while an entry of another version remains
+                kept = {name.split("-", 1)[0] for _, name, _ in entries if name not in removed}
+                dropped = {name.split("-", 1)[0] for name in removed} - kept
+                index = self._read_index()
+                self._write_index(
+                    {path: known for path, known in index.items() if known[2] not in dropped}
+                )
+
+    def clear(self):
+        """Remove every cached workbook."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _sheet_path(self, key: str, sheet_name: str, header_rows: int) -> str:
+        name = hashlib.blake2b(
+            f"{sheet_name}\0{header_rows}".encode("utf-8"), digest_size=8
+        ).hexdigest()
+        return os.path.join(self.directory, key, f"{name}.pkl")
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(os.path.join(self.directory, _INDEX_FILE), "r") as fh:
+                index = json.load(fh)
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: Dict):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_atomic(
+                os.path.join(self.directory, _INDEX_FILE), json.dumps(index).encode("utf-8")
+            )
+        except OSError as e:
+            logger.warning(f"Could not update the workbook cache index: {e}")
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
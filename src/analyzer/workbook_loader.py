@@ -0,0 +1,214 @@
+"""Read workbooks sheet by sheet with merged cells cleared on the fly.
+
+Workbooks used to be loaded in full with openpyxl, unmerged cell by cell,
+saved to a buffer and parsed again by pandas. :class:`UnmergedExcelFile`
+gives the same frames in one pass: sheets are streamed by openpyxl's
+read-only reader, the merged ranges of a sheet are read from the
+``<mergeCells>`` element of its XML, and every cell of a merged range other
+than the top-left one is read as empty while the rows are converted. The
+rows are then typed column by column as ``read_excel`` types them, so the
+frames keep the dtypes ``read_excel`` would give.
+
+The former round trip dropped the cached results of formula cells (openpyxl
+writes formulas without values), so formula cells are read as empty as well
+to keep the frames identical.
+"""
+
+import posixpath
+import re
+import zipfile
+from typing import Dict, Set, Tuple
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_MERGE_CELL = re.compile(rb'<(?:\w+:)?mergeCell\b[^>]*?\bref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+_READ_BLOCK = 1 << 20
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+# Text read as missing by ``read_excel`` (pandas' default ``na_values``)
+_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+]
+_TRUE_VALUES = {"True", "TRUE", "true"}
+_FALSE_VALUES = {"False", "FALSE", "false"}
+
+
+def _column_index(letters: bytes) -> int:
+    index = 0
+    for ch in letters:
+        index = index * 26 + ch - 64
+    return index
+
+
+def merged_ranges(source) -> list:
+    """Return ``(min_row, min_col, max_row, max_col)`` of each merged range.
+
+    ``source`` is a binary file object with the worksheet XML. It is scanned
+    in blocks, so the sheet is never held in memory as a whole.
+    """
+    ranges = []
+    tail = b""
+    while True:
+        block = source.read(_READ_BLOCK)
+        chunk = tail + block
+        # A tag cut at the end of the block is matched with the next one
+        cut = chunk.rfind(b"<") if block else len(chunk)
+        for match in _MERGE_CELL.finditer(chunk, 0, cut):
+            first_col, first_row, last_col, last_row = match.groups()
+            min_col = _column_index(first_col)
+            min_row = int(first_row)
+            ranges.append((
+                min_row,
+                min_col,
+                int(last_row) if last_row else min_row,
+                _column_index(last_col) if last_col else min_col,
+            ))
+        if not block:
+            return ranges
+        tail = chunk[cut:]
+
+
+def worksheet_paths(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Return the package path of each worksheet's XML, by sheet name."""
+
+    def relationships(part):
+        folder, name = posixpath.split(part)
+        rels = posixpath.join(folder, "_rels", f"{name}.rels")
+        targets = {}
+        for rel in ElementTree.fromstring(archive.read(rels)):
+            target = rel.get("Target", "")
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            targets[rel.get("Id")] = (rel.get("Type", ""), target)
+        return targets
+
+    workbook = next(
+        target for kind, target in relationships("").values()
+        if kind.endswith("/officeDocument")
+    )
+    targets = relationships(workbook)
+    paths = {}
+    for sheet in ElementTree.fromstring(archive.read(workbook)).iter(f"{{{_MAIN_NS}}}sheet"):
+        target = targets.get(sheet.get(f"{{{_REL_NS}}}id"))
+        if target is not None:
+            paths[sheet.get("name")] = target[1]
+    return paths
+
+
+def _convert_cell(cell, covered: bool):
+    """Return the value of ``cell`` as :func:`pandas.read_excel` reads it."""
+    value = cell.value
+    if value is None or covered or cell.data_type == "f":
+        return ""
+    if cell.data_type == "e":
+        return np.nan
+    if cell.data_type == "n":
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+
+def _parse_column(values: list) -> pd.Series:
+    """Return one column of cell values typed as ``read_excel`` types it.
+
+    Missing markers become NaN, columns of numbers (or numeric text) become
+    numeric, columns of booleans (or their text) become booleans and the
+    rest keep the dtype pandas infers for their values.
+    """
+    column = pd.Series(values, dtype=object)
+    column = column.mask(column.isin(_NA_VALUES))
+    try:
+        return pd.to_numeric(column)
+    except (TypeError, ValueError):
+        pass
+    present = column[column.notna()]
+    if len(present) and all(
+        isinstance(value, bool) or value in _TRUE_VALUES or value in _FALSE_VALUES
+        for value in present
+    ):
+        booleans = column.map(
+            lambda value: value if isinstance(value, bool) or value != value
+            else value in _TRUE_VALUES
+        )
+        return booleans.astype(bool) if len(present) == len(column) else booleans
+    return column.infer_objects()
+
+
+class UnmergedExcelFile:
+    """Workbook whose sheets are read with merged cells unmerged.
+
+    Only the top-left cell of a merged range keeps its value. Opening the
+    file only reads the workbook index; each sheet is parsed by
+    :meth:`read_sheet`. Sheets may be read from several threads at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Formula cells are only recognizable without cached values
+        self.book = load_workbook(path, read_only=True, data_only=False, keep_links=False)
+        self.sheet_names = self.book.sheetnames
+        with zipfile.ZipFile(path) as archive:
+            self._paths = worksheet_paths(archive)
+
+    def read_sheet(self, sheet_name) -> pd.DataFrame:
+        """Return the sheet like ``pd.read_excel(path, sheet_name, header=None)``."""
+        covered = self._covered_cells(sheet_name)
+        sheet = self.book[sheet_name]
+        sheet.reset_dimensions()
+
+        # Rows are trimmed and padded as pandas does for its Excel readers
+        data = []
+        last_row_with_data = -1
+        for row_number, row in enumerate(sheet.iter_rows(), start=1):
+            converted = [
+                _convert_cell(cell, covered and (row_number, col) in covered)
+                for col, cell in enumerate(row, start=1)
+            ]
+            while converted and converted[-1] == "":
+                converted.pop()
+            if converted:
+                last_row_with_data = row_number - 1
+            data.append(converted)
+        data = data[:last_row_with_data + 1]
+        if data:
+            width = max(len(row) for row in data)
+            data = [row + [""] * (width - len(row)) for row in data]
+
+        if not data:
+            return pd.DataFrame()
+        df = pd.DataFrame({
+            col: _parse_column([row[col] for row in data]) for col in range(width)
+        })
+        df.columns = pd.RangeIndex(width)
+        return df
+
+    def close(self):
+        self.book.close()
+
+    def _covered_cells(self, sheet_name) -> Set[Tuple[int, int]]:
+        """Return the cells of merged ranges that do not hold the value."""
+        path = self._paths.get(sheet_name)
+        if path is None:
+            return set()
+        with zipfile.ZipFile(self.path) as archive, archive.open(path) as source:
+            ranges = merged_ranges(source)
+        covered = set()
+        for min_row, min_col, max_row, max_col in ranges:
+            covered.update(
+                (row, col)
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+            )
+            covered.discard((min_row, min_col))
+        return covered
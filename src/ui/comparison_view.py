@@ -11,6 +11,7 @@ from PyQt6.QtWidgets import (
     QHeaderView,
     QGridLayout,
     QToolBar,
+    QToolButton,
     QApplication,
 )
 from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
@@ -18,6 +19,7 @@ from PyQt6.QtGui import QFont, QColor, QBrush, QTextCharFormat, QAction
 import markdown
 import qtawesome as qta
 import pandas as pd
+from src.analyzer.compare_profile import format_profile
 from .excel_viewer import PandasTableModel
 
 
@@ -90,6 +92,21 @@ class ComparisonView(QWidget):
         self.summary_content.setWordWrap(True)
         summary_layout.addWidget(self.summary_content)
 
+        # Collapsible stage timings of the last comparison
+        self.performance_toggle = QToolButton()
+        self.performance_toggle.setText("Performance")
+        self.performance_toggle.setCheckable(True)
+        self.performance_toggle.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+        self.performance_toggle.setArrowType(Qt.ArrowType.RightArrow)
+        self.performance_toggle.toggled.connect(self.toggle_performance)
+        self.performance_toggle.setVisible(False)
+        summary_layout.addWidget(self.performance_toggle)
+
+        self.performance_content = MarkdownView()
+        self.performance_content.setVisible(False)
+        summary_layout.addWidget(self.performance_content)
+        summary_layout.addStretch()
+
         self.tab_widget.addTab(self.summary_tab, "Summary")
 
         # Discrepancies tab
@@ -139,6 +156,20 @@ class ComparisonView(QWidget):
         # Switch to first tab
         self.tab_widget.setCurrentIndex(0)
 
+    def set_profile(self, profile):
+        """Show the stage timings and counters of a comparison run."""
+        lines = format_profile(profile)
+        self.performance_toggle.setVisible(bool(lines))
+        self.performance_content.set_markdown("\n".join(lines[1:]))
+        self.toggle_performance(self.performance_toggle.isChecked())
+
+    def toggle_performance(self, expanded):
+        """Expand or collapse the Performance section."""
+        self.performance_toggle.setArrowType(
+            Qt.ArrowType.DownArrow if expanded else Qt.ArrowType.RightArrow
+        )
+        self.performance_content.setVisible(expanded and not self.performance_toggle.isHidden())
+
     def set_discrepancies(self, df: pd.DataFrame):
         """Load the account discrepancy DataFrame into the table view."""
         if df is None:
@@ -246,6 +277,7 @@ class ComparisonView(QWidget):
         self.report_view.setHtml("")
         self.summary_header.setText("No comparison data available")
         self.summary_content.setText("")
+        self.set_profile(None)
         
     def get_report(self):
         """Get the current report content"""
@@ -891,7 +891,7 @@ class ExcelViewer(QWidget):
                 and isinstance(parent, MainWindow)
                 and hasattr(parent, "excel_analyzer")
                 and self.sheet_name
-                and self.sheet_name in parent.excel_analyzer.sheet_data
+                and parent.excel_analyzer.is_analyzed(self.sheet_name)
             ):
                 analyzer_df = parent.excel_analyzer.sheet_data[self.sheet_name][
                     "dataframe"
@@ -1121,12 +1121,8 @@ class ExcelViewer(QWidget):
                 progress.setValue(i)
                 progress.setLabelText(f"Processing sheet: {sheet_name}")
 
-                # Load the sheet if not already analyzed
-                if sheet_name not in excel_analyzer.sheet_data:
-                    excel_analyzer.analyze_sheet(sheet_name)
-
                 # Get the dataframe for this sheet
-                df = excel_analyzer.sheet_data[sheet_name]["dataframe"]
+                df = excel_analyzer.get_sheet(sheet_name)["dataframe"]
 
                 if df is None or df.empty:
                     skipped_sheets.append(f"{sheet_name} (empty)")
@@ -1548,12 +1544,8 @@ class ExcelViewer(QWidget):
                 progress.setValue(i)
                 progress.setLabelText(f"Processing sheet: {sheet_name}")
 
-                # Load the sheet if not already analyzed
-                if sheet_name not in excel_analyzer.sheet_data:
-                    excel_analyzer.analyze_sheet(sheet_name)
-
                 # Get the dataframe for this sheet
-                df = excel_analyzer.sheet_data[sheet_name]["dataframe"]
+                df = excel_analyzer.get_sheet(sheet_name)["dataframe"]
 
                 if df is None or df.empty:
                     skipped_sheets.append(f"{sheet_name} (empty)")
@@ -1739,12 +1731,8 @@ class ExcelViewer(QWidget):
                         continue
 
                     try:
-                        # Analyze sheet if not already analyzed
-                        if sheet_name not in excel_analyzer.sheet_data:
-                            excel_analyzer.analyze_sheet(sheet_name)
-
                         # Get dataframe for this sheet
-                        sheet_df = excel_analyzer.sheet_data[sheet_name]["dataframe"]
+                        sheet_df = excel_analyzer.get_sheet(sheet_name)["dataframe"]
 
                         # Check if the selected column exists in this sheet
                         if selected_column in sheet_df.columns:
@@ -2091,12 +2079,8 @@ class ExcelViewer(QWidget):
                 progress.setValue(i)
                 progress.setLabelText(f"Cleaning sheet: {sheet_name}")
 
-                # Load the sheet if not already analyzed
-                if sheet_name not in excel_analyzer.sheet_data:
-                    excel_analyzer.analyze_sheet(sheet_name)
-
                 # Get the dataframe for this sheet
-                df = excel_analyzer.sheet_data[sheet_name]["dataframe"]
+                df = excel_analyzer.get_sheet(sheet_name)["dataframe"]
 
                 # Check if sheet has enough rows
                 if len(df) <= max(self.report_config["header_rows"]):
@@ -2297,7 +2281,7 @@ class ExcelViewer(QWidget):
                 parent
                 and isinstance(parent, MainWindow)
                 and hasattr(parent, "excel_analyzer")
-                and self.sheet_name in parent.excel_analyzer.sheet_data
+                and parent.excel_analyzer.is_analyzed(self.sheet_name)
             ):
                 parent.excel_analyzer.sheet_data[self.sheet_name][
                     "dataframe"
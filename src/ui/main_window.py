@@ -1,5 +1,6 @@
 import sys
 import os
+import threading
 from PyQt6.QtWidgets import (
     QMainWindow,
     QTabWidget,
@@ -43,6 +44,9 @@ from src.ui.workflow_wizard import WorkflowWizard
 from src.database.db_connector import DatabaseConnector
 from src.analyzer.excel_analyzer import ExcelAnalyzer
 from src.analyzer.comparison_engine import ComparisonEngine
+from src.analyzer import chunked_compare, column_matching, compare_profile, parallel_compare
+from src.analyzer.sql_partitioner import SqlResultPartitioner, detect_sheet_column
+from src.analyzer.workbook_cache import WorkbookCache
 from src.utils.config import AppConfig
 
 import qtawesome as qta
@@ -227,6 +231,12 @@ class MainWindow(QMainWindow):
         manage_reports_action.triggered.connect(self.open_report_configs)
         tools_menu.addAction(manage_reports_action)
 
+        clear_mappings_action = QAction(
+            qta.icon("fa5s.eraser"), "Clear Saved Column Matches", self
+        )
+        clear_mappings_action.triggered.connect(self.clear_column_mappings)
+        tools_menu.addAction(clear_mappings_action)
+
         # Settings
         settings_action = QAction(qta.icon("fa5s.cog"), "Settings", self)
         settings_action.triggered.connect(self.open_settings)
@@ -479,8 +489,18 @@ class MainWindow(QMainWindow):
     def load_excel_file(self, file_path):
         """Load an Excel file into the analyzer and viewer"""
         try:
-            # Initialize Excel analyzer
-            self.excel_analyzer = ExcelAnalyzer(file_path)
+            # Stop prefetching the sheets of the previous workbook
+            if self.excel_analyzer:
+                self.excel_analyzer.close()
+
+            # Initialize Excel analyzer, reusing sheets parsed in earlier sessions
+            cache = None
+            if self.config.get("excel", "parse_cache"):
+                cache = WorkbookCache(
+                    self.config.get("excel", "parse_cache_dir") or None,
+                    self.config.get("excel", "parse_cache_mb") or 512,
+                )
+            self.excel_analyzer = ExcelAnalyzer(file_path, cache)
 
             # Load Excel file
             if not self.excel_analyzer.load_excel():
@@ -493,6 +513,12 @@ class MainWindow(QMainWindow):
             self.comparison_engine = ComparisonEngine()
             tolerance = self.config.get("excel", "numerical_comparison_tolerance")
             self.comparison_engine.set_tolerance(tolerance)
+            self.comparison_engine.set_mismatch_cap(
+                self.config.get("testing", "mismatch_retention") or 10000
+            )
+            self.comparison_engine.set_hierarchical(
+                self.config.get("testing", "hierarchical_compare")
+            )
 
             # Update sheet selector
             self.sheet_selector.clear()
@@ -525,14 +551,13 @@ class MainWindow(QMainWindow):
         sheet_name = self.sheet_selector.itemText(index)
 
         try:
-            # Analyze sheet if not already analyzed
-            if sheet_name not in self.excel_analyzer.sheet_data:
-                self.excel_analyzer.analyze_sheet(sheet_name)
-
             # Load sheet into viewer
-            df = self.excel_analyzer.sheet_data[sheet_name]["dataframe"]
+            df = self.excel_analyzer.get_sheet(sheet_name)["dataframe"]
             self.excel_viewer.load_dataframe(df, sheet_name)
 
+            # Parse the other sheets in the background, neighbours first
+            self.excel_analyzer.prefetch(sheet_name)
+
             # Update status
             self.status_bar.showMessage(f"Loaded sheet: {sheet_name}")
 
@@ -815,8 +840,21 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Empty SQL Results", "SQL results are empty.")
             return
 
+        # Reuse header mappings accepted in earlier runs of this report type
+        report_type = self.report_selector.currentText()
+        saved_mappings = self.config.get_column_mappings(report_type)
+        self.comparison_engine.set_saved_column_mappings(saved_mappings)
+        fuzzy_mappings = {}
+        # This run replaces the previous results, so the plans (and the
+        # frames they hold) of the previous run are dropped. Plans of this
+        # run's sheets are kept for the exports whichever path compares them
+        # (paths without an in-memory plan build it on the first export).
+        self.comparison_engine.clear_plans()
+        self.comparison_engine.pin_plans(sheets_to_compare)
+
         # Store comparison results
         comparison_results_by_sheet = {}
+        comparison_inputs_by_sheet = {}
         error_sheets = []
         success_sheets = []
         skipped_sheets = []
@@ -832,6 +870,35 @@ class MainWindow(QMainWindow):
         else:
             progress = None
 
+        # Sheets are compared in worker processes when more than one worker
+        # is configured; otherwise they are compared here one at a time.
+        workers = self.config.get("testing", "comparison_workers") or 1
+        parallel = workers > 1 and len(sheets_to_compare) > 1
+        # Consolidated mode compares all pending sheets in shared merges
+        consolidated = bool(
+            self.config.get("testing", "consolidated_compare")
+        ) and len(sheets_to_compare) > 1
+        memory_budget = self.config.get("testing", "memory_budget_mb") or 1024
+        pending_sheets = []
+        # Sheets whose inputs and settings are unchanged reuse their last result
+        result_cache = self.comparison_engine.result_cache
+        cache_keys = {}
+        reused_sheets = []
+
+        def record_result(sheet_name, excel_df, filtered_sql_df, sheet_result):
+            if "error" in sheet_result:
+                error_sheets.append(f"{sheet_name} ({sheet_result['error']})")
+                result_cache.discard(sheet_name)
+                return
+            if sheet_name in cache_keys:
+                result_cache.put(sheet_name, cache_keys.pop(sheet_name), sheet_result)
+            comparison_results_by_sheet[sheet_name] = sheet_result
+            comparison_inputs_by_sheet[sheet_name] = (excel_df, filtered_sql_df)
+            success_sheets.append(sheet_name)
+            fuzzy_mappings.update(
+                column_matching.mappings_to_saved(sheet_result.get("column_mappings"))
+            )
+
         try:
             # Compare each sheet
             for i, sheet_name in enumerate(sheets_to_compare):
@@ -844,12 +911,8 @@ class MainWindow(QMainWindow):
 
                 # Get Excel dataframe for this sheet
                 try:
-                    # Analyze sheet if not already analyzed
-                    if sheet_name not in self.excel_analyzer.sheet_data:
-                        self.excel_analyzer.analyze_sheet(sheet_name)
-
                     # Get dataframe
-                    excel_df = self.excel_analyzer.sheet_data[sheet_name]["dataframe"]
+                    excel_df = self.excel_analyzer.get_sheet(sheet_name)["dataframe"]
 
                     if excel_df.empty:
                         skipped_sheets.append(f"{sheet_name} (empty)")
@@ -864,52 +927,69 @@ class MainWindow(QMainWindow):
                         continue
 
                     # --- FILTER SQL DATAFRAME FOR THIS SHEET ---
-                    # Try to find key columns (Center, CAReportName, etc.)
-                    key_pairs = []
-                    for col in ["Center", "CAReportName", "Account"]:
-                        if col in excel_df.columns and col in sql_df.columns:
-                            key_pairs.append((col, col))
-
-                    excel_sheet_col = self._detect_sheet_column(excel_df)
-                    sql_sheet_col = self._detect_sheet_column(sql_df)
-                    if excel_sheet_col and sql_sheet_col:
-                        key_pairs.append((excel_sheet_col, sql_sheet_col))
-
-                    filtered_sql_df = sql_df.copy()
-                    if key_pairs:
-                        # Only keep SQL rows that match the unique values for this sheet's key columns
-                        for excel_col, sql_col in key_pairs:
-                            excel_vals = (
-                                excel_df[excel_col]
-                                .dropna()
-                                .astype(str)
-                                .str.strip()
-                                .str.lower()
-                                .unique()
-                            )
-                            filtered_sql_df = filtered_sql_df[
-                                filtered_sql_df[sql_col]
-                                .astype(str)
-                                .str.strip()
-                                .str.lower()
-                                .isin(excel_vals)
-                            ]
-                    # If no key columns, fallback to all rows (legacy behavior)
+                    filtered_sql_df = self._filter_sql_for_sheet(excel_df, sql_df)
 
                     # AR Center comparisons now rely on an explicit ``Sheet``
                     # column rather than prefixing ``CAReportName`` values.
-                    report_type = self.report_selector.currentText()
 
-                    # Perform comparison
-                    sheet_result = self.comparison_engine.compare_dataframes(
-                        excel_df, filtered_sql_df
+                    # Sheets that would not fit in the configured memory
+                    # budget are compared here through on-disk buckets
+                    chunked = chunked_compare.exceeds_budget(
+                        excel_df, filtered_sql_df, memory_budget
                     )
+                    # Strip headers once so the compared frames, exports and
+                    # the engine's cached plan all use the same column names.
+                    # Shallow copies keep the analyzed sheet and the SQL
+                    # results frame unchanged.
+                    excel_df = excel_df.copy(deep=False)
+                    excel_df.columns = [str(col).strip() for col in excel_df.columns]
+                    filtered_sql_df = filtered_sql_df.copy(deep=False)
+                    filtered_sql_df.columns = [
+                        str(col).strip() for col in filtered_sql_df.columns
+                    ]
 
-                    if "error" in sheet_result:
-                        error_sheets.append(f"{sheet_name} ({sheet_result['error']})")
+                    if chunked:
+                        mode = "chunked"
+                    elif consolidated:
+                        mode = "consolidated"
+                    elif self.comparison_engine.hierarchical:
+                        mode = "hierarchical"
                     else:
-                        comparison_results_by_sheet[sheet_name] = sheet_result
-                        success_sheets.append(sheet_name)
+                        mode = "full"
+                    cache_key = self.comparison_engine.result_cache_key(
+                        excel_df, filtered_sql_df, mode=mode
+                    )
+                    cached_result = result_cache.get(sheet_name, cache_key)
+                    if cached_result is not None:
+                        self.logger.info(f"Sheet {sheet_name} is unchanged, reusing its last comparison")
+                        reused_sheets.append(sheet_name)
+                        record_result(sheet_name, excel_df, filtered_sql_df, cached_result)
+                        continue
+                    cache_keys[sheet_name] = cache_key
+
+                    if chunked:
+                        self.logger.info(
+                            f"Sheet {sheet_name} exceeds the {memory_budget} MB budget, comparing in chunks"
+                        )
+                        sheet_result = self.comparison_engine.compare_chunked(
+                            excel_df,
+                            filtered_sql_df,
+                            sheet_name=sheet_name,
+                            memory_budget_mb=memory_budget,
+                        )
+                    elif consolidated or parallel:
+                        pending_sheets.append((sheet_name, excel_df, filtered_sql_df))
+                        continue
+                    elif self.comparison_engine.hierarchical:
+                        sheet_result = self.comparison_engine.compare_hierarchical(
+                            excel_df, filtered_sql_df, sheet_name=sheet_name
+                        )
+                    else:
+                        # Perform comparison
+                        sheet_result = self.comparison_engine.compare_dataframes(
+                            excel_df, filtered_sql_df, sheet_name=sheet_name
+                        )
+                    record_result(sheet_name, excel_df, filtered_sql_df, sheet_result)
 
                 except Exception as e:
                     self.logger.error(
@@ -917,10 +997,52 @@ class MainWindow(QMainWindow):
                     )
                     error_sheets.append(f"{sheet_name} ({str(e)})")
 
+            if pending_sheets and not (progress and progress.wasCanceled()):
+                if consolidated:
+                    if progress:
+                        progress.setLabelText(
+                            f"Comparing {len(pending_sheets)} sheets together..."
+                        )
+                    parallel_results = self.comparison_engine.compare_consolidated(
+                        pending_sheets
+                    )
+                else:
+                    parallel_results = self._compare_sheets_in_parallel(
+                        pending_sheets, workers, progress
+                    )
+                for sheet_name, excel_df, filtered_sql_df in pending_sheets:
+                    if sheet_name in parallel_results:
+                        record_result(
+                            sheet_name,
+                            excel_df,
+                            filtered_sql_df,
+                            parallel_results[sheet_name],
+                        )
+
             # Close progress dialog if needed
             if progress:
                 progress.setValue(len(sheets_to_compare))
 
+            # Fuzzy header matches are only reused once the user accepts them
+            new_mappings = {
+                header: entry
+                for header, entry in fuzzy_mappings.items()
+                if saved_mappings.get(header, {}).get("sql_column") != entry["sql_column"]
+            }
+            if new_mappings:
+                self._confirm_column_mappings(report_type, new_mappings)
+
+            # Stage timings of the sheets compared in this run; reused
+            # results keep the timings of the run that produced them
+            profile = compare_profile.merge_profiles(
+                result.get("profile")
+                for sheet_name, result in comparison_results_by_sheet.items()
+                if sheet_name not in reused_sheets
+            )
+            profile["counters"]["sheets"] = len(success_sheets) - len(reused_sheets)
+            profile["counters"]["sheets_reused"] = len(reused_sheets)
+            self.comparison_profile = profile
+
             # Generate combined report
             if comparison_results_by_sheet:
                 report, discrepancy_df = self._generate_combined_comparison_report(
@@ -928,11 +1050,13 @@ class MainWindow(QMainWindow):
                     success_sheets,
                     error_sheets,
                     skipped_sheets,
+                    profile=profile,
                 )
 
                 # Load report into comparison view
                 self.comparison_view.set_report(report)
                 self.comparison_view.set_discrepancies(discrepancy_df)
+                self.comparison_view.set_profile(profile)
                 self.account_discrepancy_df = discrepancy_df
 
                 # Switch to comparison tab
@@ -941,7 +1065,8 @@ class MainWindow(QMainWindow):
                 # Update status
                 self.status_bar.showMessage(
                     f"Comparison complete. Compared {len(success_sheets)} sheets "
-                    f"({len(error_sheets)} errors, {len(skipped_sheets)} skipped)."
+                    f"({len(reused_sheets)} unchanged, {len(error_sheets)} errors, "
+                    f"{len(skipped_sheets)} skipped)."
                 )
             else:
                 QMessageBox.warning(
@@ -965,8 +1090,154 @@ class MainWindow(QMainWindow):
             if progress:
                 progress.close()
 
-        # Store comparison results for export
+        # Store comparison results for export. The exact frames compared for
+        # each sheet are kept so exports reuse the engine's cached plans.
         self.comparison_results_by_sheet = comparison_results_by_sheet
+        self.comparison_inputs_by_sheet = comparison_inputs_by_sheet
+
+    def _confirm_column_mappings(self, report_type, mappings):
+        """Ask whether fuzzy header matches should be reused for ``report_type``."""
+        lines = [
+            f"{header} \u2192 {entry['sql_column']} ({entry['match_score']:.0%})"
+            for header, entry in sorted(mappings.items())
+        ]
+        shown = lines[:20]
+        if len(lines) > len(shown):
+            shown.append(f"... and {len(lines) - len(shown)} more")
+        answer = QMessageBox.question(
+            self,
+            "Save Column Matches",
+            "These Excel headers were matched to SQL columns by similarity:\n\n"
+            + "\n".join(shown)
+            + f"\n\nUse these matches in future comparisons of {report_type or 'this report'}?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No,
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.config.set_column_mappings(report_type, mappings)
+
+    def clear_column_mappings(self):
+        """Forget the header matches saved for the selected report type."""
+        report_type = self.report_selector.currentText()
+        if not self.config.get_column_mappings(report_type):
+            QMessageBox.information(
+                self,
+                "Clear Column Matches",
+                f"No column matches are saved for {report_type or 'this report'}.",
+            )
+            return
+        answer = QMessageBox.question(
+            self,
+            "Clear Column Matches",
+            f"Forget the column matches saved for {report_type or 'this report'}?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.config.clear_column_mappings(report_type)
+            self.status_bar.showMessage(f"Cleared saved column matches for {report_type}")
+
+    def _compare_sheets_in_parallel(self, pending_sheets, workers, progress=None):
+        """Compare ``(sheet_name, excel_df, sql_df)`` tuples in worker processes.
+
+        The pool is driven from a background thread while this keeps the
+        event loop running, so the window and the progress dialog stay
+        responsive until every sheet is finished.
+        """
+        settings = parallel_compare.engine_settings(self.comparison_engine)
+        if progress:
+            progress.setRange(0, len(pending_sheets))
+            progress.setValue(0)
+            progress.setLabelText(
+                f"Comparing {len(pending_sheets)} sheets with {workers} workers..."
+            )
+
+        # Written by the pool thread, read here; Qt widgets are only
+        # touched from this thread
+        state = {"done": 0, "sheet": None, "cancelled": False}
+        outcome = {}
+
+        def on_progress(done, sheet_name):
+            state["sheet"] = sheet_name
+            state["done"] = done
+            return not state["cancelled"]
+
+        def run():
+            try:
+                outcome["results"] = parallel_compare.compare_sheets(
+                    pending_sheets,
+                    settings,
+                    max_workers=workers,
+                    progress_callback=on_progress,
+                )
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=run, name="compare-sheets", daemon=True)
+        thread.start()
+        shown = 0
+        while thread.is_alive():
+            QApplication.processEvents()
+            thread.join(0.05)
+            if not progress:
+                continue
+            if progress.wasCanceled():
+                state["cancelled"] = True
+            if state["done"] != shown:
+                shown = state["done"]
+                progress.setValue(shown)
+                progress.setLabelText(f"Compared sheet: {state['sheet']}")
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("results", {})
+
+    def _filter_sql_for_sheet(self, excel_df, sql_df):
+        """Return the SQL rows whose key values appear in ``excel_df``."""
+        # The SQL key columns are normalized and grouped once per result set
+        partitioner = getattr(self, "_sql_partitioner", None)
+        if partitioner is None or partitioner.sql_df is not sql_df:
+            partitioner = SqlResultPartitioner(sql_df)
+            self._sql_partitioner = partitioner
+        return partitioner.subset(excel_df)
+
+    def _comparison_inputs(self, sheet_name):
+        """Return the (Excel, SQL) frames last compared for ``sheet_name``.
+
+        Passing the same frame objects back to the engine lets exports reuse
+        the cached comparison plan instead of merging the sheet again.
+        """
+        inputs = getattr(self, "comparison_inputs_by_sheet", {}).get(sheet_name)
+        if inputs is not None:
+            return inputs
+        excel_df = self.excel_analyzer.get_sheet(sheet_name)["dataframe"]
+        return excel_df, self._filter_sql_for_sheet(
+            excel_df, self.results_viewer.get_dataframe()
+        )
+
+    def _detailed_dataframe(self, sheet_name, result, report_type):
+        """Return the detailed export frame of one compared sheet.
+
+        Sheets compared in chunks are exported bucket by bucket within the
+        memory budget they were compared with.
+        """
+        excel_df, filtered_sql_df = self._comparison_inputs(sheet_name)
+        chunked = result.get("chunked")
+        if chunked:
+            return self.comparison_engine.generate_chunked_detailed_dataframe(
+                sheet_name,
+                excel_df,
+                filtered_sql_df,
+                column_mappings=result.get("column_mappings"),
+                report_type=report_type,
+                memory_budget_mb=chunked.get("memory_budget_mb"),
+            )
+        return self.comparison_engine.generate_detailed_comparison_dataframe(
+            sheet_name,
+            excel_df,
+            filtered_sql_df,
+            column_mappings=result.get("column_mappings"),
+            report_type=report_type,
+        )
 
     def _select_sheets_for_comparison(self, available_sheets):
         """Show a dialog to select sheets for comparison"""
@@ -1049,9 +1320,13 @@ class MainWindow(QMainWindow):
         return []
 
     def _generate_combined_comparison_report(
-        self, comparison_results_by_sheet, success_sheets, error_sheets, skipped_sheets
+        self, comparison_results_by_sheet, success_sheets, error_sheets, skipped_sheets, profile=None
     ):
-        """Generate a comprehensive executive-friendly report from multiple sheet comparisons"""
+        """Generate a comprehensive executive-friendly report from multiple sheet comparisons
+
+        ``profile`` adds a Performance section with the stage timings and
+        counters of the run.
+        """
         # Calculate overall statistics
         total_cells = 0
         total_mismatches = 0
@@ -1077,12 +1352,17 @@ class MainWindow(QMainWindow):
                 df["Explanation"] = explanations
                 tmp = df[
                     [
-                        "Center",
-                        "Account",
-                        "Variance",
-                        "Missing in Excel",
-                        "Missing in SQL",
-                        "Explanation",
+                        col
+                        for col in [
+                            "Center",
+                            "Account",
+                            "Column",
+                            "Variance",
+                            "Missing in Excel",
+                            "Missing in SQL",
+                            "Explanation",
+                        ]
+                        if col in df.columns
                     ]
                 ].copy()
                 tmp.insert(0, "Sheet", sheet_name)
@@ -1165,14 +1445,14 @@ class MainWindow(QMainWindow):
         if not discrepancy_df.empty:
             report.append("\n## Account Discrepancies")
             report.append(
-                "\n| Sheet | Center | Account | Variance | Missing in Excel | Missing in SQL | Explanation |"
+                "\n| Sheet | Center | Account | Column | Variance | Missing in Excel | Missing in SQL | Explanation |"
             )
             report.append(
-                "| ----- | ------ | ------- | -------- | --------------- | -------------- | ----------- |"
+                "| ----- | ------ | ------- | ------ | -------- | --------------- | -------------- | ----------- |"
             )
             for _, row in discrepancy_df.iterrows():
                 report.append(
-                    f"| {row['Sheet']} | {row['Center']} | {row['Account']} | {row['Variance']:.2f} | {row['Missing in Excel']} | {row['Missing in SQL']} | {row['Explanation']} |"
+                    f"| {row['Sheet']} | {row['Center']} | {row['Account']} | {row.get('Column', '')} | {row['Variance']:.2f} | {row['Missing in Excel']} | {row['Missing in SQL']} | {row['Explanation']} |"
                 )
         else:
             discrepancy_df = pd.DataFrame(
@@ -1180,6 +1460,7 @@ class MainWindow(QMainWindow):
                     "Sheet",
                     "Center",
                     "Account",
+                    "Column",
                     "Variance",
                     "Missing in Excel",
                     "Missing in SQL",
@@ -1200,8 +1481,8 @@ class MainWindow(QMainWindow):
             excel_rows = results["row_counts"]["excel"]
             sql_rows = results["row_counts"]["sql"]
             matched_rows = results["row_counts"]["matched"]
-            excel_only = excel_rows - matched_rows
-            sql_only = sql_rows - matched_rows
+            excel_only = results["row_counts"].get("excel_only", excel_rows - matched_rows)
+            sql_only = results["row_counts"].get("sql_only", sql_rows - matched_rows)
 
             report.append("\n#### Data Coverage")
             report.append(f"- Excel records: {excel_rows}")
@@ -1214,6 +1495,21 @@ class MainWindow(QMainWindow):
                 if sql_only > 0:
                     report.append(f"- SQL-only records: {sql_only}")
 
+            # Records found on one side only, from the merge indicator
+            missing_rows = results.get("missing_rows")
+            if isinstance(missing_rows, pd.DataFrame) and not missing_rows.empty:
+                key_cols = [c for c in missing_rows.columns if c != "Result"]
+                report.append("\n#### Missing Records")
+                report.append("\n| " + " | ".join(key_cols) + " | Result |")
+                report.append("| " + " | ".join("---" for _ in key_cols) + " | ------ |")
+                for row in missing_rows.head(10).itertuples(index=False):
+                    cells = [str(v).replace("|", "\\|") for v in row]
+                    report.append("| " + " | ".join(cells) + " |")
+                if len(missing_rows) > 10:
+                    report.append(
+                        f"\n*...and {len(missing_rows) - 10} more missing records in this sheet.*"
+                    )
+
             # Suggested sign flip accounts for this sheet
             suggested = results.get("suggested_sign_flips")
             if suggested:
@@ -1264,36 +1560,27 @@ class MainWindow(QMainWindow):
                         f"\n*...and {len(column_stats) - 5} more columns with mismatches.*"
                     )
 
-            # Sample mismatches from this sheet
-            all_mismatches = []
-            for excel_col, col_results in results.get("column_comparisons", {}).items():
-                for mismatch in col_results.get("mismatch_rows", []):
-                    mismatch_with_col = mismatch.copy()
-                    mismatch_with_col["column"] = excel_col
-                    all_mismatches.append(mismatch_with_col)
-
-            if all_mismatches:
-                report.append("\n#### Sample Mismatches")
+            # Largest mismatches from this sheet
+            mismatches = results.get("mismatches")
+            if mismatches is not None and mismatches.total:
+                report.append("\n#### Largest Mismatches")
                 report.append(
                     "\n| Row | Column | Excel Value | SQL Value | Difference |"
                 )
                 report.append("| --- | ------ | ----------- | --------- | ---------- |")
 
-                # Sort by row for consistent display
-                all_mismatches.sort(key=lambda x: x["row"])
-
-                # Show up to 10 mismatches per sheet
-                for mismatch in all_mismatches[:10]:
-                    excel_val = str(mismatch["excel_value"]).replace("|", "\\|")
-                    sql_val = str(mismatch["sql_value"]).replace("|", "\\|")
-                    diff = str(mismatch["difference"]).replace("|", "\\|")
+                # Show the 10 mismatches with the largest absolute variance
+                for mismatch in mismatches.top(10).itertuples(index=False):
+                    excel_val = str(mismatch.excel_value).replace("|", "\\|")
+                    sql_val = str(mismatch.sql_value).replace("|", "\\|")
+                    diff = str(mismatch.difference).replace("|", "\\|")
                     report.append(
-                        f"| {mismatch['row']} | {mismatch['column']} | {excel_val} | {sql_val} | {diff} |"
+                        f"| {mismatch.row} | {mismatch.column} | {excel_val} | {sql_val} | {diff} |"
                     )
 
-                if len(all_mismatches) > 10:
+                if mismatches.total > 10:
                     report.append(
-                        f"\n*...and {len(all_mismatches) - 10} more mismatches in this sheet.*"
+                        f"\n*...and {mismatches.total - 10} more mismatches in this sheet.*"
                     )
 
             # Add discrepancy explanations for this sheet
@@ -1316,6 +1603,8 @@ class MainWindow(QMainWindow):
             for sheet in match_sheets:
                 report.append(f"| {sheet} | ✅ Perfect Match |")
 
+        report.extend(compare_profile.format_profile(profile))
+
         return "\n".join(report), discrepancy_df
 
     def export_report(self):
@@ -1402,6 +1691,12 @@ class MainWindow(QMainWindow):
             if self.comparison_engine:
                 tolerance = self.config.get("excel", "numerical_comparison_tolerance")
                 self.comparison_engine.set_tolerance(tolerance)
+                self.comparison_engine.set_mismatch_cap(
+                    self.config.get("testing", "mismatch_retention") or 10000
+                )
+                self.comparison_engine.set_hierarchical(
+                    self.config.get("testing", "hierarchical_compare")
+                )
 
             # Apply updated theme
             self.apply_theme()
@@ -1459,10 +1754,7 @@ class MainWindow(QMainWindow):
         accounts = set()
         try:
             for sheet in self.excel_analyzer.sheet_names:
-                if sheet not in self.excel_analyzer.sheet_data:
-                    self.excel_analyzer.analyze_sheet(sheet)
-
-                sheet_info = self.excel_analyzer.sheet_data[sheet]
+                sheet_info = self.excel_analyzer.get_sheet(sheet)
                 df = sheet_info["dataframe"]
 
                 # If the dataframe has numeric column names, rebuild headers
@@ -1566,13 +1858,7 @@ class MainWindow(QMainWindow):
 
     def _detect_sheet_column(self, df):
         """Return the column in *df* that appears to contain sheet names."""
-        norm_map = {
-            re.sub(r"[\s_]+", "", str(col)).lower(): col for col in df.columns
-        }
-        for cand in ["sheetname", "sheet"]:
-            if cand in norm_map:
-                return norm_map[cand]
-        return None
+        return detect_sheet_column(df.columns)
 
     def _gather_sheet_names_from_sql(self):
         """Return sheet names present in the SQL results if available."""
@@ -1729,6 +2015,8 @@ class MainWindow(QMainWindow):
                 return
 
             # Reset Excel analyzer and viewer
+            if self.excel_analyzer:
+                self.excel_analyzer.close()
             self.excel_analyzer = None
             self.excel_viewer.reset()
             self.excel_status_label.setText("Excel: No file loaded")
@@ -1750,6 +2038,9 @@ class MainWindow(QMainWindow):
 
             # Reset comparison engine
             self.comparison_engine = None
+            self.comparison_results_by_sheet = {}
+            self.comparison_inputs_by_sheet = {}
+            self._sql_partitioner = None
 
             # Switch to first tab
             self.tab_widget.setCurrentIndex(0)
@@ -1784,44 +2075,9 @@ class MainWindow(QMainWindow):
         # Combine detailed results from all sheets
         all_dfs = []
         for sheet_name, result in self.comparison_results_by_sheet.items():
-            # Get the original dataframes
-            excel_df = self.excel_analyzer.sheet_data[sheet_name]["dataframe"]
-            # For SQL, filter as in compare_results
-            sql_df = self.results_viewer.get_dataframe()
-            key_pairs = []
-            for col in ["Center", "CAReportName", "Account"]:
-                if col in excel_df.columns and col in sql_df.columns:
-                    key_pairs.append((col, col))
-            excel_sheet_col = self._detect_sheet_column(excel_df)
-            sql_sheet_col = self._detect_sheet_column(sql_df)
-            if excel_sheet_col and sql_sheet_col:
-                key_pairs.append((excel_sheet_col, sql_sheet_col))
-            filtered_sql_df = sql_df.copy()
-            if key_pairs:
-                for ex_col, sql_col in key_pairs:
-                    excel_vals = excel_df[ex_col].dropna().unique()
-                    filtered_sql_df = filtered_sql_df[
-                        filtered_sql_df[sql_col].isin(excel_vals)
-                    ]
-
-            # Generate detailed DataFrame
             report_type = self.config.get("excel", "report_type")
-            column_mappings = None
-            if (
-                hasattr(self, "comparison_results_by_sheet")
-                and sheet_name in self.comparison_results_by_sheet
-            ):
-                column_mappings = self.comparison_results_by_sheet[sheet_name].get(
-                    "column_mappings"
-                )
             try:
-                df = self.comparison_engine.generate_detailed_comparison_dataframe(
-                    sheet_name,
-                    excel_df,
-                    filtered_sql_df,
-                    column_mappings=result.get("column_mappings"),
-                    report_type=report_type,
-                )
+                df = self._detailed_dataframe(sheet_name, result, report_type)
             except ValueError as e:
                 QMessageBox.critical(
                     self,
@@ -1908,33 +2164,9 @@ class MainWindow(QMainWindow):
 
         all_dfs = []
         for sheet_name, result in self.comparison_results_by_sheet.items():
-            excel_df = self.excel_analyzer.sheet_data[sheet_name]["dataframe"]
-            sql_df = self.results_viewer.get_dataframe()
-            key_pairs = []
-            for col in ["Center", "CAReportName", "Account"]:
-                if col in excel_df.columns and col in sql_df.columns:
-                    key_pairs.append((col, col))
-            excel_sheet_col = self._detect_sheet_column(excel_df)
-            sql_sheet_col = self._detect_sheet_column(sql_df)
-            if excel_sheet_col and sql_sheet_col:
-                key_pairs.append((excel_sheet_col, sql_sheet_col))
-            filtered_sql_df = sql_df.copy()
-            if key_pairs:
-                for ex_col, sql_col in key_pairs:
-                    excel_vals = excel_df[ex_col].dropna().unique()
-                    filtered_sql_df = filtered_sql_df[
-                        filtered_sql_df[sql_col].isin(excel_vals)
-                    ]
-
             report_type = self.config.get("excel", "report_type")
             try:
-                df = self.comparison_engine.generate_detailed_comparison_dataframe(
-                    sheet_name,
-                    excel_df,
-                    filtered_sql_df,
-                    column_mappings=result.get("column_mappings"),
-                    report_type=report_type,
-                )
+                df = self._detailed_dataframe(sheet_name, result, report_type)
             except ValueError as e:
                 QMessageBox.critical(
                     self,
@@ -2007,32 +2239,9 @@ class MainWindow(QMainWindow):
 
         all_dfs = []
         for sheet_name, result in self.comparison_results_by_sheet.items():
-            excel_df = self.excel_analyzer.sheet_data[sheet_name]["dataframe"]
-            sql_df = self.results_viewer.get_dataframe()
-            key_pairs = []
-            for col in ["Center", "CAReportName", "Account"]:
-                if col in excel_df.columns and col in sql_df.columns:
-                    key_pairs.append((col, col))
-            excel_sheet_col = self._detect_sheet_column(excel_df)
-            sql_sheet_col = self._detect_sheet_column(sql_df)
-            if excel_sheet_col and sql_sheet_col:
-                key_pairs.append((excel_sheet_col, sql_sheet_col))
-            filtered_sql_df = sql_df.copy()
-            if key_pairs:
-                for ex_col, sql_col in key_pairs:
-                    excel_vals = excel_df[ex_col].dropna().unique()
-                    filtered_sql_df = filtered_sql_df[
-                        filtered_sql_df[sql_col].isin(excel_vals)
-                    ]
             report_type = self.config.get("excel", "report_type")
             try:
-                df = self.comparison_engine.generate_detailed_comparison_dataframe(
-                    sheet_name,
-                    excel_df,
-                    filtered_sql_df,
-                    column_mappings=result.get("column_mappings"),
-                    report_type=report_type,
-                )
+                df = self._detailed_dataframe(sheet_name, result, report_type)
             except ValueError as e:
                 QMessageBox.critical(
                     self,
@@ -117,6 +117,16 @@ class SettingsDialog(QDialog):
         # Skip empty columns
         self.skip_empty_cols = QCheckBox("Skip empty columns")
         layout.addRow("", self.skip_empty_cols)
+
+        # Parsed workbook cache
+        self.parse_cache = QCheckBox("Cache parsed workbooks on disk")
+        layout.addRow("", self.parse_cache)
+
+        self.parse_cache_mb = QSpinBox()
+        self.parse_cache_mb.setRange(16, 65536)
+        self.parse_cache_mb.setSuffix(" MB")
+        layout.addRow("Workbook cache size:", self.parse_cache_mb)
+        layout.addRow("", QLabel("Unchanged workbooks are reopened without parsing them again"))
         
         self.tab_widget.addTab(excel_tab, "Excel")
         
@@ -162,6 +172,35 @@ class SettingsDialog(QDialog):
         self.comparison_threshold.setSuffix("%")
         layout.addRow("Comparison threshold:", self.comparison_threshold)
         layout.addRow("", QLabel("Maximum percentage difference allowed for a test to pass"))
+
+        # Parallel sheet comparison
+        self.comparison_workers = QSpinBox()
+        self.comparison_workers.setRange(1, max(1, os.cpu_count() or 1))
+        layout.addRow("Comparison worker processes:", self.comparison_workers)
+        layout.addRow("", QLabel("Use more than one worker to compare several sheets in parallel"))
+
+        # Memory budget for chunked comparison
+        self.memory_budget = QSpinBox()
+        self.memory_budget.setRange(64, 65536)
+        self.memory_budget.setSingleStep(256)
+        self.memory_budget.setSuffix(" MB")
+        layout.addRow("Comparison memory budget:", self.memory_budget)
+        layout.addRow("", QLabel("Sheets needing more memory are compared in chunks on disk"))
+
+        # Mismatch retention
+        self.mismatch_retention = QSpinBox()
+        self.mismatch_retention.setRange(10, 10_000_000)
+        self.mismatch_retention.setSingleStep(1000)
+        layout.addRow("Mismatches kept per sheet:", self.mismatch_retention)
+        layout.addRow("", QLabel("Only the largest mismatches are kept when a sheet has more"))
+
+        # Hierarchical comparison
+        self.hierarchical_compare = QCheckBox("Compare totals first and drill into mismatched groups")
+        layout.addRow("", self.hierarchical_compare)
+
+        # Consolidated comparison
+        self.consolidated_compare = QCheckBox("Compare sheets with the same layout in one pass")
+        layout.addRow("", self.consolidated_compare)
         
         self.tab_widget.addTab(testing_tab, "Testing")
         
@@ -177,6 +216,8 @@ class SettingsDialog(QDialog):
         self.num_tolerance.setValue(self.config.get("excel", "numerical_comparison_tolerance"))
         self.skip_empty_rows.setChecked(self.config.get("excel", "skip_empty_rows"))
         self.skip_empty_cols.setChecked(self.config.get("excel", "skip_empty_columns"))
+        self.parse_cache.setChecked(bool(self.config.get("excel", "parse_cache")))
+        self.parse_cache_mb.setValue(self.config.get("excel", "parse_cache_mb") or 512)
         
         # UI settings
         theme_map = {"light": 0, "dark": 1, "system": 2, "brand": 3}
@@ -192,6 +233,11 @@ class SettingsDialog(QDialog):
         # Testing settings
         self.auto_generate.setChecked(self.config.get("testing", "auto_generate_queries"))
         self.comparison_threshold.setValue(self.config.get("testing", "comparison_threshold") * 100)  # Convert to percentage
+        self.comparison_workers.setValue(self.config.get("testing", "comparison_workers") or 1)
+        self.memory_budget.setValue(self.config.get("testing", "memory_budget_mb") or 1024)
+        self.mismatch_retention.setValue(self.config.get("testing", "mismatch_retention") or 10000)
+        self.hierarchical_compare.setChecked(bool(self.config.get("testing", "hierarchical_compare")))
+        self.consolidated_compare.setChecked(bool(self.config.get("testing", "consolidated_compare")))
 
     def _on_theme_changed(self, index):
         """Apply theme immediately when the user selects a new option"""
@@ -212,6 +258,8 @@ class SettingsDialog(QDialog):
         self.config.set("excel", "numerical_comparison_tolerance", self.num_tolerance.value())
         self.config.set("excel", "skip_empty_rows", self.skip_empty_rows.isChecked())
         self.config.set("excel", "skip_empty_columns", self.skip_empty_cols.isChecked())
+        self.config.set("excel", "parse_cache", self.parse_cache.isChecked())
+        self.config.set("excel", "parse_cache_mb", self.parse_cache_mb.value())
         
         # UI settings
         theme_options = ["light", "dark", "system", "brand"]
@@ -224,6 +272,11 @@ class SettingsDialog(QDialog):
         # Testing settings
         self.config.set("testing", "auto_generate_queries", self.auto_generate.isChecked())
         self.config.set("testing", "comparison_threshold", self.comparison_threshold.value() / 100.0)  # Convert from percentage
+        self.config.set("testing", "comparison_workers", self.comparison_workers.value())
+        self.config.set("testing", "memory_budget_mb", self.memory_budget.value())
+        self.config.set("testing", "mismatch_retention", self.mismatch_retention.value())
+        self.config.set("testing", "hierarchical_compare", self.hierarchical_compare.isChecked())
+        self.config.set("testing", "consolidated_compare", self.consolidated_compare.isChecked())
         
         # Save configuration to file
         self.config.save_config()
@@ -66,14 +66,23 @@ class AppConfig:
                 "numerical_comparison_tolerance": 0.001,
                 "skip_empty_rows": True,
                 "skip_empty_columns": True,
+                "parse_cache": True,  # Keep parsed sheets on disk for reopening
+                "parse_cache_dir": "",  # Empty for ~/.soo_preclose_tester_cache
+                "parse_cache_mb": 512,  # Least recently used workbooks are evicted beyond this
             },
             "paths": {"last_excel_file": "", "last_sql_file": "", "recent_files": []},
             "logging": {"level": "INFO", "file": "app.log"},
             "testing": {
                 "auto_generate_queries": True,
                 "comparison_threshold": 1.0,  # 1% difference allowed
+                "comparison_workers": 1,  # Sheets compared in parallel
+                "memory_budget_mb": 1024,  # Larger sheets are compared in on-disk chunks
+                "mismatch_retention": 10000,  # Mismatching cells kept per sheet
+                "hierarchical_compare": False,  # Only compare cells of groups whose totals differ
+                "consolidated_compare": False,  # Compare sheets with the same layout in one merge
             },
             "account_categories": {},
+            "column_mappings": {},
             "report_configs": self.initialize_report_configs(),
         }
 
@@ -288,6 +297,31 @@ class AppConfig:
         ] = categories
         self.save_config()
 
+    def get_column_mappings(self, report_type):
+        """Return saved Excel-to-SQL header mappings for ``report_type``."""
+        saved = self.config.get("column_mappings", {}).get(report_type, {})
+        # Older versions also recorded headers without a match
+        return {
+            header: entry
+            for header, entry in saved.items()
+            if isinstance(entry, dict) and entry.get("sql_column") is not None
+        }
+
+    def set_column_mappings(self, report_type, mappings):
+        """Merge accepted header mappings for ``report_type`` and persist them."""
+        if "column_mappings" not in self.config:
+            self.config["column_mappings"] = {}
+        saved = self.config["column_mappings"].setdefault(report_type, {})
+        if all(saved.get(k) == v for k, v in mappings.items()):
+            return
+        saved.update(mappings)
+        self.save_config()
+
+    def clear_column_mappings(self, report_type):
+        """Forget the saved header mappings of ``report_type``."""
+        if self.config.get("column_mappings", {}).pop(report_type, None) is not None:
+            self.save_config()
+
     # Report configuration helpers -------------------------------------------------
 
     def initialize_report_configs(self):
@@ -0,0 +1,28 @@
+"""Synthetic Center/Account frames shared by the comparison tests."""
+
+import numpy as np
+import pandas as pd
+
+
+def account_frame(rows, seed=0, centers=7, account_column='Account', value_columns=('Amount',), owners=None):
+    """Return an Excel-like frame of ``rows`` rows spread over ``centers`` centers.
+
+    Every (Center, account) pair is unique. Value columns hold whole amounts
+    drawn from ``default_rng(seed)``; ``owners`` adds an ``Owner`` text
+    column cycling through that many owners.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Center': [f'C{i % centers}' for i in range(rows)],
+        account_column: [f'{1000 + i // centers}-0000' for i in range(rows)],
+    })
+    for column in value_columns:
+        df[column] = rng.integers(0, 1000, rows).astype(float)
+    if owners:
+        df['Owner'] = [f'Owner {i % owners}' for i in range(rows)]
+    return df
+
+
+def add_rows(df, rows):
+    """Return ``df`` with ``rows`` (dicts of column values) appended."""
+    return pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
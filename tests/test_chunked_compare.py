@@ -0,0 +1,94 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analyzer import chunked_compare
+from src.analyzer.comparison_engine import ComparisonEngine
+from tests.compare_frames import account_frame, add_rows
+
+
+def _make_frames(rows=400):
+    excel_df = account_frame(rows)
+    sql_df = excel_df.copy()
+    sql_df.loc[::25, 'Amount'] += 10
+    # Rows present on one side only
+    sql_df = add_rows(
+        sql_df.drop(index=[3, 4]),
+        [{'Center': 'C9', 'Account': '9999-0000', 'Amount': 5.0}],
+    )
+    return excel_df, sql_df
+
+
+class TestChunkedCompare(unittest.TestCase):
+    def setUp(self):
+        self.engine = ComparisonEngine()
+        self.excel_df, self.sql_df = _make_frames()
+
+    def test_bucketed_results_match_in_memory_comparison(self):
+        expected = self.engine.compare_sheet(self.excel_df, self.sql_df)
+        comparison = chunked_compare.ChunkedComparison(self.engine, chunk_rows=64, n_buckets=8)
+        results = comparison.compare(self.excel_df, self.sql_df)
+
+        self.assertEqual(results['chunked']['buckets'], 8)
+        self.assertEqual(results['row_counts'], expected['row_counts'])
+        self.assertEqual(results['summary'], expected['summary'])
+        for column, stats in expected['column_comparisons'].items():
+            merged = results['column_comparisons'][column]
+            self.assertEqual(merged['mismatch_count'], stats['mismatch_count'])
+            self.assertEqual(len(merged['mismatch_rows']), len(stats['mismatch_rows']))
+        self.assertEqual(
+            len(results['account_discrepancies']), len(expected['account_discrepancies'])
+        )
+
+    def test_keys_and_severity_follow_the_whole_inputs(self):
+        # Center/Account are unique in the first chunk only; later rows
+        # repeat them for another period
+        excel_df = pd.concat([
+            self.excel_df.assign(Period='Jan'),
+            self.excel_df.iloc[100:].assign(Period='Feb'),
+        ], ignore_index=True)
+        sql_df = excel_df.copy()
+        sql_df.loc[::40, 'Amount'] *= 3
+        expected = self.engine.compare_sheet(excel_df, sql_df)
+        comparison = chunked_compare.ChunkedComparison(self.engine, chunk_rows=64, n_buckets=8)
+        results = comparison.compare(excel_df, sql_df)
+
+        self.assertEqual(results['row_counts'], expected['row_counts'])
+        self.assertEqual(results['summary'], expected['summary'])
+
+        def by_account(discrepancies):
+            return discrepancies.sort_values(['Center', 'Account', 'Column']).reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(
+            by_account(results['account_discrepancies']),
+            by_account(expected['account_discrepancies']),
+        )
+
+    def test_chunked_detailed_export(self):
+        expected = self.engine.generate_detailed_comparison_dataframe(
+            'Sheet1', self.excel_df, self.sql_df
+        )
+        comparison = chunked_compare.ChunkedComparison(self.engine, chunk_rows=64, n_buckets=8)
+        exported = comparison.detailed_dataframe(self.excel_df, self.sql_df, sheet_name='Sheet1')
+
+        def rows(df):
+            return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(rows(exported[expected.columns]), rows(expected))
+
+    def test_chunk_iterables_and_memory_budget(self):
+        chunks = (self.sql_df.iloc[i:i + 50] for i in range(0, len(self.sql_df), 50))
+        results = self.engine.compare_chunked(self.excel_df, chunks, memory_budget_mb=1)
+        self.assertEqual(results['row_counts']['sql'], len(self.sql_df))
+        self.assertGreater(results['chunked']['buckets'], 1)
+        self.assertIs(self.engine.comparison_results, results)
+
+    def test_exceeds_budget(self):
+        self.assertFalse(chunked_compare.exceeds_budget(self.excel_df, self.sql_df, 1024))
+        big = pd.DataFrame({'Amount': np.zeros(200_000)})
+        self.assertTrue(chunked_compare.exceeds_budget(big, big, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import os
 import unittest
+from unittest.mock import patch
 import pandas as pd
+from src.analyzer import row_comparison
 from src.analyzer.comparison_engine import ComparisonEngine
 
 FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -41,6 +43,25 @@ class TestComparisonEngineSignFlip(unittest.TestCase):
         discrepancies_flip = self.engine.identify_account_discrepancies(self.excel_df, self.sql_df)
         self.assertTrue(discrepancies_flip.empty)
 
+    def test_discrepancies_cover_every_numeric_column(self):
+        excel_df = pd.DataFrame({
+            'Center': [1, 1, 2],
+            'CAReportName': ['A', 'B', 'A'],
+            'Jan': [10.0, 20.0, 30.0],
+            'Feb': [1.0, 2.0, 3.0],
+        })
+        sql_df = excel_df.iloc[[0, 1]].copy()
+        sql_df.loc[1, 'Feb'] = 12.0
+        discrepancies = self.engine.identify_account_discrepancies(excel_df, sql_df)
+        self.assertEqual(
+            list(zip(discrepancies['Account'], discrepancies['Column'])),
+            [('B', 'Feb'), ('A', 'Jan'), ('A', 'Feb')],
+        )
+        self.assertAlmostEqual(discrepancies.iloc[0]['Variance'], -10.0)
+        self.assertEqual(discrepancies['Missing in SQL'].tolist(), [False, True, True])
+        messages = self.engine.explain_variances(discrepancies)
+        self.assertIn('in Feb', messages[0])
+
     def test_explain_variances(self):
         discrepancies = self.engine.identify_account_discrepancies(self.excel_df, self.sql_df)
         messages = self.engine.explain_variances(discrepancies)
@@ -106,6 +127,153 @@ class TestComparisonEngineSignFlip(unittest.TestCase):
         self.assertIn('Amount Excel', df.columns)
         self.assertIn('Quantity Database', df.columns)
 
+    def test_detailed_dataframe_classifies_all_results(self):
+        excel_df = pd.DataFrame({
+            'Center': [1, 1, 2],
+            'CAReportName': ['1234-5678', '1111-2222', '3333-4444'],
+            'Amount': [100, 5, 7],
+            'Note': ['a', 'B', 'c'],
+        })
+        sql_df = pd.DataFrame({
+            'Center': [1, 1, 3],
+            'CAReportName': ['1234-5678', '1111-2222', '5555-6666'],
+            'Amount': [-100, 6, 8],
+            'Note': ['A', 'b', 'd'],
+        })
+        self.engine.set_sign_flip_accounts(['1234-5678'])
+        df = self.engine.generate_detailed_comparison_dataframe('Sheet1', excel_df, sql_df)
+
+        amount = df[df['Field'] == 'Amount'].set_index('CAReport Name')
+        self.assertEqual(amount.loc['1234-5678', 'Result'], 'Match')
+        self.assertEqual(amount.loc['1234-5678', 'DataBase Value'], 100.0)
+        self.assertEqual(amount.loc['1111-2222', 'Result'], 'Does Not Match')
+        self.assertEqual(amount.loc['1111-2222', 'Variance'], -1.0)
+        self.assertEqual(amount.loc['3333-4444', 'Result'], 'Missing in Database')
+        self.assertEqual(amount.loc['3333-4444', 'DataBase Value'], 'NULL')
+        missing_excel = amount[amount['Result'] == 'Missing in Excel']
+        self.assertEqual(len(missing_excel), 1)
+        self.assertEqual(missing_excel['Excel Value'].iloc[0], 'NULL')
+        self.assertEqual(missing_excel['DataBase Value'].iloc[0], 8.0)
+
+        notes = df[df['Field'] == 'Note'].set_index('CAReport Name')
+        self.assertEqual(notes.loc['1234-5678', 'Result'], 'Match')
+        self.assertEqual(notes.loc['1234-5678', 'Issue'], '')
+        self.assertEqual(list(df['Field'].unique()), ['Center', 'CAReportName', 'Amount', 'Note'])
+
+    def test_comparison_plan_reused_across_steps(self):
+        engine = ComparisonEngine()
+        results = engine.compare_dataframes(self.excel_df, self.sql_df, sheet_name='Sheet1')
+        plan = engine.get_comparison_plan(
+            self.excel_df, self.sql_df, results['column_mappings'], sheet_name='Sheet1'
+        )
+        self.assertIs(
+            engine.get_comparison_plan(
+                self.excel_df, self.sql_df, results['column_mappings'], sheet_name='Sheet1'
+            ),
+            plan,
+        )
+        self.assertEqual(plan.matched_count, results['row_counts']['matched'])
+
+        # A different SQL frame for the same sheet replaces the cached plan
+        sql_copy = self.sql_df.copy()
+        new_plan = engine.get_comparison_plan(
+            self.excel_df, sql_copy, results['column_mappings'], sheet_name='Sheet1'
+        )
+        self.assertIsNot(new_plan, plan)
+        self.assertEqual(len(engine._plans), 1)
+
+    def test_comparison_plan_cache_is_bounded_and_checks_contents(self):
+        engine = ComparisonEngine()
+        engine.MAX_CACHED_PLANS = 2
+        mappings = engine.find_matching_columns(self.excel_df.columns, self.sql_df.columns)
+        excel_df = self.excel_df.copy()
+        plan = engine.get_comparison_plan(excel_df, self.sql_df, mappings)
+
+        # Editing a value in place keeps shape and columns but drops the plan
+        excel_df.loc[0, 'Amount'] = 99.0
+        edited_plan = engine.get_comparison_plan(excel_df, self.sql_df, mappings)
+        self.assertIsNot(edited_plan, plan)
+
+        # ... and so do the column profiles of the edited frame
+        self.assertEqual(engine._profiles.get(excel_df, 'Amount').numeric[0], 99.0)
+        excel_df.loc[0, 'Amount'] = 5.0
+        engine.get_comparison_plan(excel_df, self.sql_df, mappings)
+        self.assertEqual(engine._profiles.get(excel_df, 'Amount').numeric[0], 5.0)
+
+        # Unnamed plans are evicted least recently used first
+        frames = [self.sql_df.copy() for _ in range(2)]
+        for sql_df in frames:
+            engine.get_comparison_plan(excel_df, sql_df, mappings)
+        self.assertEqual(len(engine._plans), 2)
+        self.assertNotIn((id(excel_df), id(self.sql_df)), engine._plans)
+
+    def test_pinned_sheet_plans_are_kept_for_exports(self):
+        engine = ComparisonEngine()
+        engine.MAX_CACHED_PLANS = 2
+        sheets = [f'Sheet{i}' for i in range(5)]
+        engine.pin_plans(sheets)
+        mappings = engine.find_matching_columns(self.excel_df.columns, self.sql_df.columns)
+        inputs = {name: (self.excel_df.copy(), self.sql_df.copy()) for name in sheets}
+
+        plans = {
+            name: engine.get_comparison_plan(excel_df, sql_df, mappings, sheet_name=name)
+            for name, (excel_df, sql_df) in inputs.items()
+        }
+        for _ in range(3):
+            engine.get_comparison_plan(self.excel_df.copy(), self.sql_df.copy(), mappings)
+        for name, (excel_df, sql_df) in inputs.items():
+            self.assertIs(
+                engine.get_comparison_plan(excel_df, sql_df, mappings, sheet_name=name),
+                plans[name],
+            )
+        self.assertEqual(len(engine._plans), len(sheets) + 2)
+
+        engine.clear_plans()
+        self.assertEqual(len(engine._plans), 0)
+        self.assertEqual(engine._pinned_sheets, set())
+
+    def test_missing_rows_from_merge_indicator(self):
+        excel_df = pd.DataFrame({
+            'Center': [1, 1, 2],
+            'CAReportName': ['A', 'B', 'C'],
+            'Amount': [1.0, 2.0, 3.0],
+        })
+        sql_df = pd.DataFrame({
+            'Center': [1, 3],
+            'CAReportName': ['A', 'D'],
+            'Amount': [1.0, 4.0],
+        })
+        results = self.engine.compare_dataframes(excel_df, sql_df)
+        self.assertEqual(
+            results['row_counts'],
+            {'excel': 3, 'sql': 2, 'matched': 1, 'excel_only': 2, 'sql_only': 1},
+        )
+        missing = results['missing_rows']
+        self.assertEqual(list(missing.columns), ['Center', 'CAReportName', 'Result'])
+        self.assertEqual(
+            missing.values.tolist(),
+            [[1, 'B', 'Missing in Database'], [2, 'C', 'Missing in Database'],
+             [3, 'D', 'Missing in Excel']],
+        )
+        report = self.engine.generate_comparison_report('Sheet1', results)
+        self.assertIn('- 3 D (Missing in Excel)', report)
+
+    def test_plan_projects_only_needed_columns(self):
+        excel_df = self.excel_df.assign(Zzz='x')
+        excel_df = excel_df.rename(columns={'Amount': 'Amount '})
+        sql_df = self.sql_df.assign(Qqq=1)
+        engine = ComparisonEngine()
+        results = engine.compare_dataframes(excel_df, sql_df, sheet_name='Sheet1')
+        self.assertIn('Amount ', excel_df.columns)
+        self.assertFalse(hasattr(engine, '_last_excel_df'))
+
+        plan = engine._last_plan
+        self.assertNotIn('Zzz', plan.merged_df.columns)
+        self.assertNotIn('Qqq', plan.merged_df.columns)
+        self.assertIn('Amount_excel', plan.merged_df.columns)
+        self.assertEqual(results['summary']['total_cells'], 6)
+        self.assertIn('Sheet1', engine.generate_comparison_report('Sheet1'))
+
     def test_key_column_synonyms(self):
         excel_df = pd.DataFrame({
             'Facility': [1],
@@ -171,6 +339,65 @@ class TestComparisonEngineSignFlip(unittest.TestCase):
                 'Sheet1', excel_df, sql_df, column_mappings=column_mappings
             )
 
+    def test_identical_rows_skip_cell_comparison(self):
+        excel_df = pd.DataFrame({
+            'Center': ['C1', 'C1', 'C2', 'C2'],
+            'CAReportName': ['1000-0000', '2000-0000', '1000-0000', '2000-0000'],
+            'Amount': [10.0, 20.0, 30.0, 40.0],
+            'Note': ['a', 'b', 'c', 'd'],
+        })
+        sql_df = excel_df.copy()
+        sql_df.loc[3, 'Amount'] = 41.0
+        sql_df.loc[1, 'Note'] = ' B '
+        engine = ComparisonEngine()
+        with patch.object(
+            row_comparison, 'compare_series', wraps=row_comparison.compare_series
+        ) as compare_series:
+            results = engine.compare_dataframes(excel_df, sql_df)
+
+        self.assertEqual(len(compare_series.call_args_list[0].args[0]), 1)
+        self.assertEqual(results['column_comparisons']['Amount']['match_count'], 3)
+        self.assertEqual(results['column_comparisons']['Note']['match_count'], 4)
+        mismatches = list(results['column_comparisons']['Amount']['mismatch_rows'])
+        self.assertEqual([(m['excel_value'], m['sql_value']) for m in mismatches], [(40.0, 41.0)])
+
+    def test_results_include_stage_profile(self):
+        results = self.engine.compare_dataframes(self.excel_df, self.sql_df)
+        profile = results['profile']
+        for stage in ('key_detection', 'join_keys', 'merge', 'column_compare', 'discrepancies'):
+            self.assertIn(stage, profile['stages'])
+        self.assertEqual(profile['counters']['rows_in'], len(self.excel_df) + len(self.sql_df))
+        self.assertEqual(profile['counters']['cells_compared'], results['summary']['total_cells'])
+        self.assertEqual(profile['counters']['mismatches'], results['summary']['mismatch_cells'])
+
+        # A second comparison of the same frames reuses the cached plan
+        again = self.engine.compare_dataframes(self.excel_df, self.sql_df)
+        self.assertEqual(again['profile']['counters']['plan_reuses'], 1)
+        self.assertNotIn('merge', again['profile']['stages'])
+
+    def test_result_cache_key_tracks_inputs_and_settings(self):
+        engine = ComparisonEngine()
+        excel_df = pd.DataFrame({'Center': ['C1', 'C2'], 'Amount': [1.0, 2.0]})
+        sql_df = excel_df.copy()
+        key = engine.result_cache_key(excel_df, sql_df)
+        engine.result_cache.put('Sheet1', key, {'summary': {}})
+
+        # Equal content in new frame objects hits the cache
+        self.assertIsNotNone(
+            engine.result_cache.get('Sheet1', engine.result_cache_key(excel_df.copy(), sql_df.copy()))
+        )
+        edited = excel_df.copy()
+        edited.loc[1, 'Amount'] = 3.0
+        self.assertIsNone(engine.result_cache.get('Sheet1', engine.result_cache_key(edited, sql_df)))
+        self.assertIsNone(
+            engine.result_cache.get('Sheet1', engine.result_cache_key(excel_df, sql_df, mode='hierarchical'))
+        )
+        engine.set_tolerance(0.5)
+        self.assertIsNone(engine.result_cache.get('Sheet1', engine.result_cache_key(excel_df, sql_df)))
+        engine.set_tolerance(0.001)
+        engine.set_sign_flip_accounts(['1234-5678'])
+        self.assertIsNone(engine.result_cache.get('Sheet1', engine.result_cache_key(excel_df, sql_df)))
+
     def test_generate_comparison_report_content(self):
         self.engine.set_sign_flip_accounts(['1234-5678'])
         results = self.engine.compare_dataframes(self.excel_df, self.sql_df)
@@ -0,0 +1,86 @@
+import unittest
+
+import pandas as pd
+
+from src.analyzer.comparison_engine import ComparisonEngine
+from src.analyzer.mismatch_store import MismatchStore
+from tests.compare_frames import account_frame
+
+
+def _make_sheet(seed, rows=40):
+    excel_df = account_frame(rows, seed=seed, centers=3, account_column='CAReportName', owners=4)
+    sql_df = excel_df.copy()
+    sql_df.loc[seed % rows, 'Amount'] += 10
+    sql_df.loc[(seed + 5) % rows, 'Owner'] = 'Someone else'
+    sql_df.loc[(seed + 9) % rows, 'Amount'] *= -1
+    sql_df = sql_df.drop(index=[(seed + 1) % rows]).reset_index(drop=True)
+    return excel_df, sql_df
+
+
+class TestConsolidatedCompare(unittest.TestCase):
+    def setUp(self):
+        self.engine = ComparisonEngine()
+        self.tasks = [(f'Sheet{i}', *_make_sheet(i)) for i in range(4)]
+        # A sheet with another layout is compared on its own
+        other = pd.DataFrame({'Account': ['1000-0000', '1001-0000'], 'Total': [1.0, 2.0]})
+        self.tasks.append(('Other', other, other.assign(Total=[1.0, 3.0])))
+
+    def test_results_match_separate_comparisons(self):
+        results = self.engine.compare_consolidated(self.tasks)
+
+        self.assertEqual(list(results), [name for name, _, _ in self.tasks])
+        for name, excel_df, sql_df in self.tasks:
+            expected = self.engine.compare_sheet(excel_df, sql_df, sheet_name=name)
+            merged = results[name]
+            self.assertEqual(merged['summary'], expected['summary'])
+            self.assertEqual(merged['row_counts'], expected['row_counts'])
+            self.assertEqual(merged['suggested_sign_flips'], expected['suggested_sign_flips'])
+            self.assertEqual(merged['duplicate_keys'], expected['duplicate_keys'])
+            for column, stats in expected['column_comparisons'].items():
+                self.assertEqual(
+                    merged['column_comparisons'][column]['mismatch_count'],
+                    stats['mismatch_count'],
+                )
+            self.assertEqual(len(merged['missing_rows']), len(expected['missing_rows']))
+            self.assertNotIn('__sheet__', merged['missing_rows'].columns)
+            # Discrepancies come from one stacked pass but keep per-sheet severity
+            pd.testing.assert_frame_equal(
+                merged['account_discrepancies'], expected['account_discrepancies']
+            )
+
+    def test_hierarchical_option_is_reported(self):
+        from src.analyzer import consolidated_compare
+
+        self.engine.set_hierarchical(True)
+        with self.assertLogs(consolidated_compare.logger, 'INFO') as logs:
+            comparison = consolidated_compare.ConsolidatedComparison(self.engine)
+        self.assertFalse(comparison.engine.hierarchical)
+        self.assertIn('hierarchical option is not used', logs.output[0])
+
+    def test_plugins_compare_sheets_separately(self):
+        self.engine.plugins = [object()]
+        calls = []
+        self.engine.compare_sheet = lambda *args, **kwargs: calls.append(kwargs['sheet_name']) or {}
+
+        self.engine.compare_consolidated(self.tasks)
+
+        self.assertEqual(calls, [name for name, _, _ in self.tasks])
+
+
+class TestMismatchStoreSplit(unittest.TestCase):
+    def test_split_renumbers_rows_per_group(self):
+        store = MismatchStore(cap=None)
+        store.add('Amount', [0, 1, 3], [1.0, 2.0, 4.0], [1.5, 2.5, 4.5], [0.5] * 3, [0.5] * 3)
+        store.add('Owner', [2], ['a'], ['b'], ['String mismatch'], [0.0])
+
+        first, second = store.split([0, 1, 1, 0], [0, 0, 1, 1], 2)
+
+        self.assertEqual(first.count('Amount'), 2)
+        self.assertEqual([r['row'] for r in first.rows_for('Amount')], [0, 1])
+        self.assertEqual(second.count('Amount'), 1)
+        self.assertEqual(second.rows_for('Owner')[0]['row'], 1)
+        self.assertEqual(first.count('Owner'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
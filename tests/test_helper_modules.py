@@ -2,7 +2,8 @@ import os
 import pandas as pd
 import unittest
 
-from src.analyzer import sign_flip, column_matching, row_comparison, report_generator
+from src.analyzer import sign_flip, column_matching, row_comparison, report_generator, join_keys, column_profile, row_fingerprint, compare_profile
+from src.analyzer.mismatch_store import MismatchStore
 
 FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
 
@@ -16,11 +17,58 @@ class TestHelperModules(unittest.TestCase):
         self.assertEqual(val, -100.0)
         self.assertFalse(sign_flip.should_flip('9999-0000', ['1234-5678']))
 
+    def test_sign_flip_index_mask(self):
+        index = sign_flip.SignFlipIndex(['1234-5678', ' 2222-3333 '])
+        accounts = pd.Series(['12345678', '1234-5678 Revenue', '9999-0000', None, '2222-3333'])
+        self.assertEqual(list(index.mask(accounts)), [True, True, False, False, True])
+        self.assertEqual(list(index.signs(accounts)), [-1.0, -1.0, 1.0, 1.0, -1.0])
+        self.assertIn('1234 5678', index)
+        self.assertFalse(sign_flip.SignFlipIndex())
+
     def test_column_matching(self):
         mapping = column_matching.find_matching_columns(self.excel_df.columns, self.sql_df.columns)
         self.assertEqual(len(mapping), 3)
         self.assertEqual(mapping[0]['excel_column'], 'Center')
 
+    def test_column_matching_saved_mappings(self):
+        excel_cols = ['Center', 'Acct Desc', 'Jan Amount']
+        sql_cols = ['Center', 'Account Description', 'Amount']
+        fresh = column_matching.find_matching_columns(excel_cols, sql_cols)
+        self.assertEqual(fresh, column_matching.find_matching_columns(excel_cols, sql_cols))
+
+        # Only fuzzy matches are saved; exact matches are found every run
+        saved = column_matching.mappings_to_saved(fresh)
+        self.assertNotIn('Center', saved)
+        saved['Jan Amount'] = {'sql_column': 'Amount', 'match_score': 0.9}
+        # Entries without a SQL column come from older versions and are ignored
+        saved['Acct Desc'] = {'sql_column': None, 'match_score': 0.0}
+        mapping = column_matching.find_matching_columns(excel_cols, sql_cols, saved_mappings=saved)
+        by_excel = {m['excel_column']: m['sql_column'] for m in mapping.values()}
+        self.assertEqual(by_excel, {
+            'Center': 'Center', 'Acct Desc': 'Account Description', 'Jan Amount': 'Amount'
+        })
+        self.assertEqual(mapping[2]['match_score'], 0.9)
+
+    def test_column_matching_exact_matches_before_saved(self):
+        first = column_matching.find_matching_columns(['Center', 'Budget'], ['Center'])
+        saved = column_matching.mappings_to_saved(first)
+        self.assertEqual(saved, {})
+
+        # A header that had no SQL column before is matched once it appears
+        mapping = column_matching.find_matching_columns(
+            ['Center', 'Budget'], ['Center', 'Budget'], saved_mappings=saved
+        )
+        self.assertEqual([m['sql_column'] for m in mapping.values()], ['Center', 'Budget'])
+
+        # A saved match never takes a column another header matches exactly
+        saved = {'Budget Total': {'sql_column': 'Budget', 'match_score': 0.8}}
+        mapping = column_matching.find_matching_columns(
+            ['Budget Total', 'Budget'], ['Budget'], saved_mappings=saved
+        )
+        self.assertEqual(list(mapping.values()), [
+            {'excel_column': 'Budget', 'sql_column': 'Budget', 'match_score': 1.0}
+        ])
+
     def test_row_comparison(self):
         excel_series = self.excel_df['Amount']
         sql_series = self.sql_df['Amount']
@@ -34,6 +82,167 @@ class TestHelperModules(unittest.TestCase):
         res = row_comparison.compare_series(excel_series, sql_series)
         self.assertEqual(res['mismatch_count'], 0)
 
+    def test_row_comparison_mismatch_rows(self):
+        excel_series = pd.Series([100.0, 0.5, None, 10.0, 2.0])
+        sql_series = pd.Series([100.05, 0.5004, 3.0, -10.0, None])
+        acct_series = pd.Series(['1111-2222', '1111-2222', '3333-4444', '5555-6666', '1111-2222'])
+        res = row_comparison.compare_series(excel_series, sql_series, acct_series)
+        self.assertTrue(res['is_numeric'])
+        self.assertEqual(res['match_count'], 2)
+        self.assertEqual(res['mismatch_count'], 3)
+        self.assertEqual(res['null_mismatch_count'], 2)
+        self.assertEqual([r['row'] for r in res['mismatch_rows']], [2, 3, 4])
+        self.assertEqual(res['mismatch_rows'][0]['difference'], 'NULL mismatch')
+        self.assertEqual(res['mismatch_rows'][1]['difference'], 20.0)
+        self.assertEqual(res['sign_flip_candidates'], {'55556666'})
+
+        flipped = row_comparison.compare_series(
+            excel_series, sql_series, acct_series, sign_flip_accounts=['5555-6666']
+        )
+        self.assertEqual(flipped['mismatch_count'], 2)
+        self.assertEqual(flipped['sign_flip_candidates'], set())
+
+    def test_row_comparison_strings_case_insensitive(self):
+        excel_series = pd.Series(['Acct A ', 'acct b', None, 'x'])
+        sql_series = pd.Series(['acct a', 'ACCT C', None, None])
+        res = row_comparison.compare_series(excel_series, sql_series)
+        self.assertFalse(res['is_numeric'])
+        self.assertEqual(res['match_count'], 2)
+        self.assertEqual(
+            [(r['row'], r['difference']) for r in res['mismatch_rows']],
+            [(1, 'String mismatch'), (3, 'NULL mismatch')],
+        )
+
+    def test_mismatch_store_cap_and_top_view(self):
+        store = MismatchStore(cap=3)
+        excel_series = pd.Series([1.0, 2.0, 3.0, 4.0, None])
+        res = row_comparison.compare_series(
+            excel_series, pd.Series([1.5, 12.0, 3.0, 104.0, 50.0]),
+            mismatch_store=store, column='Amount',
+        )
+        row_comparison.compare_series(
+            pd.Series(['a', 'b']), pd.Series(['a', 'c']), mismatch_store=store, column='Name'
+        )
+        self.assertEqual(res['mismatch_count'], 4)
+        self.assertEqual(store.total, 5)
+        self.assertEqual(len(store), 3)
+        top = store.top(2)
+        self.assertEqual(top['row'].tolist(), [3, 4])
+        self.assertEqual(top['difference'].tolist(), [-100.0, 'NULL mismatch'])
+        self.assertEqual([r['row'] for r in res['mismatch_rows']], [1, 3, 4])
+
+        merged = MismatchStore()
+        merged.extend(store, row_offset=10)
+        self.assertEqual(merged.total, 5)
+        self.assertEqual(merged.to_frame()['row'].tolist(), [11, 13, 14])
+
+    def test_row_fingerprints_follow_comparison_rules(self):
+        excel = row_fingerprint.combine([
+            row_fingerprint.numeric_hash([1.0, None, 0.0, 5.0]),
+            row_fingerprint.text_hash(pd.Series([' A', None, 'x', 'y'])),
+        ], 4)
+        sql = row_fingerprint.combine([
+            row_fingerprint.numeric_hash([-1.0, 0.0, -0.0, 5.0], flip=[True, False, False, False]),
+            row_fingerprint.text_hash(pd.Series(['a', None, 'X', 'z'])),
+        ], 4)
+        self.assertEqual((excel == sql).tolist(), [True, True, True, False])
+
+    def test_compare_series_subset_keeps_row_numbers(self):
+        res = row_comparison.compare_series(
+            pd.Series(['1', 'x']), pd.Series([1.0, 2.0]),
+            is_numeric=True, row_numbers=[4, 9],
+        )
+        self.assertTrue(res['is_numeric'])
+        self.assertEqual([r['row'] for r in res['mismatch_rows']], [9])
+
+    def test_compare_profiles_sum_and_format(self):
+        profile = compare_profile.ComparisonProfile()
+        with profile.stage('merge'):
+            pass
+        profile.count('rows_in', 4)
+        total = compare_profile.merge_profiles([
+            profile.as_dict(), None, {'stages': {'merge': 1.0}, 'counters': {'rows_in': 6}},
+        ])
+        self.assertGreaterEqual(total['stages']['merge'], 1.0)
+        self.assertEqual(total['counters']['rows_in'], 10)
+        lines = compare_profile.format_profile(total)
+        self.assertEqual(lines[0], '\n## Performance')
+        self.assertIn('- **Rows in:** 10', lines)
+        self.assertEqual(compare_profile.format_profile(None), [])
+
+    def test_join_keys_hashed_and_normalized(self):
+        excel_norm = join_keys.normalize_key_columns(
+            pd.DataFrame({'Center': [1, 2], 'Acct': [' A ', 'b']}), ['Center', 'Acct']
+        )
+        sql_norm = join_keys.normalize_key_columns(
+            pd.DataFrame({'Facility': [2, 1], 'Account': ['B', 'a']}), ['Facility', 'Account']
+        )
+        excel_keys, sql_keys, hashed = join_keys.build_join_keys(excel_norm, sql_norm)
+        self.assertTrue(hashed)
+        self.assertEqual(excel_keys.dtype, 'uint64')
+        self.assertEqual(list(excel_keys), list(sql_keys[::-1]))
+        self.assertEqual(list(join_keys.string_keys(excel_norm)), ['1-a', '2-b'])
+
+    def test_join_keys_collision_detection(self):
+        norm = pd.DataFrame({0: ['a', 'b', 'a']})
+        self.assertFalse(join_keys.has_collisions([norm], [join_keys.hash_keys(norm)]))
+        same_hash = pd.Series([7, 7, 7], dtype='uint64').to_numpy()
+        self.assertTrue(join_keys.has_collisions([norm], [same_hash]))
+
+    def test_group_ids_refined_incrementally(self):
+        df = pd.DataFrame({'Center': [1, 1, 2, 2], 'Month': ['Jan', 'Feb', 'jan ', None]})
+        ids, groups = join_keys.group_ids(df, ['Center'])
+        self.assertEqual(groups, 2)
+        ids, groups = join_keys.refine_group_ids(ids, df['Month'])
+        self.assertEqual(groups, 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_factorize_keeping_missing(self):
+        values = pd.Series(['b', None, 'a', 'b', None])
+        codes, uniques = join_keys.factorize_keeping_missing(values)
+        self.assertEqual(list(codes), [0, 1, 2, 0, 1])
+        self.assertEqual(list(uniques[[0, 2]]), ['b', 'a'])
+        self.assertTrue(pd.isna(uniques[1]))
+
+        codes, uniques = join_keys.factorize_keeping_missing(values, sort=True)
+        self.assertEqual(list(codes), [1, 2, 0, 1, 2])
+        self.assertEqual(list(uniques[:2]), ['a', 'b'])
+        self.assertTrue(pd.isna(uniques[2]))
+
+    def test_duplicate_key_counts_use_display_keys(self):
+        norm = join_keys.normalize_key_columns(
+            pd.DataFrame({'Center': [1, 1, 2], 'Acct': ['x', 'X ', 'y']}), ['Center', 'Acct']
+        )
+        keys = pd.Series(join_keys.hash_keys(norm))
+        self.assertEqual(join_keys.duplicate_key_counts(norm, keys), {'1-x': 2})
+
+    def test_column_profile_cache(self):
+        cache = column_profile.ProfileCache()
+        profile = cache.get(self.excel_df, 'Amount')
+        self.assertIs(cache.get(self.excel_df, 'Amount'), profile)
+        self.assertTrue(profile.is_numeric)
+        self.assertEqual(profile.role, column_profile.ROLE_METRIC)
+        self.assertEqual(cache.get(self.excel_df, 'CAReportName').role, column_profile.ROLE_ACCOUNT)
+
+        df = pd.DataFrame({'Sheet Name': ['a', '1', None]})
+        text = cache.get(df, 'Sheet Name')
+        self.assertEqual(text.role, column_profile.ROLE_SHEET)
+        self.assertAlmostEqual(text.numeric_ratio, 1 / 3)
+        self.assertEqual(list(text.null_mask), [False, False, True])
+
+        # Structural changes invalidate the cached profiles
+        df['Other'] = 1
+        self.assertIsNot(cache.get(df, 'Sheet Name'), text)
+
+        # Values edited in place are caught by the content fingerprint
+        cache.validate(df)
+        text = cache.get(df, 'Sheet Name')
+        cache.validate(df)
+        self.assertIs(cache.get(df, 'Sheet Name'), text)
+        df.loc[0, 'Sheet Name'] = '2'
+        cache.validate(df)
+        self.assertEqual(cache.get(df, 'Sheet Name').numeric_ratio, 2 / 3)
+
     def test_report_generator(self):
         comparison_results = {
             'summary': {'mismatch_percentage': 0, 'matching_cells': 3, 'total_cells': 3},
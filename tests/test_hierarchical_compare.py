@@ -0,0 +1,82 @@
+import unittest
+
+import pandas as pd
+
+from src.analyzer.comparison_engine import ComparisonEngine
+from src.analyzer.hierarchical_compare import HierarchicalComparison
+from tests.compare_frames import account_frame, add_rows
+
+
+def _make_frames(rows=700):
+    excel_df = account_frame(rows, seed=1, value_columns=('Amount', 'Budget'), owners=5)
+    sql_df = excel_df.copy()
+    sql_df.loc[[10, 200], 'Amount'] += 10
+    # Offsetting differences within one account and across centers
+    sql_df.loc[300, 'Budget'] += 50
+    sql_df.loc[301, 'Budget'] -= 50
+    sql_df.loc[450, 'Owner'] = 'Someone else'
+    sql_df = add_rows(sql_df.drop(index=[3]), [{
+        'Center': 'C9', 'Account': '9999-0000',
+        'Amount': 5.0, 'Budget': 1.0, 'Owner': 'Owner 0',
+    }])
+    return excel_df, sql_df
+
+
+class TestHierarchicalCompare(unittest.TestCase):
+    def setUp(self):
+        self.engine = ComparisonEngine()
+        self.excel_df, self.sql_df = _make_frames()
+
+    def test_results_match_full_comparison(self):
+        expected = self.engine.compare_sheet(self.excel_df, self.sql_df)
+        results = HierarchicalComparison(self.engine).compare(self.excel_df, self.sql_df)
+
+        self.assertEqual(results['row_counts'], expected['row_counts'])
+        self.assertEqual(results['summary'], expected['summary'])
+        for column, stats in expected['column_comparisons'].items():
+            merged = results['column_comparisons'][column]
+            self.assertEqual(merged['match_count'], stats['match_count'])
+            self.assertEqual(merged['mismatch_count'], stats['mismatch_count'])
+        self.assertEqual(len(results['missing_rows']), len(expected['missing_rows']))
+        self.assertEqual(
+            len(results['account_discrepancies']), len(expected['account_discrepancies'])
+        )
+
+        drilled = results['hierarchical']['drilled_rows']
+        self.assertLess(drilled['excel'], len(self.excel_df) // 10)
+        self.assertEqual(
+            [level['level'] for level in results['hierarchical']['levels']],
+            ['sheet', 'center', 'account'],
+        )
+
+    def test_matching_sheet_stops_at_sheet_level(self):
+        sql_df = self.excel_df.sample(frac=1, random_state=0)
+        results = self.engine.compare_hierarchical(self.excel_df, sql_df)
+
+        self.assertEqual(results['hierarchical']['levels'], [
+            {'level': 'sheet', 'groups': 1, 'mismatched': 0},
+        ])
+        self.assertEqual(results['row_counts']['matched'], len(self.excel_df))
+        self.assertEqual(results['summary']['mismatch_cells'], 0)
+        self.assertEqual(results['summary']['total_cells'], len(self.excel_df) * 5)
+        self.assertIs(self.engine.comparison_results, results)
+
+    def test_groups_differing_only_in_an_extra_key_column_are_drilled(self):
+        excel_df = pd.DataFrame({
+            'Center': ['C1'] * 4,
+            'CAReportName': ['A', 'A', 'B', 'B'],
+            'Desc': ['x', 'y', 'x', 'y'],
+            'Jan': [0, 0, 5, 6],
+        })
+        sql_df = excel_df.assign(Desc=['x', 'z', 'x', 'y'])
+
+        expected = self.engine.compare_sheet(excel_df, sql_df)
+        results = self.engine.compare_hierarchical(excel_df, sql_df)
+
+        self.assertEqual(results['row_counts'], expected['row_counts'])
+        self.assertEqual(results['row_counts']['matched'], 3)
+        self.assertEqual(len(results['missing_rows']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
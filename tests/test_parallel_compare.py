@@ -0,0 +1,47 @@
+import os
+import unittest
+import pandas as pd
+
+from src.analyzer import parallel_compare
+from src.analyzer.comparison_engine import ComparisonEngine
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class TestParallelCompare(unittest.TestCase):
+    def setUp(self):
+        self.excel_df = pd.read_csv(os.path.join(FIXTURES, 'excel_data.csv'))
+        self.sql_df = pd.read_csv(os.path.join(FIXTURES, 'sql_data.csv'))
+        self.engine = ComparisonEngine()
+        self.engine.set_sign_flip_accounts(['1234-5678'])
+
+    def test_results_match_serial_comparison_in_order(self):
+        sql_mod = self.sql_df.copy()
+        sql_mod.loc[1, 'Amount'] = sql_mod.loc[1, 'Amount'] + 500
+        tasks = [
+            ('Sheet B', self.excel_df, sql_mod),
+            ('Sheet A', self.excel_df, self.sql_df),
+            ('Sheet C', self.excel_df, self.sql_df.iloc[0:0]),
+        ]
+        settings = parallel_compare.engine_settings(self.engine)
+        results = parallel_compare.compare_sheets(tasks, settings, max_workers=2)
+
+        self.assertEqual(list(results), ['Sheet B', 'Sheet A', 'Sheet C'])
+        self.assertIn('error', results['Sheet C'])
+        for sheet_name, excel_df, sql_df in tasks[:2]:
+            serial = self.engine.compare_sheet(excel_df, sql_df, sheet_name=sheet_name)
+            self.assertEqual(results[sheet_name]['summary'], serial['summary'])
+        self.assertTrue(results['Sheet A']['summary']['overall_match'])
+        self.assertFalse(results['Sheet B']['summary']['overall_match'])
+
+    def test_compare_sheet_leaves_inputs_and_engine_state_untouched(self):
+        excel_df = self.excel_df.rename(columns={'Amount': ' Amount '})
+        results = self.engine.compare_sheet(excel_df, self.sql_df)
+        self.assertIn('Amount', results['column_comparisons'])
+        self.assertIn(' Amount ', excel_df.columns)
+        self.assertEqual(self.engine.comparison_results, {})
+        self.assertFalse(hasattr(self.engine, '_last_excel_df'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import threading
+import unittest
+from tempfile import NamedTemporaryFile
+from unittest.mock import patch
+
+from src.analyzer.sheet_prefetch import SheetPrefetcher, neighbour_order
+
+
+class TestSheetPrefetch(unittest.TestCase):
+    def test_neighbour_order(self):
+        names = ['A', 'B', 'C', 'D', 'E']
+        self.assertEqual(neighbour_order(names, 'C'), ['C', 'D', 'B', 'E', 'A'])
+        self.assertEqual(neighbour_order(names, 'A'), names)
+        self.assertEqual(neighbour_order(names, None), names)
+
+    def test_background_results_handed_out_once(self):
+        loads = []
+        prefetcher = SheetPrefetcher(lambda name: loads.append(name) or name.lower(), ['A', 'B', 'C'])
+        prefetcher.prioritize(['C', 'B'])
+        self.assertTrue(prefetcher.wait(5))
+
+        self.assertEqual(loads, ['C', 'B', 'A'])
+        self.assertEqual(prefetcher.get('B'), 'b')
+        # A second request loads the sheet again in the caller
+        self.assertEqual(prefetcher.get('B'), 'b')
+        self.assertEqual(loads, ['C', 'B', 'A', 'B'])
+
+    def test_get_waits_for_sheet_being_loaded(self):
+        started = threading.Event()
+        release = threading.Event()
+        loads = []
+
+        def load(name):
+            loads.append(name)
+            if name == 'A':
+                started.set()
+                release.wait(5)
+            return name
+
+        prefetcher = SheetPrefetcher(load, ['A', 'B'])
+        prefetcher.prioritize(['A'])
+        self.assertTrue(started.wait(5))
+        prefetcher.stop()
+
+        # B is not being prefetched, so it is loaded right away
+        self.assertEqual(prefetcher.get('B'), 'B')
+        threading.Timer(0.05, release.set).start()
+        self.assertEqual(prefetcher.get('A'), 'A')
+        self.assertEqual(loads, ['A', 'B'])
+
+    def test_excel_analyzer_reuses_prefetched_sheets(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+
+        from src.analyzer.excel_analyzer import ExcelAnalyzer
+
+        wb = Workbook()
+        wb.active.title = 'First'
+        wb.active.append(['Center', 'Amount'])
+        wb.active.append(['C1', 1.5])
+        for name in ('Second', 'Third'):
+            wb.create_sheet(name).append(['Center', name])
+
+        with NamedTemporaryFile(suffix='.xlsx') as tmp:
+            wb.save(tmp.name)
+            analyzer = ExcelAnalyzer(tmp.name)
+            self.assertTrue(analyzer.load_excel())
+            self.assertEqual(analyzer.sheet_data, {})
+
+            analyzer.prefetch('Second')
+            self.assertTrue(analyzer._prefetcher.wait(10))
+            self.assertEqual(set(analyzer.sheet_data), {'First', 'Second', 'Third'})
+
+            with patch.object(analyzer.excel_file, 'read_sheet') as read_sheet:
+                info = analyzer.analyze_sheet('First')
+            read_sheet.assert_not_called()
+            self.assertIs(info, analyzer.sheet_data['First'])
+            self.assertEqual(info['dataframe'].iloc[1, 1], 1.5)
+            analyzer.close()
+
+    def test_sheets_are_published_complete(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+
+        from src.analyzer.excel_analyzer import ExcelAnalyzer
+
+        wb = Workbook()
+        wb.active.title = 'A'
+        wb.create_sheet('B').append(['Center', 'Amount'])
+
+        with NamedTemporaryFile(suffix='.xlsx') as tmp:
+            wb.save(tmp.name)
+            analyzer = ExcelAnalyzer(tmp.name)
+            self.assertTrue(analyzer.load_excel())
+
+            started = threading.Event()
+            release = threading.Event()
+            detect = analyzer._detect_numerical_columns
+
+            def slow_detect(df, sheet_info=None):
+                started.set()
+                release.wait(5)
+                return detect(df, sheet_info)
+
+            analyzer._detect_numerical_columns = slow_detect
+            analyzer.prefetch('B')
+            self.assertTrue(started.wait(5))
+
+            # Half way through the analysis nothing of B is visible yet
+            self.assertFalse(analyzer.is_analyzed('B'))
+            self.assertNotIn('B', analyzer.sheet_data)
+            self.assertEqual(analyzer.get_sheet_summary(), {})
+
+            threading.Timer(0.05, release.set).start()
+            info = analyzer.get_sheet('B')
+            self.assertIn('data_area', info)
+            self.assertIn('B', analyzer.numerical_columns)
+            self.assertIs(analyzer.get_sheet('B'), info)
+            analyzer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
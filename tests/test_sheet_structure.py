@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analyzer.excel_analyzer import ExcelAnalyzer
+
+
+def _sheet():
+    return pd.DataFrame({
+        0: ['Report', np.nan, 'Center', 'C1', 'C2', '  ', np.nan, 'C3', np.nan],
+        1: [np.nan, np.nan, 'Revenue', 1.5, True, '', np.nan, np.int64(4), np.nan],
+        2: [np.nan, '', 'Expense', 2.0, np.nan, np.nan, np.nan, 'n/a', np.nan],
+    })
+
+
+class TestSheetStructure(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = ExcelAnalyzer('unused.xlsx')
+
+    def test_structure_of_mixed_sheet(self):
+        structure = self.analyzer._analyze_sheet_structure(_sheet())
+
+        self.assertEqual(structure, {
+            'empty_rows': [6, 8],
+            'potential_headers': [0, 1, 2, 5, 7],
+            'data_regions': [[0, 1, 2, 3, 4, 5], [7]],
+            'footer_rows': [],
+        })
+        # Row numbers stay plain ints, as they end up in JSON and reports
+        self.assertTrue(all(type(row) is int for row in structure['potential_headers']))
+
+    def test_data_area_with_and_without_structure(self):
+        df = _sheet()
+        df.name = 'Sheet1'
+        self.assertEqual(self.analyzer._detect_data_area(df), (0, 7))
+
+        self.analyzer.sheet_data['Sheet1'] = {
+            'structure': self.analyzer._analyze_sheet_structure(df)
+        }
+        self.assertEqual(self.analyzer._detect_data_area(df), (8, 7))
+
+    def test_blank_sheet(self):
+        df = pd.DataFrame({0: ['', ' '], 1: ['\t', '']})
+        structure = self.analyzer._analyze_sheet_structure(df)
+
+        self.assertEqual(structure['empty_rows'], [0, 1])
+        self.assertEqual(structure['data_regions'], [])
+        self.assertEqual(self.analyzer._detect_data_area(df), (2, -1))
+
+    def test_header_rows_need_two_matching_cells(self):
+        df = pd.DataFrame({
+            0: ['Report', 'Center', 'TOTAL revenue', 'C1'],
+            1: ['Jan', 'Q1 Budget', np.str_('Mar actual'), 'Total'],
+            2: [np.nan, 'YTD', 5.0, 1.0],
+        })
+
+        self.assertEqual(self.analyzer._detect_headers(df), [1, 2])
+        self.assertEqual(self.analyzer._detect_headers(df, max_header_rows=2), [1])
+        self.assertEqual(self.analyzer._detect_headers(df, max_header_rows=0), [])
+
+    def test_numerical_columns_below_header(self):
+        df = pd.DataFrame({
+            0: ['Center', 'C1', 'C2', 'C3', 'C4'],
+            1: ['Amount', 1.5, np.nan, np.int64(2), True],
+            2: ['Count', 1, 2, 3, 'n/a'],
+        })
+        df.name = 'Sheet1'
+        self.analyzer.sheet_data['Sheet1'] = {'header_indexes': [0]}
+
+        columns = self.analyzer._detect_numerical_columns(df)
+
+        self.assertEqual(list(columns), [2])
+        self.assertEqual(columns[2]['header'], 'Count')
+        self.assertEqual(columns[2]['numeric_ratio'], 0.75)
+        self.assertEqual(columns[2]['sample_values'], [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
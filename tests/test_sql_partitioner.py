@@ -0,0 +1,48 @@
+import unittest
+import pandas as pd
+
+from src.analyzer.sql_partitioner import SqlResultPartitioner, detect_sheet_column
+
+
+class TestSqlResultPartitioner(unittest.TestCase):
+    def setUp(self):
+        self.sql_df = pd.DataFrame({
+            'Sheet Name': ['North', 'north ', 'South', 'South', None],
+            'Center': [1, 1, 2, 3, 1],
+            'CAReportName': ['Acct A', 'acct b', 'Acct A', 'Acct C', 'Acct A'],
+            'Amount': [10, 20, 30, 40, 50],
+        })
+        self.partitioner = SqlResultPartitioner(self.sql_df)
+
+    def test_detect_sheet_column(self):
+        self.assertEqual(detect_sheet_column(self.sql_df.columns), 'Sheet Name')
+        self.assertIsNone(detect_sheet_column(['Center', 'Amount']))
+
+    def test_subset_matches_normalized_key_values(self):
+        excel_df = pd.DataFrame({
+            'Sheet': ['NORTH', 'North'],
+            'Center': [1, 1],
+            'CAReportName': [' acct a', 'Acct B'],
+        })
+        subset = self.partitioner.subset(excel_df)
+        self.assertEqual(list(subset.index), [0, 1])
+        self.assertEqual(list(subset['Amount']), [10, 20])
+
+        south = pd.DataFrame({'Sheet_Name': ['south'], 'Center': [2], 'CAReportName': ['acct a']})
+        self.assertEqual(list(self.partitioner.subset(south)['Amount']), [30])
+
+    def test_subset_without_keys_returns_all_rows(self):
+        excel_df = pd.DataFrame({'Amount': [1]})
+        subset = self.partitioner.subset(excel_df)
+        self.assertEqual(len(subset), len(self.sql_df))
+        self.assertIsNot(subset, self.sql_df)
+
+    def test_subset_without_matches_is_empty(self):
+        excel_df = pd.DataFrame({'Center': [9]})
+        subset = self.partitioner.subset(excel_df)
+        self.assertTrue(subset.empty)
+        self.assertEqual(list(subset.columns), list(self.sql_df.columns))
+
+
+if __name__ == '__main__':
+    unittest.main()
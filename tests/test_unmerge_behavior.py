@@ -21,11 +21,111 @@ class TestUnmergeBehavior(unittest.TestCase):
             wb.save(tmp.name)
             analyzer = ExcelAnalyzer(tmp.name)
             self.assertTrue(analyzer.load_excel())
-            df = pd.read_excel(analyzer.excel_file, sheet_name=0, header=None)
+            df = analyzer.excel_file.read_sheet(analyzer.sheet_names[0])
             self.assertEqual(df.iloc[0, 0], "Header")
             self.assertTrue(pd.isna(df.iloc[0, 1]))
             self.assertTrue(pd.isna(df.iloc[0, 2]))
 
+    def test_block_merges_and_formulas_read_in_one_pass(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+
+        from src.analyzer.excel_analyzer import ExcelAnalyzer
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Data"
+        ws.merge_cells("B2:C3")
+        ws["B2"] = 7
+        ws["A4"] = "Total"
+        ws["B4"] = "=SUM(B2:B3)"
+        ws["D4"] = 1.5
+
+        with NamedTemporaryFile(suffix=".xlsx") as tmp:
+            wb.save(tmp.name)
+            analyzer = ExcelAnalyzer(tmp.name)
+            self.assertTrue(analyzer.load_excel())
+            self.assertEqual(analyzer.sheet_names, ["Data"])
+            df = analyzer.analyze_sheet("Data")["dataframe"]
+
+        self.assertEqual(df.shape, (4, 4))
+        self.assertEqual(df.iloc[1, 1], 7)
+        self.assertTrue(df.iloc[1:3, 2].isna().all())
+        self.assertTrue(pd.isna(df.iloc[2, 1]))
+        # Formula results were never kept by the former save/re-parse round trip
+        self.assertTrue(pd.isna(df.iloc[3, 1]))
+        self.assertEqual(df.iloc[3, 3], 1.5)
+
+    def test_columns_typed_like_read_excel(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+        import datetime
+
+        from src.analyzer.workbook_loader import UnmergedExcelFile
+
+        wb = Workbook()
+        ws = wb.active
+        rows = [
+            ["Center", 1, "12", True, "True", datetime.datetime(2024, 1, 31), 1.5, "x"],
+            ["C1", 2, "NA", False, "false", None, "n/a", 3],
+            ["C2", 3, "7", True, "TRUE", datetime.datetime(2024, 2, 29), 2, None],
+        ]
+        for row in rows:
+            ws.append(row)
+
+        with NamedTemporaryFile(suffix=".xlsx") as tmp:
+            wb.save(tmp.name)
+            expected = pd.read_excel(tmp.name, header=None)
+            workbook = UnmergedExcelFile(tmp.name)
+            df = workbook.read_sheet(workbook.sheet_names[0])
+            workbook.close()
+
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_merged_ranges_parsed_from_sheet_xml(self):
+        import io
+
+        from src.analyzer import workbook_loader
+
+        xml = (
+            b'<worksheet><sheetData/><mergeCells count="2">'
+            b'<mergeCell ref="A1:D1"/><mergeCell ref="AA10:AB12"/></mergeCells></worksheet>'
+        )
+        self.addCleanup(setattr, workbook_loader, "_READ_BLOCK", workbook_loader._READ_BLOCK)
+        # Small blocks split the tags across reads
+        workbook_loader._READ_BLOCK = 7
+        self.assertEqual(
+            workbook_loader.merged_ranges(io.BytesIO(xml)),
+            [(1, 1, 1, 4), (10, 27, 12, 28)],
+        )
+
+    def test_worksheet_paths_follow_package_relationships(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+        import zipfile
+
+        from src.analyzer import workbook_loader
+
+        wb = Workbook()
+        wb.active.title = "Data"
+        wb.active["A1"] = 111
+        wb.create_sheet("Other")["A1"] = 222
+        wb.move_sheet("Other", offset=-1)
+
+        with NamedTemporaryFile(suffix=".xlsx") as tmp:
+            wb.save(tmp.name)
+            with zipfile.ZipFile(tmp.name) as archive:
+                paths = workbook_loader.worksheet_paths(archive)
+                self.assertEqual(set(paths), {"Data", "Other"})
+                self.assertIn(b"<v>111</v>", archive.read(paths["Data"]))
+                self.assertIn(b"<v>222</v>", archive.read(paths["Other"]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,141 @@
+import os
+import time
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.analyzer.workbook_cache import WorkbookCache
+
+
+class TestWorkbookCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = WorkbookCache(os.path.join(self.tmp.name, 'cache'))
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        return path
+
+    def test_key_follows_file_contents(self):
+        first = self._write('a.xlsx', b'contents')
+        copy = self._write('b.xlsx', b'contents')
+        key = self.cache.key(first)
+
+        self.assertEqual(self.cache.key(copy), key)
+        with patch('src.analyzer.workbook_cache.file_digest') as digest:
+            self.assertEqual(self.cache.key(first), key)
+        digest.assert_not_called()
+
+        self._write('a.xlsx', b'changed contents')
+        self.assertNotEqual(self.cache.key(first), key)
+
+    def test_key_follows_format_and_pandas_versions(self):
+        path = self._write('a.xlsx', b'contents')
+        key = self.cache.key(path)
+
+        with patch('src.analyzer.workbook_cache.CACHE_FORMAT_VERSION', 999):
+            self.assertNotEqual(self.cache.key(path), key)
+        with patch.object(pd, '__version__', '0.0.0'):
+            self.assertNotEqual(self.cache.key(path), key)
+        self.assertEqual(self.cache.key(path), key)
+
+    def test_store_and_load_sheet(self):
+        key = self.cache.key(self._write('a.xlsx', b'contents'))
+        entry = {'dataframe': pd.DataFrame({0: ['Center', 'C1'], 1: ['Amount', 1.5]}), 'data_area': (0, 1)}
+
+        self.assertIsNone(self.cache.load(key, 'Sheet1', 5))
+        self.cache.store(key, 'Sheet1', 5, entry)
+
+        loaded = self.cache.load(key, 'Sheet1', 5)
+        pd.testing.assert_frame_equal(loaded['dataframe'], entry['dataframe'])
+        self.assertEqual(loaded['data_area'], (0, 1))
+        self.assertIsNone(self.cache.load(key, 'Sheet1', 3))
+
+    def test_least_recently_used_workbooks_are_evicted(self):
+        frame = pd.DataFrame({'value': range(20000)})
+        keys = []
+        for name in ('a', 'b', 'c'):
+            key = self.cache.key(self._write(f'{name}.xlsx', name.encode()))
+            self.cache.store(key, 'Sheet1', 5, {'dataframe': frame})
+            os.utime(os.path.join(self.cache.directory, key), (time.time() - 100 + len(keys),) * 2)
+            keys.append(key)
+        # Using the oldest workbook makes the second one the eviction candidate
+        self.assertIsNotNone(self.cache.load(keys[0], 'Sheet1', 5))
+
+        size = os.path.getsize(self.cache._sheet_path(keys[0], 'Sheet1', 5))
+        self.cache.max_bytes = size * 2
+        self.cache.evict()
+
+        self.assertIsNotNone(self.cache.load(keys[0], 'Sheet1', 5))
+        self.assertIsNone(self.cache.load(keys[1], 'Sheet1', 5))
+        self.assertIsNotNone(self.cache.load(keys[2], 'Sheet1', 5))
+
+    def test_excel_analyzer_reads_cached_sheets(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+
+        from src.analyzer.excel_analyzer import ExcelAnalyzer
+
+        wb = Workbook()
+        wb.active.title = 'Summary'
+        wb.active.append(['Center', 'Revenue Total', 'Expense Total'])
+        wb.active.append(['C1', 1.5, 2.5])
+        path = os.path.join(self.tmp.name, 'report.xlsx')
+        wb.save(path)
+
+        first = ExcelAnalyzer(path, self.cache)
+        self.assertTrue(first.load_excel())
+        expected = first.analyze_sheet('Summary')
+
+        second = ExcelAnalyzer(path, self.cache)
+        self.assertTrue(second.load_excel())
+        with patch.object(second.excel_file, 'read_sheet') as read_sheet:
+            info = second.analyze_sheet('Summary')
+        read_sheet.assert_not_called()
+
+        pd.testing.assert_frame_equal(info['dataframe'], expected['dataframe'])
+        self.assertEqual(info['dataframe'].name, 'Summary')
+        for field in ('shape', 'structure', 'header_indexes', 'data_area'):
+            self.assertEqual(info[field], expected[field])
+        self.assertEqual(second.potential_queries['Summary'], first.potential_queries['Summary'])
+        first.close()
+        second.close()
+
+
+    def test_excel_analyzer_trims_cache_once_per_workbook(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl not installed")
+
+        from src.analyzer.excel_analyzer import ExcelAnalyzer
+
+        wb = Workbook()
+        for title in ('First', 'Second', 'Third'):
+            sheet = wb.create_sheet(title)
+            sheet.append(['Center', 'Revenue Total'])
+            sheet.append(['C1', 1.5])
+        wb.remove(wb['Sheet'])
+        path = os.path.join(self.tmp.name, 'report.xlsx')
+        wb.save(path)
+
+        analyzer = ExcelAnalyzer(path, self.cache)
+        self.assertTrue(analyzer.load_excel())
+        with patch.object(self.cache, 'evict') as evict:
+            for title in ('First', 'Second'):
+                analyzer.analyze_sheet(title)
+            evict.assert_not_called()
+            analyzer.analyze_sheet('Third')
+            evict.assert_called_once_with(keep=analyzer._cache_key)
+            analyzer.close()
+        evict.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()